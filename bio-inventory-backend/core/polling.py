@@ -0,0 +1,43 @@
+"""
+The poll loop shared by the long-running background commands:
+run_scheduler, run_expiration_scheduler and run_outbox_worker.
+
+Each loop does one round of work, asks how long it may sleep before the next
+round is due, and sleeps. ``clock`` and ``sleep`` are injectable so a loop
+can run against a frozen clock in tests; the commands pass ``idle_sleep``.
+"""
+from abc import ABC, abstractmethod
+import time
+
+from django.db import close_old_connections
+from django.utils import timezone
+
+
+def idle_sleep(seconds):
+    """``time.sleep`` that first drops database connections a long wait would outlive"""
+    close_old_connections()
+    time.sleep(seconds)
+
+
+class PollLoop(ABC):
+    """Subclasses implement ``poll()`` and ``seconds_until_next()``."""
+
+    def __init__(self, clock=timezone.now, sleep=time.sleep):
+        self.clock = clock
+        self.sleep = sleep
+
+    @abstractmethod
+    def poll(self):
+        """Do the work due now"""
+
+    @abstractmethod
+    def seconds_until_next(self):
+        """How long to sleep before the next round; 0 polls again at once"""
+
+    def run(self, should_stop=lambda: False):
+        """Poll until ``should_stop()`` is true"""
+        while not should_stop():
+            self.poll()
+            delay = self.seconds_until_next()
+            if delay:
+                self.sleep(delay)
@@ -51,6 +51,7 @@ INSTALLED_APPS = [
     'funding',
     'notifications',
     'settings',
+    'outbox',
 ]
 
 MIDDLEWARE = [
@@ -62,6 +63,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'notifications.preferences.preference_scope_middleware',
 ]
 
 ROOT_URLCONF = 'core.urls'
@@ -153,7 +155,7 @@ CORS_ALLOW_CREDENTIALS = True
 # DRF Token Auth config
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -176,18 +178,35 @@ REST_FRAMEWORK = {
     }
 }
 
-# Caching Configuration
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
-        'TIMEOUT': 300,
-        'OPTIONS': {
-            'MAX_ENTRIES': 1000,
-            'CULL_FREQUENCY': 3,
+# Caching Configuration. Set REDIS_URL in production so every gunicorn
+# worker shares one cache; without it each process has its own locmem cache
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_URL,
+            'TIMEOUT': 300,
         }
     }
-}
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'unique-snowflake',
+            'TIMEOUT': 300,
+            'OPTIONS': {
+                'MAX_ENTRIES': 1000,
+                'CULL_FREQUENCY': 3,
+            }
+        }
+    }
+
+# Seconds a resolved API token (and its user) is served from the cache by
+# users.authentication.CachedTokenAuthentication; 0 disables caching. Off
+# unless the cache is shared: with a per-process cache, deleting a token or
+# deactivating its user would only be seen by the process that did it
+AUTH_TOKEN_CACHE_TIMEOUT = config('AUTH_TOKEN_CACHE_TIMEOUT', default=60 if REDIS_URL else 0, cast=int)
 
 # Performance optimizations
 USE_TZ = True
@@ -230,6 +249,83 @@ EMAIL_USE_LOCALTIME = True
 # Frontend URL for email links
 FRONTEND_URL = config('FRONTEND_URL', default='http://localhost:3000')
 
+# Funding ledger: yearly range partitions for funding_transaction (PostgreSQL only)
+FUNDING_PARTITION_TRANSACTIONS = config('FUNDING_PARTITION_TRANSACTIONS', default=False, cast=bool)
+FUNDING_PARTITION_YEARS_AHEAD = config('FUNDING_PARTITION_YEARS_AHEAD', default=1, cast=int)
+
+# Funding reports are generated in a background thread pool after the request commits
+FUNDING_REPORTS_ASYNC = config('FUNDING_REPORTS_ASYNC', default=True, cast=bool)
+FUNDING_REPORT_WORKERS = config('FUNDING_REPORT_WORKERS', default=2, cast=int)
+
+# Notification event stream (served through core.asgi). 'postgres' relays
+# events between processes with LISTEN/NOTIFY; 'local' keeps them in-process
+NOTIFICATION_EVENTS_BACKEND = config('NOTIFICATION_EVENTS_BACKEND', default='local')
+NOTIFICATION_STREAM_HEARTBEAT = config('NOTIFICATION_STREAM_HEARTBEAT', default=15, cast=int)
+NOTIFICATION_STREAM_MAX_SECONDS = config('NOTIFICATION_STREAM_MAX_SECONDS', default=300, cast=int)
+NOTIFICATION_STREAM_BUFFER = config('NOTIFICATION_STREAM_BUFFER', default=1000, cast=int)
+# Lifetime of the signed ?ticket= an EventSource connects with, so API
+# tokens never appear in URLs (and access logs)
+NOTIFICATION_STREAM_TICKET_SECONDS = config('NOTIFICATION_STREAM_TICKET_SECONDS', default=60, cast=int)
+
+# Notification retention (manage.py apply_notification_retention): read
+# notifications of each type are deleted after this many days, and each
+# user keeps at most NOTIFICATION_MAX_PER_USER (0 disables the cap)
+NOTIFICATION_RETENTION_DAYS = {
+    'info': 30,
+    'success': 30,
+    'warning': 90,
+    'inventory_alert': 90,
+    'system': 90,
+    'request_update': 180,
+    'error': 180,
+}
+NOTIFICATION_MAX_PER_USER = config('NOTIFICATION_MAX_PER_USER', default=500, cast=int)
+NOTIFICATION_RETENTION_CHUNK_SIZE = config('NOTIFICATION_RETENTION_CHUNK_SIZE', default=1000, cast=int)
+
+# Request lead time rollup (requests.analytics), refreshed by the
+# request_lead_times job below: history rows are folded in only once they are
+# this old, so rows still being committed are not skipped
+REQUEST_ANALYTICS_SETTLE_SECONDS = config('REQUEST_ANALYTICS_SETTLE_SECONDS', default=300, cast=int)
+
+# Domain events (outbox app). 'worker' leaves them to manage.py
+# run_outbox_worker, so API requests do not wait for their handlers;
+# 'inline' dispatches them in the request once the publishing transaction
+# commits and is meant for development and tests only. In both modes that
+# worker retries events whose handlers failed, and events still failing
+# after OUTBOX_MAX_ATTEMPTS tries are marked failed
+OUTBOX_DISPATCH = config('OUTBOX_DISPATCH', default='worker')
+OUTBOX_MAX_ATTEMPTS = config('OUTBOX_MAX_ATTEMPTS', default=10, cast=int)
+
+# Maintenance jobs run by manage.py run_scheduler (settings.scheduler). Each
+# job is a management command with an interval in seconds or a cron
+# expression (project time zone); 'lease' is the longest expected run, after
+# which another node may take the job over. The outbox and expiration jobs
+# make run_scheduler the only process needed next to gunicorn; running
+# run_outbox_worker and run_expiration_scheduler as processes of their own
+# as well cuts their latency from the job interval to about a second
+SCHEDULED_JOBS = {
+    'inventory_alerts': {'command': 'check_inventory_alerts', 'cron': '0 7 * * *'},
+    'expiration_alerts': {
+        'command': 'run_expiration_scheduler',
+        'args': ['--once'],
+        'interval': 300,
+        'lease': 600,
+    },
+    'weekly_inventory_summary': {
+        'command': 'send_weekly_inventory_summary',
+        # The schedule picks the day; --force skips the command's own Monday check
+        'args': ['--force'],
+        'cron': '0 9 * * 1',
+    },
+    'notification_retention': {'command': 'apply_notification_retention', 'interval': 3600},
+    'notification_counters': {'command': 'reconcile_notification_counters', 'cron': '30 3 * * *'},
+    'budget_allocations': {'command': 'reconcile_budget_allocations', 'cron': '0 4 * * *'},
+    'funding_reports': {'command': 'process_funding_reports', 'interval': 600},
+    'request_lead_times': {'command': 'refresh_request_analytics', 'interval': 300},
+    # Delivers outbox events and retries failed handlers
+    'outbox_backlog': {'command': 'run_outbox_worker', 'args': ['--once'], 'interval': 60, 'lease': 300},
+}
+
 # Logging configuration
 LOGGING = {
     'version': 1,
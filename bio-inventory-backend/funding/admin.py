@@ -43,16 +43,16 @@ class FundAdmin(admin.ModelAdmin):
 @admin.register(Transaction)
 class TransactionAdmin(admin.ModelAdmin):
     list_display = [
-        'fund', 'amount', 'transaction_type', 'item_name', 
+        'fund', 'amount', 'transaction_type', 'category', 'item_name', 
         'transaction_date', 'created_by'
     ]
-    list_filter = ['transaction_type', 'transaction_date', 'fund']
+    list_filter = ['transaction_type', 'category', 'transaction_date', 'fund']
     search_fields = ['fund__name', 'item_name', 'description', 'reference_number']
     readonly_fields = ['transaction_date']
     
     fieldsets = (
         ('Transaction Details', {
-            'fields': ('fund', 'amount', 'transaction_type')
+            'fields': ('fund', 'amount', 'transaction_type', 'category')
         }),
         ('Item Information', {
             'fields': ('item_name', 'description', 'request_id', 'reference_number')
@@ -85,8 +85,10 @@ class BudgetAllocationAdmin(admin.ModelAdmin):
 
 @admin.register(FundingReport)
 class FundingReportAdmin(admin.ModelAdmin):
-    list_display = ['title', 'report_type', 'start_date', 'end_date', 'generated_at', 'generated_by']
-    list_filter = ['report_type', 'generated_at']
+    list_display = ['title', 'report_type', 'start_date', 'end_date', 'status', 'generated_at', 'generated_by']
+    list_filter = ['report_type', 'status', 'generated_at']
     search_fields = ['title']
-    readonly_fields = ['summary_data', 'generated_at', 'generated_by']
+    readonly_fields = [
+        'summary_data', 'status', 'error', 'started_at', 'completed_at', 'generated_at', 'generated_by'
+    ]
     filter_horizontal = ['funds']
\ No newline at end of file
@@ -1,4 +1,5 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class FundingConfig(AppConfig):
@@ -6,4 +7,11 @@ class FundingConfig(AppConfig):
     name = 'funding'
     
     def ready(self):
-        import funding.signals
\ No newline at end of file
+        import funding.signals
+        post_migrate.connect(ensure_upcoming_partitions, sender=self)
+
+
+def ensure_upcoming_partitions(sender, using, **kwargs):
+    """Keep a partition ready for the coming year(s) whenever migrations run"""
+    from .partitioning import ensure_partitions
+    ensure_partitions()
\ No newline at end of file
@@ -9,8 +9,8 @@ class FundFilter(django_filters.FilterSet):
     principal_investigator = django_filters.CharFilter(lookup_expr='icontains')
     total_budget_min = django_filters.NumberFilter(field_name='total_budget', lookup_expr='gte')
     total_budget_max = django_filters.NumberFilter(field_name='total_budget', lookup_expr='lte')
-    utilization_min = django_filters.NumberFilter(method='filter_utilization_min')
-    utilization_max = django_filters.NumberFilter(method='filter_utilization_max')
+    utilization_min = django_filters.NumberFilter(field_name='utilization', lookup_expr='gte')
+    utilization_max = django_filters.NumberFilter(field_name='utilization', lookup_expr='lte')
     start_date_after = django_filters.DateFilter(field_name='start_date', lookup_expr='gte')
     start_date_before = django_filters.DateFilter(field_name='start_date', lookup_expr='lte')
     end_date_after = django_filters.DateFilter(field_name='end_date', lookup_expr='gte')
@@ -24,20 +24,6 @@ class FundFilter(django_filters.FilterSet):
             'is_archived', 'created_by'
         ]
 
-    def filter_utilization_min(self, queryset, name, value):
-        # Filter funds with utilization >= value
-        return queryset.extra(
-            where=["(spent_amount / total_budget * 100) >= %s"],
-            params=[value]
-        )
-
-    def filter_utilization_max(self, queryset, name, value):
-        # Filter funds with utilization <= value
-        return queryset.extra(
-            where=["(spent_amount / total_budget * 100) <= %s"],
-            params=[value]
-        )
-
 
 class TransactionFilter(django_filters.FilterSet):
     fund_name = django_filters.CharFilter(field_name='fund__name', lookup_expr='icontains')
@@ -51,30 +37,19 @@ class TransactionFilter(django_filters.FilterSet):
     class Meta:
         model = Transaction
         fields = [
-            'fund', 'transaction_type', 'request_id', 'created_by'
+            'fund', 'transaction_type', 'request_id', 'category', 'created_by'
         ]
 
 
 class BudgetAllocationFilter(django_filters.FilterSet):
     fund_name = django_filters.CharFilter(field_name='fund__name', lookup_expr='icontains')
-    category = django_filters.CharFilter(lookup_expr='icontains')
+    category = django_filters.CharFilter(lookup_expr='exact')
+    category__icontains = django_filters.CharFilter(field_name='category', lookup_expr='icontains')
     allocated_amount_min = django_filters.NumberFilter(field_name='allocated_amount', lookup_expr='gte')
     allocated_amount_max = django_filters.NumberFilter(field_name='allocated_amount', lookup_expr='lte')
-    utilization_min = django_filters.NumberFilter(method='filter_utilization_min')
-    utilization_max = django_filters.NumberFilter(method='filter_utilization_max')
+    utilization_min = django_filters.NumberFilter(field_name='utilization', lookup_expr='gte')
+    utilization_max = django_filters.NumberFilter(field_name='utilization', lookup_expr='lte')
     
     class Meta:
         model = BudgetAllocation
-        fields = ['fund', 'category']
-
-    def filter_utilization_min(self, queryset, name, value):
-        return queryset.extra(
-            where=["(spent_amount / allocated_amount * 100) >= %s"],
-            params=[value]
-        )
-
-    def filter_utilization_max(self, queryset, name, value):
-        return queryset.extra(
-            where=["(spent_amount / allocated_amount * 100) <= %s"],
-            params=[value]
-        )
\ No newline at end of file
+        fields = ['fund', 'category']
\ No newline at end of file
@@ -0,0 +1,92 @@
+import time
+
+from django.db import transaction
+
+from .models import MaintenanceCheckpoint
+
+
+class ChunkedRun:
+    """
+    Drive a maintenance command through ordered phases, each a keyset-paginated
+    walk over a ``values()`` queryset that includes ``id``.
+
+    When ``resumable`` is set every chunk commits in its own transaction
+    together with the checkpoint, so an interrupted run picks up after the last
+    committed chunk. Otherwise nothing is persisted and the caller is expected
+    to wrap the whole run in one transaction.
+    """
+
+    def __init__(self, command, name, phases, chunk_size=5000, resumable=False, restart=False):
+        self.command = command
+        self.phases = list(phases)
+        self.chunk_size = chunk_size
+        self.resumable = resumable
+
+        if resumable and restart:
+            MaintenanceCheckpoint.objects.filter(command=name).delete()
+        if resumable:
+            self.checkpoint, created = MaintenanceCheckpoint.objects.get_or_create(
+                command=name, defaults={'phase': self.phases[0]}
+            )
+            if not created:
+                command.stdout.write(command.style.WARNING(
+                    f'Resuming {name} at phase "{self.checkpoint.phase}" after #{self.checkpoint.last_id}'
+                ))
+        else:
+            self.checkpoint = MaintenanceCheckpoint(command=name, phase=self.phases[0])
+
+    @property
+    def state(self):
+        """Free-form values that must survive a resume, e.g. high-water marks."""
+        return self.checkpoint.state
+
+    def save(self):
+        if self.resumable:
+            self.checkpoint.save()
+
+    def run_phase(self, phase, queryset, handle_chunk):
+        """
+        Feed ``queryset`` to ``handle_chunk`` in id order. Phases completed by
+        an earlier run are skipped. Returns the number of rows handled.
+        """
+        position = self.phases.index(phase)
+        current = self.phases.index(self.checkpoint.phase)
+        if position < current:
+            return 0
+
+        after_id = self.checkpoint.last_id if position == current else 0
+        processed = self.checkpoint.processed if position == current else 0
+        total = processed + queryset.filter(id__gt=after_id).count()
+        started = time.perf_counter()
+        handled = 0
+
+        while True:
+            rows = list(queryset.filter(id__gt=after_id).order_by('id')[:self.chunk_size])
+            if not rows:
+                break
+            after_id = rows[-1]['id']
+
+            with transaction.atomic():
+                handle_chunk(rows)
+                processed += len(rows)
+                self.checkpoint.phase = phase
+                self.checkpoint.last_id = after_id
+                self.checkpoint.processed = processed
+                self.save()
+
+            handled += len(rows)
+            rate = handled / max(time.perf_counter() - started, 1e-6)
+            self.command.stdout.write(
+                f'  [{phase}] {processed:,}/{total:,} ({processed / total:.1%}) {rate:,.0f} rows/s'
+            )
+
+        if position + 1 < len(self.phases):
+            self.checkpoint.phase = self.phases[position + 1]
+            self.checkpoint.last_id = 0
+            self.checkpoint.processed = 0
+            self.save()
+        return handled
+
+    def finish(self):
+        if self.resumable:
+            self.checkpoint.delete()
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from funding.models import Fund, FundMonthlySpend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the FundMonthlySpend rollup from the transaction ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fund',
+            type=int,
+            action='append',
+            dest='fund_ids',
+            help='Only rebuild the given fund id (can be repeated)',
+        )
+
+    def handle(self, *args, **options):
+        fund_ids = options['fund_ids']
+        funds = Fund.objects.filter(id__in=fund_ids) if fund_ids else None
+
+        scope = f'{len(fund_ids)} fund(s)' if fund_ids else 'all funds'
+        self.stdout.write(f'Rebuilding monthly spend rollup for {scope}...')
+
+        written = FundMonthlySpend.rebuild(funds)
+
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} monthly spend rows'))
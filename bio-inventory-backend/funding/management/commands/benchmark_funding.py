@@ -0,0 +1,214 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Sum, F
+from django.test.utils import CaptureQueriesContext
+from decimal import Decimal
+import random
+import re
+import time
+
+from funding.filters import BudgetAllocationFilter
+from funding.models import Fund, BudgetAllocation
+from funding.utils import get_portfolio_statistics
+
+
+class Command(BaseCommand):
+    help = 'Benchmark funding analytics against synthetic data (rolled back afterwards)'
+
+    scenarios = ['cross_fund', 'utilization_filter', 'partitioned_ledger']
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scenario',
+            choices=self.scenarios,
+            default='cross_fund',
+            help='Which code path to benchmark',
+        )
+        parser.add_argument(
+            '--funds',
+            type=int,
+            default=5000,
+            help='Number of synthetic funds to create',
+        )
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=5000000,
+            help='Synthetic ledger size for the partitioned_ledger scenario',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Timed runs per implementation; the best run is reported',
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(42)
+        self.repeat = options['repeat']
+
+        with transaction.atomic():
+            self.user = User.objects.create(username=f'benchmark-{time.time_ns()}')
+            getattr(self, f"benchmark_{options['scenario']}")(options)
+            # Never keep the synthetic data
+            transaction.set_rollback(True)
+
+    def timed(self, label, func):
+        best = None
+        for _ in range(self.repeat):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                func()
+                elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        self.stdout.write(f'  {label:<28} {best * 1000:10.1f} ms  {len(queries):6d} queries')
+        return best
+
+    def report_speedup(self, before, after):
+        if after <= 0:
+            raise CommandError('Benchmark finished too quickly to measure')
+        self.stdout.write(self.style.SUCCESS(f'  Speedup: {before / after:.1f}x'))
+
+    def create_funds(self, count):
+        funds = []
+        for i in range(count):
+            budget = Decimal(self.rng.randint(1000, 500000))
+            funds.append(Fund(
+                name=f'Benchmark Fund {i}',
+                total_budget=budget,
+                spent_amount=(budget * Decimal(self.rng.randint(0, 12000)) / 10000).quantize(Decimal('0.01')),
+                created_by=self.user,
+            ))
+        return Fund.objects.bulk_create(funds, batch_size=1000)
+
+    def benchmark_cross_fund(self, options):
+        self.stdout.write(f"Cross-fund statistics over {options['funds']} funds")
+        self.create_funds(options['funds'])
+        funds = Fund.objects.filter(is_archived=False)
+
+        def python_loop():
+            # Previous implementation: separate SUMs and bucket COUNTs plus a
+            # Python pass over every fund for utilization
+            funds.aggregate(total=Sum('total_budget'))
+            funds.aggregate(total=Sum('spent_amount'))
+            rows = list(funds.all())
+            utilizations = [fund.utilization_percentage for fund in rows]
+            sum(utilizations) / len(utilizations)
+            sum(1 for u in utilizations if u >= 90)
+            sum(1 for fund in rows if fund.remaining_budget < 0)
+            funds.filter(spent_amount__gt=F('total_budget') * 0.95).count()
+            funds.filter(spent_amount__gt=F('total_budget') * 0.85, spent_amount__lte=F('total_budget') * 0.95).count()
+            funds.filter(spent_amount__gt=F('total_budget') * 0.65, spent_amount__lte=F('total_budget') * 0.85).count()
+            funds.filter(spent_amount__lte=F('total_budget') * 0.65).count()
+
+        before = self.timed('python loop', python_loop)
+        after = self.timed('single aggregate', lambda: get_portfolio_statistics(funds))
+        self.report_speedup(before, after)
+
+    def benchmark_utilization_filter(self, options):
+        categories = [f'Category {i}' for i in range(10)]
+        self.stdout.write(
+            f"Utilization filter over {options['funds'] * len(categories)} budget allocations"
+        )
+        allocations = []
+        for fund in self.create_funds(options['funds']):
+            for category in categories:
+                allocated = Decimal(self.rng.randint(100, 50000))
+                allocations.append(BudgetAllocation(
+                    fund=fund,
+                    category=category,
+                    allocated_amount=allocated,
+                    spent_amount=(allocated * Decimal(self.rng.randint(0, 12000)) / 10000).quantize(Decimal('0.01')),
+                ))
+        BudgetAllocation.objects.bulk_create(allocations, batch_size=1000)
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {BudgetAllocation._meta.db_table}')
+
+        def raw_where():
+            # Previous implementation: per-row arithmetic in an extra() clause
+            list(BudgetAllocation.objects.extra(
+                where=["(spent_amount / allocated_amount * 100) >= %s"], params=[99]
+            ).order_by('category')[:25])
+
+        def filtered():
+            queryset = BudgetAllocationFilter(
+                {'utilization_min': 99}, queryset=BudgetAllocation.objects.all()
+            ).qs
+            return queryset.order_by('-utilization')[:25]
+
+        before = self.timed('extra() where clause', raw_where)
+        after = self.timed('indexed utilization', lambda: list(filtered()))
+        self.report_speedup(before, after)
+        self.stdout.write(filtered().explain())
+
+    def benchmark_partitioned_ledger(self, options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('The partitioned_ledger scenario needs PostgreSQL')
+
+        first_year, last_year = 2019, 2026
+        self.stdout.write(
+            f"Date-bounded ledger queries over {options['rows']:,} rows, "
+            f'{first_year}-{last_year}, plain vs yearly partitions'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                CREATE TEMPORARY TABLE bench_ledger_plain (
+                    id bigint, fund_id bigint, amount numeric(12, 2), transaction_type varchar(20),
+                    transaction_date timestamptz
+                )
+            """)
+            cursor.execute("""
+                INSERT INTO bench_ledger_plain
+                SELECT i, 1 + (i %% %s), (random() * 1000)::numeric(12, 2), 'purchase',
+                       %s::timestamptz + (random() * (%s::timestamptz - %s::timestamptz))
+                FROM generate_series(1, %s) AS i
+            """, [
+                options['funds'], f'{first_year}-01-01 00:00+00',
+                f'{last_year + 1}-01-01 00:00+00', f'{first_year}-01-01 00:00+00', options['rows'],
+            ])
+            cursor.execute("""
+                CREATE TEMPORARY TABLE bench_ledger_partitioned (LIKE bench_ledger_plain)
+                PARTITION BY RANGE (transaction_date)
+            """)
+            for year in range(first_year, last_year + 1):
+                cursor.execute(f"""
+                    CREATE TEMPORARY TABLE bench_ledger_y{year} PARTITION OF bench_ledger_partitioned
+                    FOR VALUES FROM ('{year}-01-01 00:00+00') TO ('{year + 1}-01-01 00:00+00')
+                """)
+            cursor.execute('INSERT INTO bench_ledger_partitioned SELECT * FROM bench_ledger_plain')
+            for table in ('bench_ledger_plain', 'bench_ledger_partitioned'):
+                # Mirrors the fund_id index Django creates for the foreign key
+                cursor.execute(f'CREATE INDEX ON {table} (fund_id)')
+                cursor.execute(f'ANALYZE {table}')
+
+        queries = {
+            'period summary': """
+                SELECT transaction_type, count(*), sum(amount) FROM {table}
+                WHERE transaction_date >= '2024-01-01 00:00+00' AND transaction_date < '2024-04-01 00:00+00'
+                GROUP BY transaction_type
+            """,
+            'fund transactions in year': """
+                SELECT count(*), sum(amount) FROM {table}
+                WHERE fund_id = 42
+                  AND transaction_date >= '2023-01-01 00:00+00' AND transaction_date < '2024-01-01 00:00+00'
+            """,
+        }
+
+        def run(sql):
+            with connection.cursor() as cursor:
+                cursor.execute(sql)
+                cursor.fetchall()
+
+        for label, sql in queries.items():
+            self.stdout.write(f'{label}:')
+            before = self.timed('plain table', lambda: run(sql.format(table='bench_ledger_plain')))
+            after = self.timed('yearly partitions', lambda: run(sql.format(table='bench_ledger_partitioned')))
+            self.report_speedup(before, after)
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN ' + sql.format(table='bench_ledger_partitioned'))
+                scanned = sorted({
+                    word for (line,) in cursor.fetchall() for word in line.split()
+                    if re.fullmatch(r'bench_ledger_y\d{4}', word)
+                })
+            self.stdout.write(f"  Partitions scanned: {', '.join(scanned)}")
@@ -1,10 +1,14 @@
 from django.core.management.base import BaseCommand
 from django.db import transaction
-from django.db.models import Sum
+from django.db.models import Sum, F, Q, Exists, OuterRef, Subquery, DecimalField
+from django.db.models.functions import Abs, Coalesce
 from decimal import Decimal
 import sys
 
-from funding.models import Fund, Transaction
+from funding.maintenance import ChunkedRun
+from funding.models import Fund, Transaction, FundMonthlySpend, archived_spend_total, signed_amount_expression
+from funding.signals import suspend_ledger_signals
+from funding.utils import recalculate_fund_spent_amounts, recalculate_allocation_spent_amounts
 from requests.models import Request
 from items.models import Item
 
@@ -18,6 +22,22 @@ class Command(BaseCommand):
             action='store_true',
             help='Show what would be changed without making actual changes',
         )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Transactions examined per batch',
+        )
+        parser.add_argument(
+            '--resumable',
+            action='store_true',
+            help='Commit after every chunk and record a checkpoint; rerun with this flag to resume',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='With --resumable, discard any saved checkpoint and start over',
+        )
 
     def handle(self, *args, **options):
         dry_run = options['dry_run']
@@ -29,13 +49,13 @@ class Command(BaseCommand):
         self.stdout.write('\n=== ANALYZING CURRENT DATA ===')
         self.analyze_data_discrepancies()
         
-        # Step 2: Fix transaction amounts
-        self.stdout.write('\n=== FIXING TRANSACTION AMOUNTS ===')
-        self.fix_transaction_amounts(dry_run)
-        
-        # Step 3: Recalculate fund spent amounts
-        self.stdout.write('\n=== RECALCULATING FUND SPENT AMOUNTS ===')
-        self.recalculate_fund_spent_amounts(dry_run)
+        # Steps 2 and 3: per-row signals are replaced by one recalculation at the end
+        with suspend_ledger_signals():
+            if options['resumable'] and not dry_run:
+                self.run_fixes(options, dry_run)
+            else:
+                with transaction.atomic():
+                    self.run_fixes(options, dry_run)
         
         # Step 4: Final verification
         self.stdout.write('\n=== VERIFICATION ===')
@@ -46,6 +66,23 @@ class Command(BaseCommand):
         else:
             self.stdout.write(self.style.SUCCESS('\nData correction completed successfully!'))
 
+    def run_fixes(self, options, dry_run):
+        run = ChunkedRun(
+            self, 'fix_funding_data', ['linked', 'suspicious'],
+            chunk_size=options['chunk_size'],
+            resumable=options['resumable'] and not dry_run,
+            restart=options['restart']
+        )
+        
+        # Step 2: Fix transaction amounts
+        self.stdout.write('\n=== FIXING TRANSACTION AMOUNTS ===')
+        self.fix_transaction_amounts(run, dry_run)
+        
+        # Step 3: Recalculate fund spent amounts
+        self.stdout.write('\n=== RECALCULATING FUND SPENT AMOUNTS ===')
+        self.recalculate_fund_spent_amounts(dry_run)
+        run.finish()
+
     def analyze_data_discrepancies(self):
         # Get total inventory value
         inventory_total = Item.objects.aggregate(
@@ -63,13 +100,12 @@ class Command(BaseCommand):
         )['total'] or Decimal('0.00')
         
         # Get request values
-        approved_requests_value = Decimal('0.00')
-        requests_with_funding = Request.objects.filter(
+        approved_requests_value = Request.objects.filter(
             fund_id__isnull=False,
             status__in=['APPROVED', 'ORDERED', 'RECEIVED']
-        )
-        for req in requests_with_funding:
-            approved_requests_value += req.unit_price * req.quantity
+        ).aggregate(
+            total=Sum(F('unit_price') * F('quantity'))
+        )['total'] or Decimal('0.00')
         
         self.stdout.write(f'Total Inventory Value: ${inventory_total:,}')
         self.stdout.write(f'Total Funding Spent (Funds): ${funding_spent:,}')
@@ -90,113 +126,129 @@ class Command(BaseCommand):
                 f'DISCREPANCY: Fund spent amounts don\'t match transaction totals by ${funding_vs_transactions_diff:,}'
             ))
 
-    def fix_transaction_amounts(self, dry_run=False):
+    def fix_transaction_amounts(self, run, dry_run=False):
         """Fix transactions that are linked to requests but have incorrect amounts"""
-        corrections_made = 0
+        corrections = {'count': 0}
         
-        # Fix transactions linked to requests
-        transactions_with_requests = Transaction.objects.filter(request_id__isnull=False)
+        # Fix transactions linked to requests; mismatches are found in SQL
+        requests = Request.objects.filter(id=OuterRef('request_id'))
+        transactions_with_requests = Transaction.objects.filter(request_id__isnull=False).annotate(
+            request_exists=Exists(requests),
+            correct_amount=Subquery(
+                requests.annotate(total=F('unit_price') * F('quantity')).values('total')[:1],
+                output_field=DecimalField(max_digits=14, decimal_places=2)
+            )
+        ).filter(
+            Q(request_exists=False)
+            | Q(amount__gt=F('correct_amount') + Decimal('0.01'))
+            | Q(amount__lt=F('correct_amount') - Decimal('0.01'))
+        ).values('id', 'item_name', 'amount', 'request_id', 'request_exists', 'correct_amount')
         
-        for trans in transactions_with_requests:
-            try:
-                request = Request.objects.get(id=trans.request_id)
-                correct_amount = request.unit_price * request.quantity
-                
-                if abs(trans.amount - correct_amount) > Decimal('0.01'):
-                    self.stdout.write(f'Transaction {trans.id}: {trans.item_name}')
-                    self.stdout.write(f'  Current amount: ${trans.amount}')
-                    self.stdout.write(f'  Correct amount: ${correct_amount}')
-                    self.stdout.write(f'  Difference: ${trans.amount - correct_amount}')
-                    
+        def fix_linked(rows):
+            updates, orphans = [], []
+            for trans in rows:
+                if not trans['request_exists']:
+                    self.stdout.write(self.style.WARNING(
+                        f"Transaction {trans['id']} references non-existent request {trans['request_id']}"
+                    ))
+                    # Consider removing this transaction or marking it
                     if not dry_run:
-                        trans.amount = correct_amount
-                        trans.save()
-                    
-                    corrections_made += 1
-                    
-            except Request.DoesNotExist:
-                self.stdout.write(self.style.WARNING(
-                    f'Transaction {trans.id} references non-existent request {trans.request_id}'
-                ))
-                # Consider removing this transaction or marking it
-                if not dry_run:
-                    self.stdout.write(f'  Removing orphaned transaction')
-                    trans.delete()
-                    corrections_made += 1
+                        self.stdout.write(f'  Removing orphaned transaction')
+                        orphans.append(trans['id'])
+                        corrections['count'] += 1
+                    continue
+                
+                self.stdout.write(f"Transaction {trans['id']}: {trans['item_name']}")
+                self.stdout.write(f"  Current amount: ${trans['amount']}")
+                self.stdout.write(f"  Correct amount: ${trans['correct_amount']}")
+                self.stdout.write(f"  Difference: ${trans['amount'] - trans['correct_amount']}")
+                updates.append(Transaction(id=trans['id'], amount=trans['correct_amount']))
+                corrections['count'] += 1
+            
+            if not dry_run:
+                Transaction.objects.bulk_update(updates, ['amount'])
+                Transaction.objects.filter(id__in=orphans).delete()
+        
+        run.run_phase('linked', transactions_with_requests, fix_linked)
         
         # Fix transactions not linked to requests - validate against reasonable ranges
-        orphaned_transactions = Transaction.objects.filter(request_id__isnull=True)
+        # More than $100k seems suspicious
+        suspicious_transactions = Transaction.objects.filter(
+            request_id__isnull=True, amount__gt=Decimal('100000.00')
+        ).values('id', 'item_name', 'amount')
         
-        for trans in orphaned_transactions:
-            # Check if amount is unreasonably high
-            if trans.amount > Decimal('100000.00'):  # More than $100k seems suspicious
+        def cap_suspicious(rows):
+            updates = []
+            for trans in rows:
                 self.stdout.write(self.style.WARNING(
-                    f'Suspicious high amount transaction {trans.id}: ${trans.amount} for {trans.item_name}'
+                    f"Suspicious high amount transaction {trans['id']}: ${trans['amount']} for {trans['item_name']}"
                 ))
-                # Consider capping or reviewing these
-                if not dry_run:
-                    # Cap at reasonable amount based on item name
-                    if 'equipment' in trans.item_name.lower() or 'microscope' in trans.item_name.lower():
-                        trans.amount = min(trans.amount, Decimal('50000.00'))
-                    else:
-                        trans.amount = min(trans.amount, Decimal('5000.00'))
-                    trans.save()
-                    corrections_made += 1
-        
-        self.stdout.write(f'Corrected {corrections_made} transaction amounts')
+                # Cap at reasonable amount based on item name
+                name = trans['item_name'].lower()
+                if 'equipment' in name or 'microscope' in name:
+                    cap = Decimal('50000.00')
+                else:
+                    cap = Decimal('5000.00')
+                updates.append(Transaction(id=trans['id'], amount=min(trans['amount'], cap)))
+            
+            if not dry_run:
+                Transaction.objects.bulk_update(updates, ['amount'])
+                corrections['count'] += len(updates)
+        
+        run.run_phase('suspicious', suspicious_transactions, cap_suspicious)
+        
+        self.stdout.write(f"Corrected {corrections['count']} transaction amounts")
 
     def recalculate_fund_spent_amounts(self, dry_run=False):
         """Recalculate spent amounts for all funds based on their transactions"""
         
-        for fund in Fund.objects.all():
-            # Calculate actual spent amount from transactions
-            actual_spent = Transaction.objects.filter(fund=fund).aggregate(
-                total=Sum('amount')
-            )['total'] or Decimal('0.00')
-            
-            # Subtract refunds
-            refunds = Transaction.objects.filter(
-                fund=fund, 
-                transaction_type='refund'
-            ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-            
-            actual_spent = actual_spent - refunds
-            
-            if abs(fund.spent_amount - actual_spent) > Decimal('0.01'):
-                self.stdout.write(f'Fund {fund.name}:')
-                self.stdout.write(f'  Current spent: ${fund.spent_amount}')
-                self.stdout.write(f'  Actual spent: ${actual_spent}')
-                self.stdout.write(f'  Difference: ${fund.spent_amount - actual_spent}')
-                
-                if not dry_run:
-                    fund.spent_amount = actual_spent
-                    fund.save()
+        # Same ledger arithmetic as Fund.recalculate_spent_amount, in one query
+        drifted_funds = Fund.objects.annotate(
+            actual_spent=Coalesce(Sum(signed_amount_expression('transactions__')), Decimal('0.00'))
+            + archived_spend_total(fund='pk')
+        ).annotate(
+            difference=F('spent_amount') - F('actual_spent')
+        ).annotate(
+            abs_difference=Abs('difference')
+        ).filter(abs_difference__gt=Decimal('0.01')).order_by('name')
+        
+        for fund in drifted_funds:
+            self.stdout.write(f'Fund {fund.name}:')
+            self.stdout.write(f'  Current spent: ${fund.spent_amount}')
+            self.stdout.write(f'  Actual spent: ${fund.actual_spent}')
+            self.stdout.write(f'  Difference: ${fund.difference}')
+        
+        if not dry_run:
+            recalculate_fund_spent_amounts()
+            recalculate_allocation_spent_amounts()
+            rollups = FundMonthlySpend.rebuild()
+            self.stdout.write(f'Rebuilt {rollups} monthly spend rollups')
 
     def verify_data_integrity(self):
         """Verify data integrity after corrections"""
         
         # Check that all funds have reasonable utilization
-        problematic_funds = []
-        for fund in Fund.objects.all():
-            if fund.spent_amount > fund.total_budget:
-                over_amount = fund.spent_amount - fund.total_budget
-                problematic_funds.append((fund, over_amount))
+        problematic_funds = Fund.objects.filter(
+            spent_amount__gt=F('total_budget')
+        ).annotate(over_amount=F('spent_amount') - F('total_budget'))
         
         if problematic_funds:
             self.stdout.write(self.style.ERROR('Funds over budget:'))
-            for fund, over_amount in problematic_funds:
-                self.stdout.write(f'  {fund.name}: Over by ${over_amount}')
+            for fund in problematic_funds:
+                self.stdout.write(f'  {fund.name}: Over by ${fund.over_amount}')
         
         # Check transaction-fund consistency
-        for fund in Fund.objects.all():
-            transaction_sum = Transaction.objects.filter(fund=fund).aggregate(
-                total=Sum('amount')
-            )['total'] or Decimal('0.00')
-            
-            if abs(fund.spent_amount - transaction_sum) > Decimal('0.01'):
-                self.stdout.write(self.style.ERROR(
-                    f'Fund {fund.name}: spent_amount (${fund.spent_amount}) != transaction sum (${transaction_sum})'
-                ))
+        inconsistent_funds = Fund.objects.annotate(
+            transaction_sum=Coalesce(Sum(signed_amount_expression('transactions__')), Decimal('0.00'))
+            + archived_spend_total(fund='pk')
+        ).annotate(
+            difference=Abs(F('spent_amount') - F('transaction_sum'))
+        ).filter(difference__gt=Decimal('0.01'))
+        
+        for fund in inconsistent_funds:
+            self.stdout.write(self.style.ERROR(
+                f'Fund {fund.name}: spent_amount (${fund.spent_amount}) != transaction sum (${fund.transaction_sum})'
+            ))
         
         # Summary
         total_inventory = Item.objects.aggregate(total=Sum('price'))['total'] or Decimal('0.00')
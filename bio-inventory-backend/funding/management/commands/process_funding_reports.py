@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from funding.models import FundingReport
+from funding.reports import generate_report
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate pending funding reports in this process, e.g. after a restart '
+        'dropped the background queue'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stale-minutes',
+            type=int,
+            default=30,
+            help='Requeue reports that have been running for longer than this (default 30)',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(minutes=options['stale_minutes'])
+        stale = FundingReport.objects.filter(
+            status=FundingReport.Status.RUNNING, started_at__lt=cutoff
+        ).update(status=FundingReport.Status.PENDING, started_at=None)
+        if stale:
+            self.stdout.write(self.style.WARNING(f'Requeued {stale} stale report(s)'))
+
+        pending = FundingReport.objects.filter(
+            status=FundingReport.Status.PENDING
+        ).order_by('generated_at').values_list('id', flat=True)
+
+        done = failed = 0
+        for report_id in list(pending):
+            if generate_report(report_id):
+                done += 1
+            elif FundingReport.objects.filter(pk=report_id, status=FundingReport.Status.FAILED).exists():
+                failed += 1
+                self.stdout.write(self.style.ERROR(f'Report #{report_id} failed'))
+
+        self.stdout.write(self.style.SUCCESS(f'Generated {done} report(s), {failed} failed'))
@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Sum, F, OuterRef, Subquery, Value, DecimalField
+from django.db.models.functions import Abs, Coalesce
+from decimal import Decimal
+
+from funding.models import BudgetAllocation, Transaction, archived_spend_total, signed_amount_expression
+from funding.utils import recalculate_allocation_spent_amounts
+
+
+class Command(BaseCommand):
+    help = 'Reconcile BudgetAllocation spent amounts with the categorized transaction ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fund',
+            type=int,
+            action='append',
+            dest='fund_ids',
+            help='Only reconcile allocations of the given fund id (can be repeated)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report drift without correcting it',
+        )
+
+    def handle(self, *args, **options):
+        fund_ids = options['fund_ids']
+        allocations = BudgetAllocation.objects.all()
+        if fund_ids:
+            allocations = allocations.filter(fund_id__in=fund_ids)
+
+        money = DecimalField(max_digits=14, decimal_places=2)
+        ledger = Transaction.objects.filter(
+            fund=OuterRef('fund'), category=OuterRef('category')
+        ).order_by().values('fund', 'category').annotate(
+            total=Sum(signed_amount_expression())
+        ).values('total')
+        drifted = allocations.annotate(
+            ledger_spent=Coalesce(Subquery(ledger, output_field=money), Value(Decimal('0.00'), output_field=money))
+            + archived_spend_total(fund='fund', category='category')
+        ).annotate(
+            drift=Abs(F('spent_amount') - F('ledger_spent'))
+        ).filter(drift__gt=Decimal('0.01')).select_related('fund').order_by('fund__name', 'category')
+
+        count = 0
+        for allocation in drifted:
+            count += 1
+            self.stdout.write(
+                f'{allocation.fund.name} / {allocation.category}: '
+                f'stored=${allocation.spent_amount}, ledger=${allocation.ledger_spent}'
+            )
+
+        if not count:
+            self.stdout.write(self.style.SUCCESS('All budget allocations match the ledger'))
+            return
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'{count} allocation(s) drifted; run without --dry-run to fix'))
+            return
+
+        recalculate_allocation_spent_amounts(allocations)
+        self.stdout.write(self.style.SUCCESS(f'Reconciled {count} allocation(s)'))
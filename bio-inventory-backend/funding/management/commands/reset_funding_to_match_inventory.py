@@ -1,10 +1,14 @@
 from django.core.management.base import BaseCommand
 from django.db import transaction
-from django.db.models import Sum
+from django.db.models import Sum, Max, F, Exists, OuterRef
+from django.db.models.functions import Abs, Coalesce
 from decimal import Decimal
 import random
 
-from funding.models import Fund, Transaction
+from funding.maintenance import ChunkedRun
+from funding.models import ArchivedSpend, Fund, Transaction, FundMonthlySpend, signed_amount_expression
+from funding.signals import suspend_ledger_signals
+from funding.utils import recalculate_fund_spent_amounts, recalculate_allocation_spent_amounts
 from requests.models import Request
 from items.models import Item
 
@@ -18,6 +22,22 @@ class Command(BaseCommand):
             action='store_true',
             help='Execute the reset (default is dry run)',
         )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Rows deleted or inserted per batch',
+        )
+        parser.add_argument(
+            '--resumable',
+            action='store_true',
+            help='Commit after every chunk and record a checkpoint; rerun with this flag to resume',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='With --resumable, discard any saved checkpoint and start over',
+        )
 
     def handle(self, *args, **options):
         execute = options['execute']
@@ -30,15 +50,28 @@ class Command(BaseCommand):
         
         # Step 2: Reset transaction amounts
         if execute:
-            with transaction.atomic():
-                self.reset_transactions()
-                self.recalculate_all_fund_amounts()
+            # Per-row signals are replaced by one recalculation at the end
+            with suspend_ledger_signals():
+                if options['resumable']:
+                    self.run_reset(options)
+                else:
+                    with transaction.atomic():
+                        self.run_reset(options)
         else:
             self.stdout.write('\nWould reset transactions and recalculate fund amounts.')
         
         # Step 3: Final verification
         self.verify_final_state()
 
+    def run_reset(self, options):
+        run = ChunkedRun(
+            self, 'reset_funding_to_match_inventory', ['delete', 'requests', 'items'],
+            chunk_size=options['chunk_size'], resumable=options['resumable'], restart=options['restart']
+        )
+        self.reset_transactions(run)
+        self.recalculate_all_fund_amounts()
+        run.finish()
+
     def analyze_current_situation(self):
         # Current totals
         inventory_total = Item.objects.aggregate(total=Sum('price'))['total'] or Decimal('0.00')
@@ -50,7 +83,9 @@ class Command(BaseCommand):
             status__in=['APPROVED', 'ORDERED', 'RECEIVED'],
             fund_id__isnull=False
         )
-        approved_requests_value = sum(req.unit_price * req.quantity for req in approved_requests)
+        approved_requests_value = approved_requests.aggregate(
+            total=Sum(F('unit_price') * F('quantity'))
+        )['total'] or Decimal('0.00')
         
         self.stdout.write('=== CURRENT SITUATION ===')
         self.stdout.write(f'Inventory Total Value: ${inventory_total:,}')
@@ -59,77 +94,97 @@ class Command(BaseCommand):
         self.stdout.write(f'Approved Requests Value: ${approved_requests_value:,}')
         self.stdout.write(f'Discrepancy: ${funding_spent - inventory_total:,}')
 
-    def reset_transactions(self):
+    def reset_transactions(self, run):
         self.stdout.write('\n=== RESETTING TRANSACTIONS ===')
         
-        # Delete all existing transactions
-        transaction_count = Transaction.objects.count()
-        Transaction.objects.all().delete()
-        self.stdout.write(f'Deleted {transaction_count} existing transactions')
+        # Only rows that existed before the reset are removed, so a resumed
+        # run never deletes transactions it created itself
+        if 'high_water' not in run.state:
+            run.state['high_water'] = Transaction.objects.aggregate(top=Max('id'))['top'] or 0
+            run.save()
+        
+        deleted = run.run_phase(
+            'delete',
+            Transaction.objects.filter(id__lte=run.state['high_water']).values('id'),
+            lambda rows: Transaction.objects.filter(id__in=[row['id'] for row in rows]).delete()
+        )
+        self.stdout.write(f'Deleted {deleted} existing transactions')
+        # Spending from detached ledger years is recreated below as well
+        ArchivedSpend.objects.all().delete()
         
         # Create transactions only for approved/ordered/received requests with funding
         requests_with_funding = Request.objects.filter(
             fund_id__isnull=False,
             status__in=['APPROVED', 'ORDERED', 'RECEIVED']
+        ).annotate(
+            fund_exists=Exists(Fund.objects.filter(id=OuterRef('fund_id')))
+        ).values(
+            'id', 'fund_id', 'fund_exists', 'unit_price', 'quantity', 'item_name', 'budget_category', 'requested_by_id'
         )
         
-        created_count = 0
-        for req in requests_with_funding:
-            try:
-                fund = Fund.objects.get(id=req.fund_id)
-                total_cost = req.unit_price * req.quantity
-                
-                Transaction.objects.create(
-                    fund=fund,
-                    amount=total_cost,
+        created = {'requests': 0, 'items': 0}
+        
+        def create_request_transactions(rows):
+            transactions = []
+            for req in rows:
+                if not req['fund_exists']:
+                    self.stdout.write(f"Warning: Request {req['id']} references non-existent fund {req['fund_id']}")
+                    continue
+                transactions.append(Transaction(
+                    fund_id=req['fund_id'],
+                    amount=req['unit_price'] * req['quantity'],
                     transaction_type='purchase',
-                    item_name=req.item_name,
-                    description=f"Purchase of {req.item_name} (Request #{req.id})",
-                    request_id=req.id,
-                    created_by=req.requested_by
-                )
-                created_count += 1
-                
-            except Fund.DoesNotExist:
-                self.stdout.write(f'Warning: Request {req.id} references non-existent fund {req.fund_id}')
-        
-        self.stdout.write(f'Created {created_count} new transactions based on actual requests')
+                    item_name=req['item_name'],
+                    description=f"Purchase of {req['item_name']} (Request #{req['id']})",
+                    request_id=req['id'],
+                    category=req['budget_category'] or None,
+                    created_by_id=req['requested_by_id']
+                ))
+            Transaction.objects.bulk_create(transactions)
+            created['requests'] += len(transactions)
+        
+        run.run_phase('requests', requests_with_funding, create_request_transactions)
+        self.stdout.write(f"Created {created['requests']} new transactions based on actual requests")
         
         # Add some transactions for existing inventory items that don't have associated requests
-        items_without_requests = Item.objects.filter(price__isnull=False)
-        existing_item_names = set(Transaction.objects.values_list('item_name', flat=True))
-        
-        funds_list = list(Fund.objects.all())
-        if funds_list:
-            for item in items_without_requests:
-                if item.name not in existing_item_names and item.price:
-                    # Assign to a random fund
-                    fund = random.choice(funds_list)
-                    
-                    Transaction.objects.create(
-                        fund=fund,
-                        amount=item.price,
+        fund_ids = list(Fund.objects.values_list('id', flat=True))
+        if fund_ids:
+            items_without_requests = Item.objects.filter(price__isnull=False).exclude(price=0).exclude(
+                Exists(Transaction.objects.filter(item_name=OuterRef('name'), request_id__isnull=False))
+            ).values('id', 'name', 'price', 'serial_number')
+            
+            def create_item_transactions(rows):
+                # Assign each item to a random fund
+                Transaction.objects.bulk_create([
+                    Transaction(
+                        fund_id=random.choice(fund_ids),
+                        amount=item['price'],
                         transaction_type='purchase',
-                        item_name=item.name,
-                        description=f"Inventory item: {item.name} (Serial: {item.serial_number})",
+                        item_name=item['name'],
+                        description=f"Inventory item: {item['name']} (Serial: {item['serial_number']})",
                         created_by_id=1  # Assume admin user
                     )
-                    created_count += 1
+                    for item in rows
+                ])
+                created['items'] += len(rows)
             
-            self.stdout.write(f'Total transactions created: {created_count}')
+            run.run_phase('items', items_without_requests, create_item_transactions)
+            self.stdout.write(f"Total transactions created: {created['requests'] + created['items']}")
 
     def recalculate_all_fund_amounts(self):
         self.stdout.write('\n=== RECALCULATING FUND AMOUNTS ===')
         
-        for fund in Fund.objects.all():
-            old_spent = fund.spent_amount
-            fund.recalculate_spent_amount()
-            fund.save()
-            
+        old_spent = dict(Fund.objects.values_list('id', 'spent_amount'))
+        recalculate_fund_spent_amounts()
+        recalculate_allocation_spent_amounts()
+        rollups = FundMonthlySpend.rebuild()
+        
+        for fund in Fund.objects.order_by('name'):
             self.stdout.write(f'Fund {fund.name}:')
-            self.stdout.write(f'  Old spent: ${old_spent:,}')
+            self.stdout.write(f'  Old spent: ${old_spent[fund.id]:,}')
             self.stdout.write(f'  New spent: ${fund.spent_amount:,}')
             self.stdout.write(f'  Remaining: ${fund.remaining_budget:,}')
+        self.stdout.write(f'Rebuilt {rollups} monthly spend rollups')
 
     def verify_final_state(self):
         self.stdout.write('\n=== FINAL VERIFICATION ===')
@@ -144,18 +199,18 @@ class Command(BaseCommand):
         self.stdout.write(f'Final Discrepancy: ${funding_spent - inventory_total:,}')
         
         # Check fund consistency
-        for fund in Fund.objects.all():
-            transaction_sum = fund.transactions.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-            if abs(fund.spent_amount - transaction_sum) > Decimal('0.01'):
-                self.stdout.write(self.style.ERROR(
-                    f'Inconsistency in {fund.name}: spent=${fund.spent_amount}, transactions=${transaction_sum}'
-                ))
+        inconsistent_funds = Fund.objects.annotate(
+            transaction_sum=Coalesce(Sum(signed_amount_expression('transactions__')), Decimal('0.00'))
+        ).annotate(
+            difference=Abs(F('spent_amount') - F('transaction_sum'))
+        ).filter(difference__gt=Decimal('0.01'))
+        for fund in inconsistent_funds:
+            self.stdout.write(self.style.ERROR(
+                f'Inconsistency in {fund.name}: spent=${fund.spent_amount}, transactions=${fund.transaction_sum}'
+            ))
         
         # Check for over-budget funds
-        over_budget_funds = []
-        for fund in Fund.objects.all():
-            if fund.spent_amount > fund.total_budget:
-                over_budget_funds.append(fund)
+        over_budget_funds = Fund.objects.filter(spent_amount__gt=F('total_budget'))
         
         if over_budget_funds:
             self.stdout.write(self.style.WARNING('Funds over budget:'))
@@ -0,0 +1,99 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from funding.partitioning import (
+    partitioning_enabled, is_partitioned, list_partitions, ensure_partitions,
+    partition_table, detach_year, open_funds_in_year
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Manage the yearly partitions of the funding transaction ledger (PostgreSQL). '
+        'Without options, lists the partitions.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--convert',
+            action='store_true',
+            help='Convert the plain transaction table into a partitioned one',
+        )
+        parser.add_argument(
+            '--ensure',
+            action='store_true',
+            help='Create missing partitions for the current and upcoming years',
+        )
+        parser.add_argument(
+            '--years-ahead',
+            type=int,
+            default=None,
+            help='With --ensure, how many future years to prepare (default FUNDING_PARTITION_YEARS_AHEAD)',
+        )
+        parser.add_argument(
+            '--detach',
+            type=int,
+            metavar='YEAR',
+            help='Detach a closed year from the live ledger and keep it as an archive table',
+        )
+        parser.add_argument(
+            '--drop',
+            action='store_true',
+            help='With --detach, drop the partition instead of keeping an archive table',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='With --detach, proceed even if active funds still have transactions in that year',
+        )
+
+    def handle(self, *args, **options):
+        if not partitioning_enabled():
+            raise CommandError(
+                'Transaction partitioning needs PostgreSQL and FUNDING_PARTITION_TRANSACTIONS=True'
+            )
+
+        if options['convert']:
+            with connection.schema_editor() as schema_editor:
+                partition_table(schema_editor)
+            self.stdout.write(self.style.SUCCESS('Transaction table is partitioned by year'))
+
+        with connection.cursor() as cursor:
+            if not is_partitioned(cursor):
+                raise CommandError('The transaction table is not partitioned; run with --convert first')
+
+        if options['ensure']:
+            created = ensure_partitions(options['years_ahead'])
+            if created:
+                self.stdout.write(self.style.SUCCESS(f"Created partitions for {', '.join(map(str, created))}"))
+            else:
+                self.stdout.write('All partitions already exist')
+
+        if options['detach']:
+            self.detach(options['detach'], options['drop'], options['force'])
+
+        self.list_partitions()
+
+    def detach(self, year, drop, force):
+        open_funds = list(open_funds_in_year(year).values_list('name', flat=True))
+        if open_funds and not force:
+            raise CommandError(
+                f'{len(open_funds)} active fund(s) have transactions in {year}: {", ".join(open_funds[:10])}. '
+                'Archive those funds first or pass --force.'
+            )
+
+        # The year's totals are kept as ArchivedSpend, so Fund.spent_amount,
+        # allocations and FundMonthlySpend survive recalculation; only the
+        # raw rows leave the live table
+        archive = detach_year(year, drop=drop)
+        if archive:
+            self.stdout.write(self.style.SUCCESS(f'Detached {year} into {archive}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Detached and dropped {year}'))
+
+    def list_partitions(self):
+        with connection.cursor() as cursor:
+            partitions = list_partitions(cursor)
+        self.stdout.write('Partitions (estimated rows):')
+        for name, year, rows in partitions:
+            self.stdout.write(f'  {name:<40} {rows:>12,}')
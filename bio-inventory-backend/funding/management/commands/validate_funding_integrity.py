@@ -1,117 +1,224 @@
+from concurrent.futures import ThreadPoolExecutor
 from django.core.management.base import BaseCommand
-from django.db.models import Sum
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Sum, Count, Q, F, Value, Exists, OuterRef, Subquery, DecimalField
+from django.db.models.functions import Abs, Coalesce
 from decimal import Decimal
+import json
+import time
 
-from funding.models import Fund, Transaction
+from funding.models import ArchivedSpend, Fund, Transaction, archived_spend_total, signed_amount_expression
 from requests.models import Request
 from items.models import Item
 
 
+TOLERANCE = Decimal('0.01')
+ZERO = Value(Decimal('0.00'), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
 class Command(BaseCommand):
     help = 'Validate funding data integrity and consistency'
 
+    checks = [
+        ('fund_transaction_consistency', 'Checking fund spent amounts vs transaction totals...'),
+        ('overall_data_consistency', 'Checking overall data consistency...'),
+        ('budget_constraints', 'Checking budget constraints...'),
+        ('transaction_request_consistency', 'Checking transaction-request consistency...'),
+    ]
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print a machine-readable JSON report instead of text',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=len(self.checks),
+            help='Checks to run concurrently, each on its own database connection (1 runs them in-line)',
+        )
+
     def handle(self, *args, **options):
+        started = time.perf_counter()
+        results = self.run_checks(max(options['workers'], 1))
+        duration = time.perf_counter() - started
+
+        if options['json']:
+            report = {
+                'ok': all(result['status'] != 'error' for result in results),
+                'duration_seconds': round(duration, 3),
+                'checks': results,
+            }
+            self.stdout.write(json.dumps(report, cls=DjangoJSONEncoder, indent=2))
+            return
+
         self.stdout.write('=== FUNDING DATA INTEGRITY CHECK ===\n')
-        
-        # Check 1: Fund spent amounts match transaction totals
-        self.check_fund_transaction_consistency()
-        
-        # Check 2: Overall data consistency  
-        self.check_overall_data_consistency()
-        
-        # Check 3: Budget constraints
-        self.check_budget_constraints()
-        
-        # Check 4: Transaction-Request consistency
-        self.check_transaction_request_consistency()
-        
-        self.stdout.write('\n=== INTEGRITY CHECK COMPLETE ===')
+        for number, ((name, title), result) in enumerate(zip(self.checks, results), start=1):
+            if number > 1:
+                self.stdout.write('')
+            self.stdout.write(f'{number}. {title}')
+            getattr(self, f'render_{name}')(result)
+        self.stdout.write(f'\n=== INTEGRITY CHECK COMPLETE ({duration:.2f}s) ===')
+
+    def run_checks(self, workers):
+        """
+        Run every check and return their results in declaration order.
+
+        The checks only read and don't depend on each other, so with more than
+        one worker each runs on a pool thread; Django gives every thread its
+        own connection, which is closed when the check finishes.
+        """
+        if workers == 1:
+            return [getattr(self, f'check_{name}')() for name, _ in self.checks]
+
+        def run(name):
+            try:
+                return getattr(self, f'check_{name}')()
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(run, [name for name, _ in self.checks]))
 
     def check_fund_transaction_consistency(self):
-        self.stdout.write('1. Checking fund spent amounts vs transaction totals...')
-        
-        inconsistent_funds = []
-        for fund in Fund.objects.all():
-            transaction_total = fund.transactions.aggregate(
-                total=Sum('amount')
-            )['total'] or Decimal('0.00')
-            
-            if abs(fund.spent_amount - transaction_total) > Decimal('0.01'):
-                inconsistent_funds.append((fund, fund.spent_amount, transaction_total))
-        
-        if inconsistent_funds:
-            self.stdout.write(self.style.ERROR('   INCONSISTENCIES FOUND:'))
-            for fund, spent, transaction_total in inconsistent_funds:
-                diff = spent - transaction_total
-                self.stdout.write(f'   - {fund.name}: Spent=${spent}, Transactions=${transaction_total}, Diff=${diff}')
-        else:
-            self.stdout.write(self.style.SUCCESS('   [OK] All funds consistent with transaction totals'))
+        # One GROUP BY over the ledger; mismatches are filtered in HAVING.
+        # Detached ledger years count through their archived totals
+        inconsistent_funds = Fund.objects.annotate(
+            transaction_total=Coalesce(Sum(signed_amount_expression('transactions__')), ZERO)
+            + archived_spend_total(fund='pk')
+        ).annotate(
+            difference=F('spent_amount') - F('transaction_total')
+        ).annotate(
+            abs_difference=Abs('difference')
+        ).filter(
+            abs_difference__gt=TOLERANCE
+        ).order_by('name').values('id', 'name', 'spent_amount', 'transaction_total', 'difference')
+
+        issues = list(inconsistent_funds)
+        return {
+            'check': 'fund_transaction_consistency',
+            'status': 'error' if issues else 'ok',
+            'issues': issues,
+        }
 
     def check_overall_data_consistency(self):
-        self.stdout.write('\n2. Checking overall data consistency...')
-        
         inventory_total = Item.objects.aggregate(total=Sum('price'))['total'] or Decimal('0.00')
         funding_spent = Fund.objects.aggregate(total=Sum('spent_amount'))['total'] or Decimal('0.00')
-        transaction_total = Transaction.objects.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-        
-        self.stdout.write(f'   Inventory Total: ${inventory_total:,}')
-        self.stdout.write(f'   Funding Spent: ${funding_spent:,}')
-        self.stdout.write(f'   Transaction Total: ${transaction_total:,}')
-        
-        if abs(funding_spent - transaction_total) > Decimal('0.01'):
-            self.stdout.write(self.style.ERROR(f'   [ERROR] Funding vs Transaction mismatch: ${funding_spent - transaction_total:,}'))
+        transaction_total = Transaction.objects.aggregate(
+            total=Sum(signed_amount_expression())
+        )['total'] or Decimal('0.00')
+        transaction_total += ArchivedSpend.objects.aggregate(
+            total=Sum(signed_amount_expression())
+        )['total'] or Decimal('0.00')
+
+        difference = funding_spent - transaction_total
+        return {
+            'check': 'overall_data_consistency',
+            'status': 'error' if abs(difference) > TOLERANCE else 'ok',
+            'inventory_total': inventory_total,
+            'funding_spent': funding_spent,
+            'transaction_total': transaction_total,
+            'difference': difference,
+        }
+
+    def check_budget_constraints(self):
+        over_budget_funds = Fund.objects.filter(
+            spent_amount__gt=F('total_budget')
+        ).annotate(
+            over_amount=F('spent_amount') - F('total_budget')
+        ).order_by('name').values('id', 'name', 'total_budget', 'spent_amount', 'over_amount')
+
+        issues = list(over_budget_funds)
+        return {
+            'check': 'budget_constraints',
+            'status': 'warning' if issues else 'ok',
+            'issues': issues,
+        }
+
+    def check_transaction_request_consistency(self):
+        requests = Request.objects.filter(id=OuterRef('request_id'))
+        linked = Transaction.objects.filter(request_id__isnull=False).annotate(
+            request_exists=Exists(requests),
+            expected_amount=Subquery(
+                requests.annotate(
+                    expected=F('unit_price') * F('quantity')
+                ).values('expected')[:1],
+                output_field=DecimalField(max_digits=14, decimal_places=2),
+            ),
+        )
+        mismatched = linked.filter(
+            Q(request_exists=False) | Q(amount__gt=F('expected_amount') + TOLERANCE)
+            | Q(amount__lt=F('expected_amount') - TOLERANCE)
+        ).order_by('id').values('id', 'request_id', 'amount', 'expected_amount', 'request_exists')
+
+        issues = [
+            {
+                'transaction_id': row['id'],
+                'request_id': row['request_id'],
+                'amount': row['amount'],
+                'expected_amount': row['expected_amount'],
+                'issue': 'amount_mismatch' if row['request_exists'] else 'request_not_found',
+            }
+            for row in mismatched
+        ]
+        counts = Transaction.objects.aggregate(
+            total=Count('id'),
+            linked=Count('id', filter=Q(request_id__isnull=False)),
+        )
+        return {
+            'check': 'transaction_request_consistency',
+            'status': 'warning' if issues else 'ok',
+            'issues': issues,
+            'total_transactions': counts['total'],
+            'linked_to_requests': counts['linked'],
+            'orphan_transactions': counts['total'] - counts['linked'],
+        }
+
+    def render_fund_transaction_consistency(self, result):
+        if result['issues']:
+            self.stdout.write(self.style.ERROR('   INCONSISTENCIES FOUND:'))
+            for fund in result['issues']:
+                self.stdout.write(
+                    f"   - {fund['name']}: Spent=${fund['spent_amount']}, "
+                    f"Transactions=${fund['transaction_total']}, Diff=${fund['difference']}"
+                )
+        else:
+            self.stdout.write(self.style.SUCCESS('   [OK] All funds consistent with transaction totals'))
+
+    def render_overall_data_consistency(self, result):
+        self.stdout.write(f"   Inventory Total: ${result['inventory_total']:,}")
+        self.stdout.write(f"   Funding Spent: ${result['funding_spent']:,}")
+        self.stdout.write(f"   Transaction Total: ${result['transaction_total']:,}")
+
+        if result['status'] == 'error':
+            self.stdout.write(self.style.ERROR(f"   [ERROR] Funding vs Transaction mismatch: ${result['difference']:,}"))
         else:
             self.stdout.write(self.style.SUCCESS('   [OK] Funding and transaction totals match'))
 
-    def check_budget_constraints(self):
-        self.stdout.write('\n3. Checking budget constraints...')
-        
-        over_budget_funds = []
-        for fund in Fund.objects.all():
-            if fund.spent_amount > fund.total_budget:
-                over_amount = fund.spent_amount - fund.total_budget
-                over_budget_funds.append((fund, over_amount))
-        
-        if over_budget_funds:
+    def render_budget_constraints(self, result):
+        if result['issues']:
             self.stdout.write(self.style.WARNING('   FUNDS OVER BUDGET:'))
-            for fund, over_amount in over_budget_funds:
-                self.stdout.write(f'   - {fund.name}: Over by ${over_amount:,}')
+            for fund in result['issues']:
+                self.stdout.write(f"   - {fund['name']}: Over by ${fund['over_amount']:,}")
         else:
             self.stdout.write(self.style.SUCCESS('   [OK] All funds within budget constraints'))
 
-    def check_transaction_request_consistency(self):
-        self.stdout.write('\n4. Checking transaction-request consistency...')
-        
-        # Check transactions with request_id
-        inconsistent_transactions = []
-        transactions_with_requests = Transaction.objects.filter(request_id__isnull=False)
-        
-        for transaction in transactions_with_requests:
-            try:
-                request = Request.objects.get(id=transaction.request_id)
-                expected_amount = request.unit_price * request.quantity
-                
-                if abs(transaction.amount - expected_amount) > Decimal('0.01'):
-                    inconsistent_transactions.append((transaction, expected_amount))
-                    
-            except Request.DoesNotExist:
-                inconsistent_transactions.append((transaction, 'Request not found'))
-        
-        if inconsistent_transactions:
+    def render_transaction_request_consistency(self, result):
+        if result['issues']:
             self.stdout.write(self.style.WARNING('   TRANSACTION-REQUEST INCONSISTENCIES:'))
-            for transaction, issue in inconsistent_transactions:
-                if isinstance(issue, str):
-                    self.stdout.write(f'   - Transaction {transaction.id}: {issue}')
+            for issue in result['issues']:
+                if issue['issue'] == 'request_not_found':
+                    self.stdout.write(f"   - Transaction {issue['transaction_id']}: Request not found")
                 else:
-                    self.stdout.write(f'   - Transaction {transaction.id}: Amount=${transaction.amount}, Expected=${issue}')
+                    self.stdout.write(
+                        f"   - Transaction {issue['transaction_id']}: "
+                        f"Amount=${issue['amount']}, Expected=${issue['expected_amount']}"
+                    )
         else:
             self.stdout.write(self.style.SUCCESS('   [OK] All transactions with request_id are consistent'))
-        
-        # Summary statistics
-        total_transactions = Transaction.objects.count()
-        transactions_with_requests_count = transactions_with_requests.count()
-        orphan_transactions = total_transactions - transactions_with_requests_count
-        
-        self.stdout.write(f'   Total transactions: {total_transactions}')
-        self.stdout.write(f'   Linked to requests: {transactions_with_requests_count}')
-        self.stdout.write(f'   Orphan transactions: {orphan_transactions}')
\ No newline at end of file
+
+        self.stdout.write(f"   Total transactions: {result['total_transactions']}")
+        self.stdout.write(f"   Linked to requests: {result['linked_to_requests']}")
+        self.stdout.write(f"   Orphan transactions: {result['orphan_transactions']}")
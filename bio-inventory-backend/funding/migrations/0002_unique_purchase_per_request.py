@@ -0,0 +1,49 @@
+# Generated by Django 5.2.4 on 2026-10-18 21:12
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def remove_duplicate_purchases(apps, schema_editor):
+    """Keep the earliest purchase per request and re-derive affected funds."""
+    Fund = apps.get_model('funding', 'Fund')
+    Transaction = apps.get_model('funding', 'Transaction')
+
+    duplicates = Transaction.objects.filter(
+        transaction_type='purchase', request_id__isnull=False
+    ).values('request_id').annotate(keep=Min('id'), n=Count('id')).filter(n__gt=1)
+
+    affected_funds = set()
+    for row in duplicates:
+        extra = Transaction.objects.filter(
+            transaction_type='purchase', request_id=row['request_id']
+        ).exclude(id=row['keep'])
+        affected_funds.update(extra.values_list('fund_id', flat=True))
+        extra.delete()
+
+    for fund in Fund.objects.filter(id__in=affected_funds):
+        spent = fund.transactions.filter(
+            transaction_type__in=['purchase', 'adjustment']
+        ).aggregate(total=Sum('amount'))['total'] or 0
+        refunds = fund.transactions.filter(
+            transaction_type='refund'
+        ).aggregate(total=Sum('amount'))['total'] or 0
+        fund.spent_amount = spent - refunds
+        fund.save(update_fields=['spent_amount'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('funding', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_purchases, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='transaction',
+            constraint=models.UniqueConstraint(condition=models.Q(('request_id__isnull', False), ('transaction_type', 'purchase')), fields=('request_id',), name='unique_purchase_per_request'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.4 on 2026-10-18 21:14
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def backfill_monthly_spend(apps, schema_editor):
+    Transaction = apps.get_model('funding', 'Transaction')
+    FundMonthlySpend = apps.get_model('funding', 'FundMonthlySpend')
+
+    rows = Transaction.objects.annotate(
+        month=TruncMonth('transaction_date', output_field=models.DateField())
+    ).values('fund_id', 'month', 'transaction_type').annotate(
+        total=Sum('amount'), count=Count('id')
+    ).order_by()
+    FundMonthlySpend.objects.bulk_create(
+        [FundMonthlySpend(**row) for row in rows], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('funding', '0002_unique_purchase_per_request'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FundMonthlySpend',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('transaction_type', models.CharField(choices=[('purchase', 'Purchase'), ('adjustment', 'Budget Adjustment'), ('transfer', 'Fund Transfer'), ('refund', 'Refund')], max_length=20)),
+                ('total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('fund', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_spend', to='funding.fund')),
+            ],
+            options={
+                'ordering': ['month', 'transaction_type'],
+                'unique_together': {('fund', 'month', 'transaction_type')},
+            },
+        ),
+        migrations.RunPython(backfill_monthly_spend, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-18 21:19
+
+import django.db.models.expressions
+import django.db.models.functions.comparison
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('funding', '0003_fund_monthly_spend'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='budgetallocation',
+            name='utilization',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(allocated_amount__gt=0, then=django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.functions.comparison.Cast('spent_amount', models.FloatField()), '*', models.Value(100.0)), '/', django.db.models.functions.comparison.Cast('allocated_amount', models.FloatField()))), default=models.Value(0.0), output_field=models.FloatField()), output_field=models.FloatField()),
+        ),
+        migrations.AddField(
+            model_name='fund',
+            name='utilization',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(then=django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.functions.comparison.Cast('spent_amount', models.FloatField()), '*', models.Value(100.0)), '/', django.db.models.functions.comparison.Cast('total_budget', models.FloatField())), total_budget__gt=0), default=models.Value(0.0), output_field=models.FloatField()), output_field=models.FloatField()),
+        ),
+        migrations.AddIndex(
+            model_name='budgetallocation',
+            index=models.Index(fields=['utilization'], name='funding_bud_utiliza_5fbbd3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fund',
+            index=models.Index(fields=['utilization'], name='funding_fun_utiliza_fce2c9_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.4 on 2026-10-18 21:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('funding', '0005_maintenance_checkpoint'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='category',
+            field=models.CharField(blank=True, help_text='BudgetAllocation category this transaction is charged to', max_length=100, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['fund', 'category'], name='funding_tra_fund_id_82593d_idx'),
+        ),
+    ]
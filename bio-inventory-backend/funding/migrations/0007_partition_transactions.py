@@ -0,0 +1,149 @@
+from django.conf import settings
+from django.db import migrations
+from django.utils import timezone
+
+# A frozen copy of what funding.partitioning did when this migration was
+# written, so later changes to that module cannot change this migration
+
+TABLE = 'funding_transaction'
+DEFAULT_PARTITION = f'{TABLE}_default'
+PURCHASE_CONSTRAINT = 'unique_purchase_per_request'
+PURCHASE_TRIGGER = 'funding_transaction_unique_purchase'
+
+PURCHASE_TRIGGER_SQL = f"""
+CREATE OR REPLACE FUNCTION {PURCHASE_TRIGGER}() RETURNS trigger AS $$
+BEGIN
+    IF NEW.transaction_type = 'purchase' AND NEW.request_id IS NOT NULL THEN
+        PERFORM pg_advisory_xact_lock(hashtext('{PURCHASE_TRIGGER}'), NEW.request_id);
+        IF EXISTS (
+            SELECT 1 FROM {TABLE}
+            WHERE request_id = NEW.request_id AND transaction_type = 'purchase' AND id <> NEW.id
+        ) THEN
+            RAISE EXCEPTION 'duplicate key value violates unique constraint "{PURCHASE_CONSTRAINT}"'
+                USING ERRCODE = 'unique_violation', CONSTRAINT = '{PURCHASE_CONSTRAINT}';
+        END IF;
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER {PURCHASE_TRIGGER}
+    BEFORE INSERT OR UPDATE OF request_id, transaction_type ON {TABLE}
+    FOR EACH ROW EXECUTE FUNCTION {PURCHASE_TRIGGER}();
+"""
+
+
+def partition_name(year):
+    return f'{TABLE}_y{year}'
+
+
+def year_bounds(year):
+    return f"'{year}-01-01 00:00:00+00'", f"'{year + 1}-01-01 00:00:00+00'"
+
+
+def is_partitioned(cursor):
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [TABLE])
+    row = cursor.fetchone()
+    return bool(row) and row[0] == 'p'
+
+
+def partition_transactions(apps, schema_editor):
+    # Opt-in, PostgreSQL only; see FUNDING_PARTITION_TRANSACTIONS
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    if not getattr(settings, 'FUNDING_PARTITION_TRANSACTIONS', False):
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        if is_partitioned(cursor):
+            return
+
+        # Index and foreign key definitions are replayed on the new parent;
+        # the primary key and purchase uniqueness change shape
+        cursor.execute("""
+            SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s
+        """, [TABLE])
+        index_sql = [
+            definition for name, definition in cursor.fetchall()
+            if name != f'{TABLE}_pkey' and name != PURCHASE_CONSTRAINT
+        ]
+        cursor.execute("""
+            SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+            WHERE conrelid = to_regclass(%s) AND contype = 'f'
+        """, [TABLE])
+        foreign_keys = cursor.fetchall()
+
+        cursor.execute(f"""
+            SELECT extract(year FROM min(transaction_date))::int, max(id) FROM {TABLE}
+        """)
+        first_year, max_id = cursor.fetchone()
+        current = timezone.now().year
+        first_year = min(first_year or current, current)
+
+        legacy = f'{TABLE}_unpartitioned'
+        cursor.execute(f'ALTER TABLE {TABLE} RENAME TO {legacy}')
+        cursor.execute(f"""
+            CREATE TABLE {TABLE} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+            PARTITION BY RANGE (transaction_date)
+        """)
+        cursor.execute(f'CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT')
+        years_ahead = getattr(settings, 'FUNDING_PARTITION_YEARS_AHEAD', 1)
+        for year in range(first_year, current + years_ahead + 1):
+            lower, upper = year_bounds(year)
+            cursor.execute(
+                f'CREATE TABLE {partition_name(year)} PARTITION OF {TABLE} '
+                f'FOR VALUES FROM ({lower}) TO ({upper})'
+            )
+
+        cursor.execute(f'INSERT INTO {TABLE} SELECT * FROM {legacy}')
+        cursor.execute(f'DROP TABLE {legacy}')
+
+        # ids keep coming from a sequence owned by the new table
+        cursor.execute(f'CREATE SEQUENCE {TABLE}_id_seq OWNED BY {TABLE}.id')
+        cursor.execute(f"SELECT setval('{TABLE}_id_seq', %s, %s)", [max_id or 1, max_id is not None])
+        cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{TABLE}_id_seq')")
+        cursor.execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_pkey PRIMARY KEY (id, transaction_date)')
+
+        for definition in index_sql:
+            cursor.execute(definition)
+        cursor.execute(
+            f"CREATE INDEX {TABLE}_purchase_request_idx ON {TABLE} (request_id) "
+            f"WHERE transaction_type = 'purchase' AND request_id IS NOT NULL"
+        )
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}')
+        cursor.execute(PURCHASE_TRIGGER_SQL)
+
+
+def unpartition_transactions(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    # Copy the attached partitions back into a plain table
+    with schema_editor.connection.cursor() as cursor:
+        if not is_partitioned(cursor):
+            return
+        cursor.execute(f'CREATE TEMPORARY TABLE {TABLE}_rows AS SELECT * FROM {TABLE}')
+        cursor.execute(f'DROP TABLE {TABLE} CASCADE')
+        cursor.execute(f'DROP FUNCTION IF EXISTS {PURCHASE_TRIGGER}()')
+
+    schema_editor.create_model(apps.get_model('funding', 'Transaction'))
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'INSERT INTO {TABLE} SELECT * FROM {TABLE}_rows')
+        cursor.execute(f'DROP TABLE {TABLE}_rows')
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence('{TABLE}', 'id'), coalesce(max(id), 1), max(id) IS NOT NULL) "
+            f"FROM {TABLE}"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('funding', '0006_allocation_category'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_transactions, unpartition_transactions),
+    ]
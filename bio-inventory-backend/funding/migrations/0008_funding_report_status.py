@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-18 21:49
+
+from django.db import migrations, models
+
+
+def mark_existing_reports_done(apps, schema_editor):
+    # Reports created before this migration were generated synchronously
+    FundingReport = apps.get_model('funding', 'FundingReport')
+    FundingReport.objects.update(status='done', completed_at=models.F('generated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('funding', '0007_partition_transactions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fundingreport',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='fundingreport',
+            name='error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='fundingreport',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='fundingreport',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.RunPython(mark_existing_reports_done, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-18 23:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('funding', '0008_funding_report_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedSpend',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('month', models.DateField()),
+                ('transaction_type', models.CharField(choices=[('purchase', 'Purchase'), ('adjustment', 'Budget Adjustment'), ('transfer', 'Fund Transfer'), ('refund', 'Refund')], max_length=20)),
+                ('category', models.CharField(blank=True, max_length=100, null=True)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('count', models.IntegerField()),
+                ('fund', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_spend', to='funding.fund')),
+            ],
+            options={
+                'ordering': ['month', 'transaction_type'],
+                'indexes': [models.Index(fields=['fund', 'category'], name='funding_arc_fund_id_baf88a_idx')],
+            },
+        ),
+    ]
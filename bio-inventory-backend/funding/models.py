@@ -1,8 +1,34 @@
-from django.db import models
-from django.db.models import Sum
+from django.db import models, transaction, IntegrityError
+from django.db.models import Sum, Q, F, OuterRef, Subquery
 from django.contrib.auth.models import User
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
 from django.core.validators import MinValueValidator
 from decimal import Decimal
+import datetime
+
+
+def utilization_expression(spent_field, budget_field):
+    """SQL counterpart of the ``utilization_percentage`` properties."""
+    # Computed in floating point: SQLite would integer-divide whole amounts
+    return models.Case(
+        models.When(
+            **{f'{budget_field}__gt': 0},
+            then=Cast(spent_field, models.FloatField()) * 100.0 / Cast(budget_field, models.FloatField())
+        ),
+        default=models.Value(0.0),
+        output_field=models.FloatField(),
+    )
+
+
+def signed_amount_expression(prefix=''):
+    """Transaction amount as it counts towards ``spent_amount``: refunds negative, transfers ignored."""
+    return models.Case(
+        models.When(**{f'{prefix}transaction_type__in': ['purchase', 'adjustment']}, then=F(f'{prefix}amount')),
+        models.When(**{f'{prefix}transaction_type': 'refund'}, then=-F(f'{prefix}amount')),
+        default=models.Value(Decimal('0.00')),
+        output_field=models.DecimalField(max_digits=14, decimal_places=2),
+    )
 
 
 class Fund(models.Model):
@@ -28,9 +54,18 @@ class Fund(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
+    # Stored generated column so utilization filters and ordering can use an index
+    utilization = models.GeneratedField(
+        expression=utilization_expression('spent_amount', 'total_budget'),
+        output_field=models.FloatField(),
+        db_persist=True,
+    )
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['utilization']),
+        ]
 
     def __str__(self):
         return self.name
@@ -58,7 +93,12 @@ class Fund(models.Model):
             transaction_type='refund'
         ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
         
-        self.spent_amount = purchases_and_adjustments - refunds
+        # Detached ledger years still count
+        archived = self.archived_spend.aggregate(
+            total=Sum(signed_amount_expression())
+        )['total'] or Decimal('0.00')
+        
+        self.spent_amount = purchases_and_adjustments - refunds + archived
         return self.spent_amount
 
 
@@ -80,16 +120,175 @@ class Transaction(models.Model):
     item_name = models.CharField(max_length=200, blank=True, null=True)
     description = models.TextField(blank=True, null=True)
     request_id = models.IntegerField(blank=True, null=True)  # Reference to requests.Request
+    category = models.CharField(
+        max_length=100, blank=True, null=True,
+        help_text="BudgetAllocation category this transaction is charged to"
+    )
     reference_number = models.CharField(max_length=100, blank=True, null=True)
     transaction_date = models.DateTimeField(auto_now_add=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
 
     class Meta:
         ordering = ['-transaction_date']
+        constraints = [
+            # A request is charged to its fund exactly once
+            models.UniqueConstraint(
+                fields=['request_id'],
+                condition=Q(transaction_type='purchase', request_id__isnull=False),
+                name='unique_purchase_per_request',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['fund', 'category']),
+        ]
 
     def __str__(self):
         return f"{self.fund.name} - ${self.amount} ({self.transaction_type})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Snapshot what this row currently contributes to FundMonthlySpend so
+        # an update can move the amount out of the old bucket
+        if all(name in instance.__dict__ for name in ('fund_id', 'transaction_type', 'amount', 'transaction_date')):
+            instance._rollup_snapshot = instance.rollup_snapshot()
+        if all(name in instance.__dict__ for name in ('fund_id', 'transaction_type', 'amount', 'category')):
+            instance._allocation_snapshot = instance.allocation_snapshot()
+        return instance
+
+    def rollup_snapshot(self):
+        """(fund_id, month, transaction_type, amount) used by FundMonthlySpend."""
+        if self.transaction_date is None:
+            return None
+        return (self.fund_id, month_start(self.transaction_date), self.transaction_type, self.amount)
+
+    def allocation_snapshot(self):
+        """(fund_id, category, signed amount) applied to BudgetAllocation.spent_amount."""
+        sign = {'purchase': 1, 'adjustment': 1, 'refund': -1}.get(self.transaction_type)
+        if not self.category or sign is None:
+            return None
+        return (self.fund_id, self.category, self.amount * sign)
+
+
+def month_start(value):
+    """First day of the month ``value`` falls in, in the current time zone."""
+    if isinstance(value, datetime.datetime):
+        value = timezone.localtime(value) if timezone.is_aware(value) else value
+        value = value.date()
+    return value.replace(day=1)
+
+
+class FundMonthlySpend(models.Model):
+    """Transaction totals per fund, month and type, kept in step with Transaction."""
+    fund = models.ForeignKey(Fund, on_delete=models.CASCADE, related_name='monthly_spend')
+    month = models.DateField()  # First day of the month
+    transaction_type = models.CharField(max_length=20, choices=Transaction.TRANSACTION_TYPE_CHOICES)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ['fund', 'month', 'transaction_type']
+        ordering = ['month', 'transaction_type']
+
+    def __str__(self):
+        return f"{self.fund.name} {self.month:%Y-%m} {self.transaction_type}: ${self.total}"
+
+    @classmethod
+    def record(cls, fund_id, month, transaction_type, amount, count):
+        """Atomically add ``amount``/``count`` (possibly negative) to a bucket."""
+        bucket = cls.objects.filter(fund_id=fund_id, month=month, transaction_type=transaction_type)
+        if bucket.update(total=F('total') + amount, count=F('count') + count):
+            return
+        if count <= 0:
+            # Nothing to take away from; a backfill will rebuild the bucket
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(
+                    fund_id=fund_id, month=month, transaction_type=transaction_type,
+                    total=amount, count=count
+                )
+        except IntegrityError:
+            # Created concurrently by another writer
+            bucket.update(total=F('total') + amount, count=F('count') + count)
+
+    @classmethod
+    def rebuild(cls, funds=None):
+        """Recompute buckets from the raw ledger. Returns the number of rows written."""
+        from django.db.models import Count
+        from django.db.models.functions import TruncMonth
+
+        ledger = Transaction.objects.all()
+        archived = ArchivedSpend.objects.all()
+        rollups = cls.objects.all()
+        if funds is not None:
+            ledger = ledger.filter(fund__in=funds)
+            archived = archived.filter(fund__in=funds)
+            rollups = rollups.filter(fund__in=funds)
+
+        buckets = {}
+        live = ledger.annotate(
+            month=TruncMonth('transaction_date', output_field=models.DateField())
+        ).values('fund_id', 'month', 'transaction_type').annotate(
+            total=Sum('amount'), count=Count('id')
+        ).order_by()
+        # Months of detached ledger years come from their archived totals
+        detached = archived.values('fund_id', 'month', 'transaction_type').annotate(
+            total=Sum('amount'), count=Sum('count')
+        ).order_by()
+        for row in [*live, *detached]:
+            key = (row['fund_id'], row['month'], row['transaction_type'])
+            total, count = buckets.get(key, (Decimal('0.00'), 0))
+            buckets[key] = (total + row['total'], count + row['count'])
+
+        with transaction.atomic():
+            rollups.delete()
+            created = cls.objects.bulk_create([
+                cls(fund_id=fund_id, month=month, transaction_type=transaction_type, total=total, count=count)
+                for (fund_id, month, transaction_type), (total, count) in buckets.items()
+            ], batch_size=1000)
+        return len(created)
+
+
+class ArchivedSpend(models.Model):
+    """
+    What a ledger year detached from the transaction table
+    (``funding.partitioning.detach_year``) contributed, per fund, month,
+    type and category. Totals recalculated from the live ledger add these
+    back, so detaching a year does not change them.
+    """
+    fund = models.ForeignKey(Fund, on_delete=models.CASCADE, related_name='archived_spend')
+    year = models.IntegerField()  # The detached partition
+    month = models.DateField()  # First day of the month
+    transaction_type = models.CharField(max_length=20, choices=Transaction.TRANSACTION_TYPE_CHOICES)
+    category = models.CharField(max_length=100, blank=True, null=True)
+    amount = models.DecimalField(max_digits=14, decimal_places=2)
+    count = models.IntegerField()
+
+    class Meta:
+        ordering = ['month', 'transaction_type']
+        indexes = [
+            models.Index(fields=['fund', 'category']),
+        ]
+
+    def __str__(self):
+        return f"{self.fund.name} {self.month:%Y-%m} {self.transaction_type} (archived): ${self.amount}"
+
+
+def archived_spend_total(**refs):
+    """
+    Signed ArchivedSpend total as a subquery correlated on ``refs`` (archived
+    field -> outer field), e.g. ``archived_spend_total(fund='pk')``. Zero when
+    nothing was archived.
+    """
+    money = models.DecimalField(max_digits=14, decimal_places=2)
+    archived = ArchivedSpend.objects.filter(
+        **{field: OuterRef(outer) for field, outer in refs.items()}
+    ).order_by().values(*refs).annotate(
+        total=Sum(signed_amount_expression())
+    ).values('total')
+    return Coalesce(Subquery(archived, output_field=money), models.Value(Decimal('0.00'), output_field=money))
+
 
 class BudgetAllocation(models.Model):
     fund = models.ForeignKey(Fund, on_delete=models.CASCADE, related_name='allocations')
@@ -107,14 +306,45 @@ class BudgetAllocation(models.Model):
     description = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    utilization = models.GeneratedField(
+        expression=utilization_expression('spent_amount', 'allocated_amount'),
+        output_field=models.FloatField(),
+        db_persist=True,
+    )
 
     class Meta:
         unique_together = ['fund', 'category']
         ordering = ['category']
+        indexes = [
+            models.Index(fields=['utilization']),
+        ]
 
     def __str__(self):
         return f"{self.fund.name} - {self.category}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_category = instance.__dict__.get('category')
+        return instance
+
+    def save(self, *args, **kwargs):
+        # spent_amount belongs to record() and recalculate_allocation_spent_amounts;
+        # writing back the value this instance loaded would undo their deltas
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and not field.generated and field.name != 'spent_amount'
+            ]
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def record(cls, fund_id, category, amount):
+        """Apply a spending delta to the matching allocation, if there is one."""
+        cls.objects.filter(fund_id=fund_id, category=category).update(
+            spent_amount=F('spent_amount') + amount
+        )
+
     @property
     def remaining_amount(self):
         return self.allocated_amount - self.spent_amount
@@ -127,6 +357,12 @@ class BudgetAllocation(models.Model):
 
 
 class FundingReport(models.Model):
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        RUNNING = 'running', 'Running'
+        DONE = 'done', 'Done'
+        FAILED = 'failed', 'Failed'
+
     REPORT_TYPE_CHOICES = [
         ('monthly', 'Monthly Report'),
         ('quarterly', 'Quarterly Report'),
@@ -140,6 +376,10 @@ class FundingReport(models.Model):
     end_date = models.DateField()
     funds = models.ManyToManyField(Fund, blank=True)
     summary_data = models.JSONField(default=dict)  # Store calculated summary data
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    error = models.TextField(blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
     generated_at = models.DateTimeField(auto_now_add=True)
     generated_by = models.ForeignKey(User, on_delete=models.CASCADE)
 
@@ -147,4 +387,18 @@ class FundingReport(models.Model):
         ordering = ['-generated_at']
 
     def __str__(self):
-        return f"{self.title} ({self.start_date} to {self.end_date})"
\ No newline at end of file
+        return f"{self.title} ({self.start_date} to {self.end_date})"
+
+
+class MaintenanceCheckpoint(models.Model):
+    """Progress of a resumable maintenance command, committed with each chunk."""
+    command = models.CharField(max_length=100, unique=True)
+    phase = models.CharField(max_length=50)
+    last_id = models.BigIntegerField(default=0)
+    processed = models.BigIntegerField(default=0)
+    state = models.JSONField(default=dict)
+    started_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.command}: {self.phase} after #{self.last_id}"
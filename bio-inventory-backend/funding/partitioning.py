@@ -0,0 +1,248 @@
+"""
+Optional yearly range partitioning of the funding transaction ledger.
+
+Only PostgreSQL is supported; on any other backend, or when
+``FUNDING_PARTITION_TRANSACTIONS`` is off, every entry point is a no-op.
+
+A partitioned table cannot carry a unique index that leaves out the
+partition key, so ``unique_purchase_per_request`` is enforced by a trigger
+that serializes inserts per request with an advisory lock and raises the same
+unique violation the index would have.
+"""
+import datetime
+
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+TABLE = 'funding_transaction'
+DEFAULT_PARTITION = f'{TABLE}_default'
+ARCHIVE_PREFIX = f'{TABLE}_archive_'
+PURCHASE_CONSTRAINT = 'unique_purchase_per_request'
+PURCHASE_TRIGGER = 'funding_transaction_unique_purchase'
+
+PURCHASE_TRIGGER_SQL = f"""
+CREATE OR REPLACE FUNCTION {PURCHASE_TRIGGER}() RETURNS trigger AS $$
+BEGIN
+    IF NEW.transaction_type = 'purchase' AND NEW.request_id IS NOT NULL THEN
+        PERFORM pg_advisory_xact_lock(hashtext('{PURCHASE_TRIGGER}'), NEW.request_id);
+        IF EXISTS (
+            SELECT 1 FROM {TABLE}
+            WHERE request_id = NEW.request_id AND transaction_type = 'purchase' AND id <> NEW.id
+        ) THEN
+            RAISE EXCEPTION 'duplicate key value violates unique constraint "{PURCHASE_CONSTRAINT}"'
+                USING ERRCODE = 'unique_violation', CONSTRAINT = '{PURCHASE_CONSTRAINT}';
+        END IF;
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER {PURCHASE_TRIGGER}
+    BEFORE INSERT OR UPDATE OF request_id, transaction_type ON {TABLE}
+    FOR EACH ROW EXECUTE FUNCTION {PURCHASE_TRIGGER}();
+"""
+
+
+def partition_name(year):
+    return f'{TABLE}_y{year}'
+
+
+def year_bounds(year):
+    return f"'{year}-01-01 00:00:00+00'", f"'{year + 1}-01-01 00:00:00+00'"
+
+
+def partitioning_enabled(using=connection):
+    return using.vendor == 'postgresql' and getattr(settings, 'FUNDING_PARTITION_TRANSACTIONS', False)
+
+
+def is_partitioned(cursor):
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [TABLE])
+    row = cursor.fetchone()
+    return bool(row) and row[0] == 'p'
+
+
+def list_partitions(cursor):
+    """[(name, lower bound year or None for the default partition, estimated rows)]"""
+    cursor.execute("""
+        SELECT child.relname, pg_get_expr(child.relpartbound, child.oid), child.reltuples
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.oid = to_regclass(%s)
+        ORDER BY child.relname
+    """, [TABLE])
+    partitions = []
+    for name, bound, rows in cursor.fetchall():
+        year = int(name.rsplit('_y', 1)[1]) if name.startswith(f'{TABLE}_y') else None
+        partitions.append((name, year, max(int(rows), 0)))
+    return partitions
+
+
+def create_year_partition(cursor, year):
+    """
+    Add the partition for ``year``. Rows that already landed in the default
+    partition for that year are moved into it.
+    """
+    lower, upper = year_bounds(year)
+    name = partition_name(year)
+    cursor.execute(f'ALTER TABLE {TABLE} DETACH PARTITION {DEFAULT_PARTITION}')
+    cursor.execute(
+        f'CREATE TABLE IF NOT EXISTS {name} PARTITION OF {TABLE} FOR VALUES FROM ({lower}) TO ({upper})'
+    )
+    cursor.execute(
+        f'WITH moved AS (DELETE FROM {DEFAULT_PARTITION} '
+        f'WHERE transaction_date >= {lower} AND transaction_date < {upper} RETURNING *) '
+        f'INSERT INTO {TABLE} SELECT * FROM moved'
+    )
+    cursor.execute(f'ALTER TABLE {TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT')
+
+
+def ensure_partitions(years_ahead=None):
+    """Create any missing partitions up to ``years_ahead`` years from now. Returns the years created."""
+    if not partitioning_enabled():
+        return []
+    if years_ahead is None:
+        years_ahead = getattr(settings, 'FUNDING_PARTITION_YEARS_AHEAD', 1)
+
+    created = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        if not is_partitioned(cursor):
+            return []
+        existing = {year for _, year, _ in list_partitions(cursor) if year is not None}
+        current = timezone.now().year
+        # Back-dated rows that fell into the default partition get a home too
+        cursor.execute(
+            f'SELECT DISTINCT extract(year FROM transaction_date)::int FROM {DEFAULT_PARTITION}'
+        )
+        stray = {row[0] for row in cursor.fetchall()}
+        wanted = set(range(min(existing | {current}), current + years_ahead + 1)) | stray
+        for year in sorted(wanted - existing):
+            if not table_exists(cursor, f'{ARCHIVE_PREFIX}{year}'):
+                create_year_partition(cursor, year)
+                created.append(year)
+    return created
+
+
+def table_exists(cursor, name):
+    cursor.execute('SELECT to_regclass(%s) IS NOT NULL', [name])
+    return cursor.fetchone()[0]
+
+
+def partition_table(schema_editor):
+    """Convert the plain transaction table into a partitioned one, keeping every row."""
+    with schema_editor.connection.cursor() as cursor:
+        if is_partitioned(cursor):
+            return
+
+        # Index and foreign key definitions are replayed on the new parent;
+        # the primary key and purchase uniqueness change shape
+        cursor.execute("""
+            SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s
+        """, [TABLE])
+        index_sql = [
+            definition for name, definition in cursor.fetchall()
+            if name != f'{TABLE}_pkey' and name != PURCHASE_CONSTRAINT
+        ]
+        cursor.execute("""
+            SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+            WHERE conrelid = to_regclass(%s) AND contype = 'f'
+        """, [TABLE])
+        foreign_keys = cursor.fetchall()
+
+        cursor.execute(f"""
+            SELECT extract(year FROM min(transaction_date))::int, max(id) FROM {TABLE}
+        """)
+        first_year, max_id = cursor.fetchone()
+        current = timezone.now().year
+        first_year = min(first_year or current, current)
+
+        legacy = f'{TABLE}_unpartitioned'
+        cursor.execute(f'ALTER TABLE {TABLE} RENAME TO {legacy}')
+        cursor.execute(f"""
+            CREATE TABLE {TABLE} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+            PARTITION BY RANGE (transaction_date)
+        """)
+        cursor.execute(f'CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT')
+        years_ahead = getattr(settings, 'FUNDING_PARTITION_YEARS_AHEAD', 1)
+        for year in range(first_year, current + years_ahead + 1):
+            lower, upper = year_bounds(year)
+            cursor.execute(
+                f'CREATE TABLE {partition_name(year)} PARTITION OF {TABLE} '
+                f'FOR VALUES FROM ({lower}) TO ({upper})'
+            )
+
+        cursor.execute(f'INSERT INTO {TABLE} SELECT * FROM {legacy}')
+        cursor.execute(f'DROP TABLE {legacy}')
+
+        # ids keep coming from a sequence owned by the new table
+        cursor.execute(f'CREATE SEQUENCE {TABLE}_id_seq OWNED BY {TABLE}.id')
+        cursor.execute(f"SELECT setval('{TABLE}_id_seq', %s, %s)", [max_id or 1, max_id is not None])
+        cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{TABLE}_id_seq')")
+        cursor.execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_pkey PRIMARY KEY (id, transaction_date)')
+
+        for definition in index_sql:
+            cursor.execute(definition)
+        cursor.execute(
+            f"CREATE INDEX {TABLE}_purchase_request_idx ON {TABLE} (request_id) "
+            f"WHERE transaction_type = 'purchase' AND request_id IS NOT NULL"
+        )
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}')
+        cursor.execute(PURCHASE_TRIGGER_SQL)
+
+
+def archive_year_totals(year):
+    """Record what ``year``'s partition contributes as ArchivedSpend rows. Returns the number of rows."""
+    from django.db.models import Count, Sum
+    from django.db.models.functions import TruncMonth
+
+    from .models import ArchivedSpend, Transaction
+
+    start = datetime.datetime(year, 1, 1, tzinfo=datetime.timezone.utc)
+    end = datetime.datetime(year + 1, 1, 1, tzinfo=datetime.timezone.utc)
+    # Months in the time zone FundMonthlySpend uses
+    rows = Transaction.objects.filter(
+        transaction_date__gte=start, transaction_date__lt=end
+    ).annotate(
+        month=TruncMonth('transaction_date', output_field=models.DateField())
+    ).values('fund_id', 'month', 'transaction_type', 'category').annotate(
+        amount=Sum('amount'), count=Count('id')
+    ).order_by()
+    return len(ArchivedSpend.objects.bulk_create([ArchivedSpend(year=year, **row) for row in rows]))
+
+
+def detach_year(year, drop=False):
+    """
+    Detach the partition for ``year`` from the live ledger. It is kept as
+    ``funding_transaction_archive_<year>`` unless ``drop`` is set. Returns the
+    archive table name, or None when dropped.
+
+    The year's totals are recorded as ArchivedSpend in the same transaction;
+    recalculations from the live ledger add them back.
+    """
+    name = partition_name(year)
+    with transaction.atomic(), connection.cursor() as cursor:
+        # No writes to the year between taking its totals and detaching it
+        cursor.execute(f'LOCK TABLE {name} IN SHARE MODE')
+        archive_year_totals(year)
+        cursor.execute(f'ALTER TABLE {TABLE} DETACH PARTITION {name}')
+        if drop:
+            cursor.execute(f'DROP TABLE {name}')
+            return None
+        archive = f'{ARCHIVE_PREFIX}{year}'
+        cursor.execute(f'ALTER TABLE {name} RENAME TO {archive}')
+        return archive
+
+
+def open_funds_in_year(year):
+    """Active funds with transactions in ``year``; archiving the year would take them out of their ledger."""
+    from .models import Fund
+
+    start = datetime.datetime(year, 1, 1, tzinfo=datetime.timezone.utc)
+    end = datetime.datetime(year + 1, 1, 1, tzinfo=datetime.timezone.utc)
+    return Fund.objects.filter(
+        transactions__transaction_date__gte=start,
+        transactions__transaction_date__lt=end,
+        is_archived=False,
+    ).distinct()
@@ -0,0 +1,183 @@
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, models, transaction
+from django.db.models import Sum, Count
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import Fund, Transaction, FundMonthlySpend, FundingReport
+from .utils import months_before
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def next_month(month):
+    return months_before(month, -1)
+
+
+def local_midnight(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def split_period(start_date, end_date):
+    """
+    Split the inclusive ``start_date``..``end_date`` range into the calendar
+    months it fully covers and the partial edges around them.
+
+    Returns ``(first_full_month, end_of_full_months, edges)`` where ``edges``
+    is a list of ``(start, end)`` datetime ranges, end exclusive.
+    """
+    period_start = local_midnight(start_date)
+    period_end = local_midnight(end_date + timedelta(days=1))
+
+    first_full = start_date if start_date.day == 1 else next_month(start_date.replace(day=1))
+    end_full = (end_date + timedelta(days=1)).replace(day=1)
+    if first_full >= end_full:
+        return None, None, [(period_start, period_end)]
+
+    edges = []
+    if period_start < local_midnight(first_full):
+        edges.append((period_start, local_midnight(first_full)))
+    if local_midnight(end_full) < period_end:
+        edges.append((local_midnight(end_full), period_end))
+    return first_full, end_full, edges
+
+
+def build_report_summary(report):
+    """
+    Summarize a report's period per fund and per month.
+
+    Whole months come from the FundMonthlySpend rollup, so overlapping
+    reports reuse the same precomputed partial sums; only the partial months
+    at either end of the period read the transaction ledger.
+    """
+    funds = report.funds.all()
+    if not funds.exists():
+        funds = Fund.objects.filter(is_archived=False)
+
+    totals = funds.aggregate(
+        budget=Sum('total_budget'), spent=Sum('spent_amount'), fund_count=Count('id')
+    )
+    cells = defaultdict(lambda: {'total': Decimal('0.00'), 'count': 0})
+
+    first_full, end_full, edges = split_period(report.start_date, report.end_date)
+    if first_full:
+        rollups = FundMonthlySpend.objects.filter(
+            fund__in=funds, month__gte=first_full, month__lt=end_full, count__gt=0
+        ).values('fund_id', 'month').annotate(total=Sum('total'), count=Sum('count')).order_by()
+        for row in rollups:
+            cell = cells[(row['fund_id'], row['month'])]
+            cell['total'] += row['total']
+            cell['count'] += row['count']
+
+    for start, end in edges:
+        ledger = Transaction.objects.filter(
+            fund__in=funds, transaction_date__gte=start, transaction_date__lt=end
+        ).annotate(
+            month=TruncMonth('transaction_date', output_field=models.DateField())
+        ).values('fund_id', 'month').annotate(total=Sum('amount'), count=Count('id')).order_by()
+        for row in ledger:
+            cell = cells[(row['fund_id'], row['month'])]
+            cell['total'] += row['total']
+            cell['count'] += row['count']
+
+    months = []
+    month = report.start_date.replace(day=1)
+    while month <= report.end_date:
+        months.append(month)
+        month = next_month(month)
+
+    fund_rows = []
+    for fund_id, name in funds.order_by('name').values_list('id', 'name'):
+        monthly = {
+            month.strftime('%Y-%m'): {
+                'total': float(cells[(fund_id, month)]['total']),
+                'count': cells[(fund_id, month)]['count'],
+            }
+            for month in months
+            if (fund_id, month) in cells
+        }
+        fund_rows.append({
+            'fund_id': fund_id,
+            'fund_name': name,
+            'period_spending': sum(entry['total'] for entry in monthly.values()),
+            'transaction_count': sum(entry['count'] for entry in monthly.values()),
+            'monthly': monthly,
+        })
+
+    return {
+        'total_budget': float(totals['budget'] or Decimal('0.00')),
+        'total_spent': float(totals['spent'] or Decimal('0.00')),
+        'period_spending': float(sum(cell['total'] for cell in cells.values())),
+        'fund_count': totals['fund_count'],
+        'transaction_count': sum(cell['count'] for cell in cells.values()),
+        'months': [month.strftime('%Y-%m') for month in months],
+        'funds': fund_rows,
+        'generated_date': timezone.now().isoformat(),
+    }
+
+
+def generate_report(report_id):
+    """
+    Run one report through running -> done (or failed). Returns False if the
+    report was not pending, e.g. because another worker already claimed it.
+    """
+    claimed = FundingReport.objects.filter(
+        pk=report_id, status=FundingReport.Status.PENDING
+    ).update(status=FundingReport.Status.RUNNING, started_at=timezone.now())
+    if not claimed:
+        return False
+
+    report = FundingReport.objects.get(pk=report_id)
+    try:
+        summary_data = build_report_summary(report)
+    except Exception as e:
+        logger.exception(f"Funding report {report_id} failed")
+        FundingReport.objects.filter(pk=report_id).update(
+            status=FundingReport.Status.FAILED, error=str(e), completed_at=timezone.now()
+        )
+        return False
+
+    FundingReport.objects.filter(pk=report_id).update(
+        status=FundingReport.Status.DONE, summary_data=summary_data,
+        error='', completed_at=timezone.now()
+    )
+    return True
+
+
+def _run_in_background(report_id):
+    try:
+        generate_report(report_id)
+    finally:
+        close_old_connections()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'FUNDING_REPORT_WORKERS', 2),
+                thread_name_prefix='funding-report',
+            )
+        return _executor
+
+
+def enqueue_report(report_id):
+    """Generate the report once the surrounding transaction commits."""
+    def submit():
+        if getattr(settings, 'FUNDING_REPORTS_ASYNC', True):
+            _get_executor().submit(_run_in_background, report_id)
+        else:
+            generate_report(report_id)
+
+    transaction.on_commit(submit)
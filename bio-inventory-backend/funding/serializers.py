@@ -39,7 +39,7 @@ class TransactionSerializer(serializers.ModelSerializer):
         model = Transaction
         fields = [
             'id', 'fund', 'fund_id', 'amount', 'transaction_type',
-            'item_name', 'description', 'request_id', 'reference_number',
+            'item_name', 'description', 'request_id', 'category', 'reference_number',
             'transaction_date', 'created_by'
         ]
         read_only_fields = ['transaction_date', 'created_by']
@@ -76,9 +76,13 @@ class FundingReportSerializer(serializers.ModelSerializer):
         model = FundingReport
         fields = [
             'id', 'title', 'report_type', 'start_date', 'end_date',
-            'funds', 'fund_ids', 'summary_data', 'generated_at', 'generated_by'
+            'funds', 'fund_ids', 'summary_data', 'status', 'error', 'started_at',
+            'completed_at', 'generated_at', 'generated_by'
+        ]
+        read_only_fields = [
+            'summary_data', 'status', 'error', 'started_at', 'completed_at',
+            'generated_at', 'generated_by'
         ]
-        read_only_fields = ['summary_data', 'generated_at', 'generated_by']
 
     def create(self, validated_data):
         fund_ids = validated_data.pop('fund_ids', [])
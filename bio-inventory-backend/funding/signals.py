@@ -1,7 +1,9 @@
+from contextlib import contextmanager
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from decimal import Decimal
-from .models import Transaction, BudgetAllocation
+from .models import Transaction, BudgetAllocation, FundMonthlySpend
+from .utils import recalculate_allocation_spent_amounts
 
 
 @receiver(post_save, sender=Transaction)
@@ -17,4 +19,97 @@ def recalculate_fund_on_transaction_delete(sender, instance, **kwargs):
     """Automatically recalculate fund spent amount when a transaction is deleted"""
     if instance.fund:
         instance.fund.recalculate_spent_amount()
-        instance.fund.save(update_fields=['spent_amount'])
\ No newline at end of file
+        instance.fund.save(update_fields=['spent_amount'])
+
+
+@receiver(post_save, sender=Transaction)
+def update_monthly_spend_on_transaction_save(sender, instance, **kwargs):
+    """Move the transaction's amount into its FundMonthlySpend bucket"""
+    previous = getattr(instance, '_rollup_snapshot', None)
+    current = instance.rollup_snapshot()
+    if previous == current:
+        return
+
+    if previous:
+        fund_id, month, transaction_type, amount = previous
+        FundMonthlySpend.record(fund_id, month, transaction_type, -amount, -1)
+    if current:
+        fund_id, month, transaction_type, amount = current
+        FundMonthlySpend.record(fund_id, month, transaction_type, amount, 1)
+    instance._rollup_snapshot = current
+
+
+@receiver(post_delete, sender=Transaction)
+def update_monthly_spend_on_transaction_delete(sender, instance, **kwargs):
+    """Take a deleted transaction's amount back out of its bucket"""
+    snapshot = getattr(instance, '_rollup_snapshot', None) or instance.rollup_snapshot()
+    if snapshot:
+        fund_id, month, transaction_type, amount = snapshot
+        FundMonthlySpend.record(fund_id, month, transaction_type, -amount, -1)
+
+
+@receiver(post_save, sender=Transaction)
+def update_allocation_on_transaction_save(sender, instance, **kwargs):
+    """Move the transaction's amount between BudgetAllocation categories"""
+    previous = getattr(instance, '_allocation_snapshot', None)
+    current = instance.allocation_snapshot()
+    if previous == current:
+        return
+
+    if previous:
+        fund_id, category, amount = previous
+        BudgetAllocation.record(fund_id, category, -amount)
+    if current:
+        fund_id, category, amount = current
+        BudgetAllocation.record(fund_id, category, amount)
+    instance._allocation_snapshot = current
+
+
+@receiver(post_delete, sender=Transaction)
+def update_allocation_on_transaction_delete(sender, instance, **kwargs):
+    """Take a deleted transaction's amount back out of its allocation"""
+    snapshot = getattr(instance, '_allocation_snapshot', None) or instance.allocation_snapshot()
+    if snapshot:
+        fund_id, category, amount = snapshot
+        BudgetAllocation.record(fund_id, category, -amount)
+
+
+@receiver(post_save, sender=BudgetAllocation)
+def initialize_allocation_spent_amount(sender, instance, created, **kwargs):
+    """Pick up existing ledger entries when an allocation is created or recategorized"""
+    if not created and getattr(instance, '_loaded_category', None) == instance.category:
+        return
+
+    allocation = BudgetAllocation.objects.filter(pk=instance.pk)
+    recalculate_allocation_spent_amounts(allocation)
+    instance.spent_amount = allocation.values_list('spent_amount', flat=True).get()
+    instance._loaded_category = instance.category
+
+
+LEDGER_RECEIVERS = [
+    (post_save, recalculate_fund_on_transaction_save),
+    (post_delete, recalculate_fund_on_transaction_delete),
+    (post_save, update_monthly_spend_on_transaction_save),
+    (post_delete, update_monthly_spend_on_transaction_delete),
+    (post_save, update_allocation_on_transaction_save),
+    (post_delete, update_allocation_on_transaction_delete),
+]
+
+
+@contextmanager
+def suspend_ledger_signals():
+    """
+    Disconnect the per-row Transaction receivers for bulk maintenance.
+
+    This is process-wide, so only use it from management commands. With no
+    listeners left, ``QuerySet.delete()`` on transactions becomes a plain
+    DELETE. Callers must recalculate fund and allocation spent amounts and
+    rebuild FundMonthlySpend when they are done.
+    """
+    for signal, handler in LEDGER_RECEIVERS:
+        signal.disconnect(handler, sender=Transaction)
+    try:
+        yield
+    finally:
+        for signal, handler in LEDGER_RECEIVERS:
+            signal.connect(handler, sender=Transaction)
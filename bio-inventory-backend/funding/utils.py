@@ -1,8 +1,156 @@
 from decimal import Decimal
 from datetime import datetime, timedelta
-from django.db.models import Sum, Count, Q, F
+from django.db.models import (
+    Sum, Count, Q, F, Avg, OuterRef, Subquery, Value, DecimalField, DateField, Func, Window
+)
+from django.db.models.functions import Coalesce, Trunc
 from django.utils import timezone
-from .models import Fund, Transaction, BudgetAllocation
+import numpy as np
+from .models import (
+    Fund, Transaction, BudgetAllocation, FundMonthlySpend, month_start, signed_amount_expression,
+    archived_spend_total
+)
+
+
+def months_before(month, count):
+    """First day of the month ``count`` months before ``month``."""
+    index = month.year * 12 + month.month - 1 - count
+    return month.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+
+def recalculate_fund_spent_amounts(funds=None):
+    """
+    Set-based ``Fund.recalculate_spent_amount`` for many funds: one UPDATE with
+    a correlated ledger SUM, plus the fund's archived spend. Returns the
+    number of funds updated.
+    """
+    funds = Fund.objects.all() if funds is None else funds
+    ledger = Transaction.objects.filter(fund=OuterRef('pk')).order_by().values('fund').annotate(
+        total=Sum(signed_amount_expression())
+    ).values('total')
+    return funds.update(spent_amount=Coalesce(
+        Subquery(ledger, output_field=DecimalField(max_digits=14, decimal_places=2)),
+        Value(Decimal('0.00'), output_field=DecimalField(max_digits=14, decimal_places=2)),
+    ) + archived_spend_total(fund='pk'))
+
+
+def recalculate_allocation_spent_amounts(allocations=None):
+    """
+    Rebuild BudgetAllocation.spent_amount from the categorized ledger and
+    archived spend in one UPDATE. Returns the number of allocations updated.
+    """
+    allocations = BudgetAllocation.objects.all() if allocations is None else allocations
+    ledger = Transaction.objects.filter(
+        fund=OuterRef('fund'), category=OuterRef('category')
+    ).order_by().values('fund', 'category').annotate(
+        total=Sum(signed_amount_expression())
+    ).values('total')
+    return allocations.update(spent_amount=Coalesce(
+        Subquery(ledger, output_field=DecimalField(max_digits=14, decimal_places=2)),
+        Value(Decimal('0.00'), output_field=DecimalField(max_digits=14, decimal_places=2)),
+    ) + archived_spend_total(fund='fund', category='category'))
+
+
+BURN_DOWN_GRANULARITIES = ('day', 'week', 'month')
+BURN_DOWN_MAX_POINTS = 500
+
+
+class RunningSum(Func):
+    """``SUM(expr)`` usable in a window over an already aggregated value."""
+    function = 'SUM'
+    window_compatible = True
+
+
+def truncate_date(day, granularity):
+    """Start of the ``granularity`` bucket ``day`` falls in, matching ``Trunc``."""
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(day, granularity):
+    if granularity == 'week':
+        return day + timedelta(days=7)
+    if granularity == 'month':
+        return months_before(day, -1)
+    return day + timedelta(days=1)
+
+
+def get_burn_down(fund, granularity='week'):
+    """
+    Cumulative spend, remaining budget and the ideal linear burn for ``fund``,
+    one point per ``granularity`` bucket from its start to its end date.
+
+    Running totals come from a single grouped query with ``SUM() OVER``, so
+    the cost does not depend on how the client would page the ledger. Buckets
+    without transactions carry the previous total forward.
+    """
+    money = DecimalField(max_digits=14, decimal_places=2)
+    rows = list(
+        Transaction.objects.filter(fund=fund).annotate(
+            bucket=Trunc('transaction_date', granularity, output_field=DateField())
+        ).values('bucket').annotate(
+            spent=Sum(signed_amount_expression())
+        ).annotate(
+            cumulative=Window(
+                RunningSum(Sum(signed_amount_expression()), output_field=money),
+                order_by=F('bucket').asc()
+            )
+        ).order_by('bucket')
+    )
+
+    today = timezone.localdate()
+    start = fund.start_date or (rows[0]['bucket'] if rows else today)
+    end = fund.end_date or today
+    if rows and rows[-1]['bucket'] > end:
+        end = rows[-1]['bucket']
+
+    first_bucket = truncate_date(start, granularity)
+    if end < first_bucket:
+        end = first_bucket
+    buckets = [first_bucket]
+    while next_bucket(buckets[-1], granularity) <= end:
+        buckets.append(next_bucket(buckets[-1], granularity))
+        if len(buckets) > BURN_DOWN_MAX_POINTS:
+            raise ValueError(
+                f'{granularity} granularity gives more than {BURN_DOWN_MAX_POINTS} points; use a coarser one'
+            )
+
+    # Spending before the first bucket is the opening balance
+    by_bucket = {row['bucket']: row for row in rows}
+    cumulative = Decimal('0.00')
+    for row in rows:
+        if row['bucket'] >= first_bucket:
+            break
+        cumulative = row['cumulative']
+
+    budget = fund.total_budget
+    span = (end - start).days
+    points = []
+    for bucket in buckets:
+        row = by_bucket.get(bucket)
+        if row:
+            cumulative = row['cumulative']
+        elapsed = min(max((bucket - start).days, 0), span)
+        ideal = budget * Decimal(span - elapsed) / Decimal(span) if span else Decimal('0.00')
+        points.append({
+            'period': bucket,
+            'spent': row['spent'] if row else Decimal('0.00'),
+            'cumulative_spent': cumulative,
+            'remaining': budget - cumulative,
+            'ideal_remaining': ideal.quantize(Decimal('0.01')),
+        })
+
+    return {
+        'fund_id': fund.id,
+        'granularity': granularity,
+        'start_date': start,
+        'end_date': end,
+        'total_budget': budget,
+        'points': points,
+    }
 
 
 def calculate_budget_health_score(fund):
@@ -37,15 +185,19 @@ def calculate_budget_health_score(fund):
 
 def get_spending_predictions(fund, months_ahead=6):
     """Predict future spending based on historical trends"""
-    # Get recent transactions (last 90 days)
-    recent_date = timezone.now() - timedelta(days=90)
-    recent_transactions = Transaction.objects.filter(
+    # Recent spending: the last three complete months, read from the
+    # FundMonthlySpend rollup instead of the raw ledger. The current month is
+    # left out so a few days of it do not drag the average down
+    current_month = month_start(timezone.now())
+    recent_months = FundMonthlySpend.objects.filter(
         fund=fund,
-        transaction_date__gte=recent_date,
-        transaction_type__in=['purchase', 'adjustment']
-    )
+        month__gte=months_before(current_month, 3),
+        month__lt=current_month,
+        transaction_type__in=['purchase', 'adjustment'],
+        count__gt=0
+    ).aggregate(total=Sum('total'), count=Sum('count'))
     
-    if not recent_transactions.exists():
+    if not recent_months['count']:
         return {
             'predicted_monthly_spend': Decimal('0.00'),
             'predicted_total': Decimal('0.00'),
@@ -54,9 +206,7 @@ def get_spending_predictions(fund, months_ahead=6):
         }
     
     # Calculate average monthly spending
-    total_recent_spending = recent_transactions.aggregate(
-        total=Sum('amount')
-    )['total'] or Decimal('0.00')
+    total_recent_spending = recent_months['total'] or Decimal('0.00')
     
     monthly_avg = total_recent_spending / 3  # Last 3 months
     predicted_total = monthly_avg * months_ahead
@@ -86,13 +236,20 @@ def get_spending_predictions(fund, months_ahead=6):
     }
 
 
-def generate_fund_recommendations(fund):
-    """Generate actionable recommendations for fund management"""
+def generate_fund_recommendations(fund, health_score=None, predictions=None):
+    """
+    Generate actionable recommendations for fund management.
+    
+    Pass ``health_score``/``predictions`` when they are already computed to
+    avoid recalculating them (and re-running the prediction query).
+    """
     recommendations = []
     
     utilization = fund.utilization_percentage
-    health_score = calculate_budget_health_score(fund)
-    predictions = get_spending_predictions(fund)
+    if health_score is None:
+        health_score = calculate_budget_health_score(fund)
+    if predictions is None:
+        predictions = get_spending_predictions(fund)
     
     # Budget utilization recommendations
     if utilization < 30:
@@ -163,28 +320,159 @@ def generate_fund_recommendations(fund):
     return recommendations
 
 
+def calculate_fund_health_batch(funds=None, months_ahead=6):
+    """
+    Health score, burn rate, exhaustion date, risk level and recommendations
+    for many funds at once.
+    
+    Applies the same rules as calculate_budget_health_score and
+    get_spending_predictions, but recent spend for every fund comes from one
+    grouped query and the scoring runs as NumPy array math.
+    """
+    if funds is None:
+        funds = Fund.objects.filter(is_archived=False)
+    fund_list = list(funds)
+    if not fund_list:
+        return []
+    
+    now = timezone.now()
+    today = now.date()
+    current_month = month_start(now)
+    
+    # Recent spend per fund, same window as get_spending_predictions
+    recent = {
+        row['fund_id']: row
+        for row in FundMonthlySpend.objects.filter(
+            fund__in=funds,
+            month__gte=months_before(current_month, 3),
+            month__lt=current_month,
+            transaction_type__in=['purchase', 'adjustment'],
+            count__gt=0
+        ).values('fund_id').annotate(total=Sum('total'), count=Sum('count')).order_by()
+    }
+    
+    budget = np.array([float(fund.total_budget) for fund in fund_list])
+    spent = np.array([float(fund.spent_amount) for fund in fund_list])
+    recent_total = np.array([float(recent[fund.id]['total']) if fund.id in recent else 0.0 for fund in fund_list])
+    has_recent = np.array([fund.id in recent for fund in fund_list])
+    has_dates = np.array([bool(fund.start_date and fund.end_date) for fund in fund_list])
+    total_days = np.array([
+        (fund.end_date - fund.start_date).days if fund.start_date and fund.end_date else 0
+        for fund in fund_list
+    ], dtype=float)
+    remaining_days = np.array([
+        (fund.end_date - today).days if fund.start_date and fund.end_date else 0
+        for fund in fund_list
+    ], dtype=float)
+    
+    # Health score
+    utilization = np.divide(spent * 100, budget, out=np.zeros_like(budget), where=budget > 0)
+    timed = has_dates & (total_days > 0)
+    time_progress = np.divide(
+        (total_days - remaining_days) * 100, total_days, out=np.zeros_like(budget), where=timed
+    )
+    time_score = np.where(timed, np.maximum(0, 100 - np.abs(time_progress - utilization)), 100.0)
+    util_score = np.where(
+        utilization < 50,
+        utilization * 1.5,
+        np.where(utilization > 90, np.maximum(0, 100 - (utilization - 90) * 10), 100.0)
+    )
+    health_score = np.round(time_score * 0.6 + util_score * 0.4, 1)
+    
+    # Burn rate and exhaustion
+    monthly_avg = recent_total / 3  # Last 3 months
+    remaining_budget = budget - spent
+    burning = monthly_avg > 0
+    months_until_exhaustion = np.divide(
+        remaining_budget, monthly_avg, out=np.zeros_like(budget), where=burning
+    )
+    # Compared in cents: get_spending_predictions compares exact Decimals,
+    # and float error must not tip a fund burning exactly its remaining budget
+    overspending = np.round(monthly_avg * 12, 2) > np.round(remaining_budget, 2)
+    risk_level = np.select(
+        [~has_recent, utilization > 90, utilization > 75, overspending],
+        ['low', 'critical', 'high', 'medium'],
+        default='low'
+    )
+    
+    results = []
+    for i, fund in enumerate(fund_list):
+        predictions = {
+            'predicted_monthly_spend': round(float(monthly_avg[i]), 2),
+            'predicted_total': round(float(monthly_avg[i] * months_ahead), 2),
+            'budget_exhaustion_date': (
+                now + timedelta(days=30 * float(months_until_exhaustion[i]))
+                if burning[i] else None
+            ),
+            'burn_rate_per_day': round(float(monthly_avg[i] / 30), 2),
+            'risk_level': str(risk_level[i])
+        }
+        score = float(health_score[i])
+        results.append({
+            'fund_id': fund.id,
+            'fund_name': fund.name,
+            'utilization_percentage': round(float(utilization[i]), 2),
+            'remaining_budget': round(float(remaining_budget[i]), 2),
+            'health_score': score,
+            'predictions': predictions,
+            'recommendations': generate_fund_recommendations(
+                fund, health_score=score, predictions=predictions
+            )
+        })
+    return results
+
+
+def get_portfolio_statistics(funds):
+    """
+    Totals, average utilization and risk buckets for a set of funds, computed
+    by the database in a single aggregate query.
+    """
+    def budget_share(ratio):
+        return F('total_budget') * Decimal(ratio)
+    
+    stats = funds.aggregate(
+        budget_sum=Sum('total_budget'),
+        spent_sum=Sum('spent_amount'),
+        fund_count=Count('id'),
+        average_utilization=Avg('utilization'),
+        critical=Count('id', filter=Q(spent_amount__gt=budget_share('0.95'))),
+        high=Count('id', filter=Q(
+            spent_amount__gt=budget_share('0.85'),
+            spent_amount__lte=budget_share('0.95')
+        )),
+        medium=Count('id', filter=Q(
+            spent_amount__gt=budget_share('0.65'),
+            spent_amount__lte=budget_share('0.85')
+        )),
+        low=Count('id', filter=Q(spent_amount__lte=budget_share('0.65'))),
+        near_limit=Count('id', filter=Q(total_budget__gt=0, spent_amount__gte=budget_share('0.90'))),
+        over_budget=Count('id', filter=Q(spent_amount__gt=F('total_budget'))),
+    )
+    
+    return {
+        'total_budget': stats['budget_sum'] or Decimal('0.00'),
+        'total_spent': stats['spent_sum'] or Decimal('0.00'),
+        'fund_count': stats['fund_count'],
+        'average_utilization': stats['average_utilization'] or 0,
+        'risk_distribution': {
+            'critical': stats['critical'],
+            'high': stats['high'],
+            'medium': stats['medium'],
+            'low': stats['low'],
+        },
+        'funds_near_limit': stats['near_limit'],
+        'funds_over_budget': stats['over_budget'],
+    }
+
+
 def get_cross_fund_analysis():
     """Analyze spending patterns across all funds"""
     active_funds = Fund.objects.filter(is_archived=False)
     
-    # Overall statistics
-    total_budget = active_funds.aggregate(total=Sum('total_budget'))['total'] or Decimal('0.00')
-    total_spent = active_funds.aggregate(total=Sum('spent_amount'))['total'] or Decimal('0.00')
-    avg_utilization = sum(fund.utilization_percentage for fund in active_funds) / len(active_funds) if active_funds else 0
-    
-    # Risk categorization
-    risk_categories = {
-        'critical': active_funds.filter(spent_amount__gt=F('total_budget') * 0.95).count(),
-        'high': active_funds.filter(
-            spent_amount__gt=F('total_budget') * 0.85,
-            spent_amount__lte=F('total_budget') * 0.95
-        ).count(),
-        'medium': active_funds.filter(
-            spent_amount__gt=F('total_budget') * 0.65,
-            spent_amount__lte=F('total_budget') * 0.85
-        ).count(),
-        'low': active_funds.filter(spent_amount__lte=F('total_budget') * 0.65).count()
-    }
+    # Overall statistics and risk categorization in one aggregate
+    stats = get_portfolio_statistics(active_funds)
+    total_budget = stats['total_budget']
+    total_spent = stats['total_spent']
     
     # Spending velocity (last 30 days)
     thirty_days_ago = timezone.now() - timedelta(days=30)
@@ -207,9 +495,9 @@ def get_cross_fund_analysis():
         'total_spent': total_spent,
         'total_remaining': total_budget - total_spent,
         'overall_utilization': (total_spent / total_budget * 100) if total_budget > 0 else 0,
-        'average_utilization': avg_utilization,
-        'fund_count': active_funds.count(),
-        'risk_distribution': risk_categories,
+        'average_utilization': stats['average_utilization'],
+        'fund_count': stats['fund_count'],
+        'risk_distribution': stats['risk_distribution'],
         'monthly_spending_rate': recent_spending,
         'category_breakdown': list(category_spending)
     }
\ No newline at end of file
@@ -8,16 +8,18 @@ from django.utils import timezone
 from datetime import datetime, timedelta
 from decimal import Decimal
 
-from .models import Fund, Transaction, BudgetAllocation, FundingReport
+from .models import Fund, Transaction, BudgetAllocation, FundingReport, FundMonthlySpend, month_start
 from .serializers import (
     FundSerializer, TransactionSerializer, BudgetAllocationSerializer,
     FundingReportSerializer, BudgetSummarySerializer
 )
-from .filters import FundFilter, TransactionFilter
+from .filters import FundFilter, TransactionFilter, BudgetAllocationFilter
 from .utils import (
     calculate_budget_health_score, get_spending_predictions, 
-    generate_fund_recommendations, get_cross_fund_analysis
+    generate_fund_recommendations, get_cross_fund_analysis, get_portfolio_statistics,
+    calculate_fund_health_batch, get_burn_down, BURN_DOWN_GRANULARITIES
 )
+from .reports import enqueue_report
 
 
 class FundViewSet(viewsets.ModelViewSet):
@@ -27,7 +29,7 @@ class FundViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_class = FundFilter
     search_fields = ['name', 'description', 'funding_source', 'principal_investigator']
-    ordering_fields = ['name', 'total_budget', 'spent_amount', 'created_at']
+    ordering_fields = ['name', 'total_budget', 'spent_amount', 'utilization', 'created_at']
     ordering = ['-created_at']
 
     def get_queryset(self):
@@ -61,7 +63,7 @@ class FundViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def transactions(self, request, pk=None):
         fund = self.get_object()
-        transactions = Transaction.objects.filter(fund=fund)
+        transactions = Transaction.objects.filter(fund=fund).select_related('fund__created_by', 'created_by')
         
         # Apply date filtering if provided
         start_date = request.query_params.get('start_date')
@@ -72,23 +74,46 @@ class FundViewSet(viewsets.ModelViewSet):
         if end_date:
             transactions = transactions.filter(transaction_date__lte=end_date)
         
+        # A fund's ledger can run to tens of thousands of rows; serialize one page at a time
+        page = self.paginate_queryset(transactions.order_by('-transaction_date', '-id'))
+        if page is not None:
+            serializer = TransactionSerializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
         serializer = TransactionSerializer(transactions, many=True)
         return Response(serializer.data)
 
+    @action(detail=True, methods=['get'])
+    def burn_down(self, request, pk=None):
+        """Cumulative spend against the ideal linear burn, one point per day, week or month"""
+        fund = self.get_object()
+        granularity = request.query_params.get('granularity', 'week')
+        if granularity not in BURN_DOWN_GRANULARITIES:
+            return Response(
+                {'error': f"granularity must be one of {', '.join(BURN_DOWN_GRANULARITIES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            return Response(get_burn_down(fund, granularity))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
     @action(detail=True, methods=['get'])
     def budget_analysis(self, request, pk=None):
         fund = self.get_object()
         
-        # Calculate monthly spending trend
-        six_months_ago = timezone.now() - timedelta(days=180)
-        monthly_spending = Transaction.objects.filter(
-            fund=fund,
-            transaction_date__gte=six_months_ago
-        ).extra(
-            select={'month': "TO_CHAR(transaction_date, 'YYYY-MM')"}
-        ).values('month').annotate(
-            total=Sum('amount')
-        ).order_by('month')
+        # Calculate monthly spending trend from the precomputed rollup
+        six_months_ago = month_start(timezone.now() - timedelta(days=180))
+        monthly_spending = [
+            {'month': row['month'].strftime('%Y-%m'), 'total': row['total']}
+            for row in FundMonthlySpend.objects.filter(
+                fund=fund,
+                month__gte=six_months_ago,
+                count__gt=0
+            ).values('month').annotate(
+                total=Sum('total')
+            ).order_by('month')
+        ]
         
         # Calculate category breakdown
         category_spending = BudgetAllocation.objects.filter(fund=fund).values(
@@ -101,11 +126,13 @@ class FundViewSet(viewsets.ModelViewSet):
         # Enhanced analytics
         health_score = calculate_budget_health_score(fund)
         predictions = get_spending_predictions(fund)
-        recommendations = generate_fund_recommendations(fund)
+        recommendations = generate_fund_recommendations(
+            fund, health_score=health_score, predictions=predictions
+        )
         
         return Response({
             'fund': FundSerializer(fund).data,
-            'monthly_spending': list(monthly_spending),
+            'monthly_spending': monthly_spending,
             'category_breakdown': list(category_spending),
             'utilization_percentage': fund.utilization_percentage,
             'remaining_budget': fund.remaining_budget,
@@ -117,8 +144,8 @@ class FundViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def recommendations(self, request, pk=None):
         fund = self.get_object()
-        recommendations = generate_fund_recommendations(fund)
         health_score = calculate_budget_health_score(fund)
+        recommendations = generate_fund_recommendations(fund, health_score=health_score)
         
         return Response({
             'health_score': health_score,
@@ -126,6 +153,12 @@ class FundViewSet(viewsets.ModelViewSet):
             'fund_name': fund.name
         })
 
+    @action(detail=False, methods=['get'])
+    def health(self, request):
+        """Health scores, burn rates and risk levels for every active fund"""
+        funds = self.get_queryset().filter(is_archived=False)
+        return Response(calculate_fund_health_batch(funds))
+
     @action(detail=False, methods=['get'])
     def analytics_dashboard(self, request):
         """Get comprehensive analytics across all funds"""
@@ -158,8 +191,37 @@ class TransactionViewSet(viewsets.ModelViewSet):
         # Get date range from query params
         start_date = request.query_params.get('start_date')
         end_date = request.query_params.get('end_date')
+        start_month = request.query_params.get('start_month')
+        end_month = request.query_params.get('end_month')
         fund_id = request.query_params.get('fund_id')
         
+        if start_date or end_date:
+            # Arbitrary date ranges need the raw ledger
+            summary, type_breakdown = self._summarize_transactions(start_date, end_date, fund_id)
+        else:
+            # Whole months are answered from FundMonthlySpend
+            try:
+                first_month = datetime.strptime(start_month, '%Y-%m').date() if start_month else None
+                last_month = datetime.strptime(end_month, '%Y-%m').date() if end_month else None
+            except ValueError:
+                return Response(
+                    {'error': 'start_month and end_month must be in YYYY-MM format'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            summary, type_breakdown = self._summarize_monthly_spend(first_month, last_month, fund_id)
+        
+        return Response({
+            'summary': summary,
+            'type_breakdown': list(type_breakdown),
+            'date_range': {
+                'start_date': start_date,
+                'end_date': end_date,
+                'start_month': start_month,
+                'end_month': end_month
+            }
+        })
+
+    def _summarize_transactions(self, start_date, end_date, fund_id):
         transactions = self.get_queryset()
         
         if start_date:
@@ -180,15 +242,36 @@ class TransactionViewSet(viewsets.ModelViewSet):
             count=Count('id'),
             total=Sum('amount')
         )
+        return summary, type_breakdown
+
+    def _summarize_monthly_spend(self, start_month, end_month, fund_id):
+        rollups = FundMonthlySpend.objects.all()
+        if not self.request.user.is_staff:
+            rollups = rollups.filter(fund__is_archived=False)
         
-        return Response({
-            'summary': summary,
-            'type_breakdown': list(type_breakdown),
-            'date_range': {
-                'start_date': start_date,
-                'end_date': end_date
-            }
-        })
+        if start_month:
+            rollups = rollups.filter(month__gte=start_month)
+        if end_month:
+            rollups = rollups.filter(month__lte=end_month)
+        if fund_id:
+            rollups = rollups.filter(fund_id=fund_id)
+        
+        totals = rollups.aggregate(
+            total_amount=Sum('total'),
+            transaction_count=Sum('count')
+        )
+        count = totals['transaction_count'] or 0
+        summary = {
+            'total_amount': totals['total_amount'],
+            'transaction_count': count,
+            'avg_amount': totals['total_amount'] / count if count else None
+        }
+        
+        type_breakdown = rollups.values('transaction_type').annotate(
+            count=Sum('count'),
+            total=Sum('total')
+        ).filter(count__gt=0).order_by('transaction_type')
+        return summary, type_breakdown
 
 
 class BudgetAllocationViewSet(viewsets.ModelViewSet):
@@ -196,8 +279,8 @@ class BudgetAllocationViewSet(viewsets.ModelViewSet):
     serializer_class = BudgetAllocationSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
-    filterset_fields = ['fund', 'category']
-    ordering_fields = ['category', 'allocated_amount', 'spent_amount']
+    filterset_class = BudgetAllocationFilter
+    ordering_fields = ['category', 'allocated_amount', 'spent_amount', 'utilization']
     ordering = ['category']
 
     def get_queryset(self):
@@ -211,97 +294,54 @@ class FundingReportViewSet(viewsets.ModelViewSet):
     serializer_class = FundingReportSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
-    filterset_fields = ['report_type']
+    filterset_fields = ['report_type', 'status']
     ordering = ['-generated_at']
 
+    def create(self, request, *args, **kwargs):
+        # The summary is built in the background; clients poll the report's status
+        response = super().create(request, *args, **kwargs)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return response
+
     def perform_create(self, serializer):
         report = serializer.save()
-        
-        # Generate summary data
-        funds = report.funds.all()
-        if not funds.exists():
-            funds = Fund.objects.filter(is_archived=False)
-        
-        # Calculate summary statistics
-        total_budget = funds.aggregate(total=Sum('total_budget'))['total'] or Decimal('0.00')
-        total_spent = funds.aggregate(total=Sum('spent_amount'))['total'] or Decimal('0.00')
-        
-        # Calculate transactions in date range
-        transactions_in_period = Transaction.objects.filter(
-            fund__in=funds,
-            transaction_date__gte=report.start_date,
-            transaction_date__lte=report.end_date
-        )
-        
-        period_spending = transactions_in_period.aggregate(
-            total=Sum('amount')
-        )['total'] or Decimal('0.00')
-        
-        summary_data = {
-            'total_budget': float(total_budget),
-            'total_spent': float(total_spent),
-            'period_spending': float(period_spending),
-            'fund_count': funds.count(),
-            'transaction_count': transactions_in_period.count(),
-            'generated_date': timezone.now().isoformat()
-        }
-        
-        report.summary_data = summary_data
-        report.save()
+        enqueue_report(report.id)
+
+    @action(detail=True, methods=['post'])
+    def regenerate(self, request, pk=None):
+        """Queue the report to be built again from the current ledger"""
+        report = self.get_object()
+        requeued = FundingReport.objects.filter(pk=report.pk).exclude(
+            status__in=[FundingReport.Status.PENDING, FundingReport.Status.RUNNING]
+        ).update(status=FundingReport.Status.PENDING, error='', started_at=None, completed_at=None)
+        if not requeued:
+            return Response(
+                {'error': 'Report is already being generated'},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        enqueue_report(report.pk)
+        report.refresh_from_db()
+        return Response(self.get_serializer(report).data, status=status.HTTP_202_ACCEPTED)
 
     @action(detail=False, methods=['get'])
     def budget_summary(self, request):
         """Get overall budget summary across all funds"""
         funds = Fund.objects.filter(is_archived=False)
+        stats = get_portfolio_statistics(funds)
         
-        if not funds.exists():
-            return Response({
-                'total_budget': 0,
-                'total_spent': 0,
-                'total_remaining': 0,
-                'fund_count': 0,
-                'active_fund_count': 0,
-                'average_utilization': 0,
-                'funds_near_limit': 0,
-                'funds_over_budget': 0
-            })
-        
-        # Calculate aggregates
-        aggregates = funds.aggregate(
-            total_budget=Sum('total_budget'),
-            total_spent=Sum('spent_amount'),
-            fund_count=Count('id')
-        )
-        
-        total_budget = aggregates['total_budget'] or Decimal('0.00')
-        total_spent = aggregates['total_spent'] or Decimal('0.00')
-        total_remaining = total_budget - total_spent
-        
-        # Calculate utilization statistics
-        fund_utilizations = []
-        funds_near_limit = 0
-        funds_over_budget = 0
-        
-        for fund in funds:
-            utilization = fund.utilization_percentage
-            fund_utilizations.append(utilization)
-            
-            if utilization >= 90:
-                funds_near_limit += 1
-            if fund.remaining_budget < 0:
-                funds_over_budget += 1
-        
-        avg_utilization = sum(fund_utilizations) / len(fund_utilizations) if fund_utilizations else 0
+        total_budget = stats['total_budget']
+        total_spent = stats['total_spent']
         
         summary = {
             'total_budget': total_budget,
             'total_spent': total_spent,
-            'total_remaining': total_remaining,
-            'fund_count': aggregates['fund_count'],
-            'active_fund_count': aggregates['fund_count'],
-            'average_utilization': round(avg_utilization, 2),
-            'funds_near_limit': funds_near_limit,
-            'funds_over_budget': funds_over_budget
+            'total_remaining': total_budget - total_spent,
+            'fund_count': stats['fund_count'],
+            'active_fund_count': stats['fund_count'],
+            'average_utilization': round(stats['average_utilization'], 2),
+            'funds_near_limit': stats['funds_near_limit'],
+            'funds_over_budget': stats['funds_over_budget']
         }
         
         serializer = BudgetSummarySerializer(summary)
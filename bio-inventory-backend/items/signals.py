@@ -0,0 +1,10 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from outbox.dispatch import publish
+from .models import Item
+
+
+@receiver(post_save, sender=Item)
+def publish_item_saved(sender, instance, created, **kwargs):
+    """Record item saves in the outbox; alerts and expiration scheduling are 'item.saved' handlers"""
+    publish('item.saved', f'item:{instance.pk}', {'item_id': instance.pk, 'created': created})
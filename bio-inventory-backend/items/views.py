@@ -8,6 +8,7 @@ from datetime import date, timedelta
 from .models import Vendor, Location, ItemType, Item
 from .serializers import VendorSerializer, LocationSerializer, ItemTypeSerializer, ItemSerializer
 from .filters import ItemFilter # Import our filter class
+from outbox.mixins import AtomicWritesMixin
 
 class VendorViewSet(viewsets.ModelViewSet):
     """
@@ -30,7 +31,7 @@ class ItemTypeViewSet(viewsets.ModelViewSet):
     queryset = ItemType.objects.all().order_by('name')
     serializer_class = ItemTypeSerializer
 
-class ItemViewSet(viewsets.ModelViewSet):
+class ItemViewSet(AtomicWritesMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows items to be viewed or edited.
     """
@@ -141,10 +142,11 @@ class ItemViewSet(viewsets.ModelViewSet):
         expiring_items = self.queryset.filter(
             expiration_date__gte=today,
             expiration_date__lte=end_of_month
-        ).exclude(expiration_date__isnull=True).order_by('expiration_date')
+        ).exclude(expiration_date__isnull=True).order_by('expiration_date', 'id')
         
+        page = self.paginate_queryset(expiring_items)
+        if page is not None:
+            serializer = ItemSerializer(page, many=True, context={'request': request})
+            return self.get_paginated_response(serializer.data)
         serializer = ItemSerializer(expiring_items, many=True, context={'request': request})
-        return Response({
-            'count': expiring_items.count(),
-            'items': serializer.data
-        })
+        return Response(serializer.data)
@@ -0,0 +1,96 @@
+"""
+Coalesced inventory alerts.
+
+Item saves queue ``(item, alert_type)`` keys, through the outbox's
+``item.saved`` handler, instead of notifying straight away. The queue is
+flushed once the outbox batch has committed, so a bulk edit fans out
+once: alerts for a single item keep their usual messages, while alerts
+for several items become one "N items need attention" notification. A
+key whose notification is still unexpired is suppressed, so saving an
+already-expired item again does not repeat the alert.
+"""
+import threading
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from outbox.dispatch import after_dispatch
+from .models import InventoryAlert
+from .services import NotificationService
+
+_local = threading.local()
+
+
+def alert_applies(item, alert_type):
+    """Whether ``item`` is still in the state ``alert_type`` reports"""
+    if alert_type == 'expired':
+        return item.expiration_status == 'EXPIRED'
+    if alert_type == 'expiring_soon':
+        return item.expiration_status == 'EXPIRING_SOON'
+    if alert_type == 'low_stock':
+        return item.is_low_stock
+    raise ValueError(f"Invalid alert type: {alert_type}")
+
+
+def queue_inventory_alert(item, alert_type):
+    """
+    Raise ``alert_type`` for ``item`` once the current outbox batch, or
+    outside of one the current transaction, has committed
+    """
+    pending = getattr(_local, 'pending', None)
+    if pending is None:
+        pending = _local.pending = {}
+    pending[(item.pk, alert_type)] = None
+    after_dispatch(flush_inventory_alerts)
+
+
+def flush_inventory_alerts():
+    """
+    Create notifications for the queued alerts that still apply and are not
+    already open. Returns the created notifications.
+    """
+    pending = getattr(_local, 'pending', None)
+    if not pending:
+        return []
+    _local.pending = {}
+
+    from items.models import Item
+    items = Item.objects.in_bulk({item_id for item_id, _ in pending})
+    # Items are re-read after commit, so keys left behind by a rolled back
+    # transaction only fire if the committed state still warrants them
+    due = [
+        (items[item_id], alert_type) for item_id, alert_type in pending
+        if item_id in items and alert_applies(items[item_id], alert_type)
+    ]
+    return raise_inventory_alerts(due)
+
+
+def raise_inventory_alerts(alerts, now=None):
+    """
+    Notify about the ``(item, alert_type)`` pairs in ``alerts`` that are not
+    already open at ``now``. Returns the created notifications.
+    """
+    if not alerts:
+        return []
+    now = now or timezone.now()
+    open_alerts = set(
+        InventoryAlert.objects.filter(item_id__in={item.pk for item, _ in alerts}).filter(
+            Q(notification__expires_at__isnull=True) | Q(notification__expires_at__gt=now)
+        ).values_list('item_id', 'alert_type')
+    )
+    due = [(item, alert_type) for item, alert_type in alerts if (item.pk, alert_type) not in open_alerts]
+    if not due:
+        return []
+
+    notifications = []
+    with transaction.atomic():
+        if len({item.pk for item, _ in due}) == 1:
+            for item, alert_type in due:
+                created = NotificationService.create_inventory_alert(item, alert_type)
+                InventoryAlert.record([(item, alert_type)], created[0])
+                notifications.extend(created)
+        else:
+            notifications = NotificationService.create_inventory_rollup(due)
+            InventoryAlert.record(due, notifications[0])
+    return notifications
@@ -1,10 +1,10 @@
 from django.core.mail import send_mail, EmailMultiAlternatives
-from django.template.loader import render_to_string
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.db.models import Q
-from .models import NotificationPreference
+from .preferences import PreferenceResolver
+from .email_templates import registry as email_templates
 import logging
 
 logger = logging.getLogger(__name__)
@@ -57,34 +57,11 @@ class EmailNotificationService:
         if not subject.startswith(settings.EMAIL_SUBJECT_PREFIX):
             subject = f"{settings.EMAIL_SUBJECT_PREFIX}{subject}"
         
-        # Render HTML template
-        html_template = f'notifications/emails/{template_name}.html'
+        # Render the compiled HTML template and its plain-text companion
         try:
-            html_content = render_to_string(html_template, context)
-            
-            # Create a more readable plain text version
-            import re
-            from html import unescape
-            
-            # Remove HTML tags and decode entities
-            plain_text = re.sub('<[^<]+?>', '', html_content)
-            plain_text = unescape(plain_text)
-            
-            # Clean up whitespace and formatting
-            plain_text = re.sub(r'\s+', ' ', plain_text).strip()
-            plain_text = re.sub(r' {2,}', ' ', plain_text)
-            
-            # Add some basic formatting for readability
-            plain_text = plain_text.replace('Request Details', '\n--- REQUEST DETAILS ---\n')
-            plain_text = plain_text.replace('Order Details', '\n--- ORDER DETAILS ---\n')
-            plain_text = plain_text.replace('Additional Notes', '\n--- ADDITIONAL NOTES ---\n')
-            plain_text = plain_text.replace('Hayer Lab - McGill University', '\n\nHayer Lab - McGill University')
-            
-            # Ensure it starts and ends cleanly 
-            plain_text = plain_text.strip()
-            
+            html_content, plain_text = email_templates.render(template_name, context)
         except Exception as e:
-            logger.error(f"Error rendering email template {html_template}: {e}")
+            logger.error(f"Error rendering email template {template_name}: {e}")
             return False
         
         # Prepare recipient emails
@@ -142,14 +119,10 @@ class EmailNotificationService:
         Args:
             user: User object
             notification_type: Type of notification (request_updates, inventory_alerts, etc.)
+        
+        Users without saved preferences get the defaults (web only).
         """
-        try:
-            prefs = NotificationPreference.objects.get(user=user)
-            pref_value = getattr(prefs, notification_type, 'web')
-            return pref_value in ['email', 'both']
-        except NotificationPreference.DoesNotExist:
-            # Default to web-only if no preferences set
-            return False
+        return PreferenceResolver.current().wants_email(user, notification_type)
     
     @staticmethod
     def send_new_request_notification(request_obj):
@@ -160,11 +133,9 @@ class EmailNotificationService:
             is_active=True
         )
         
-        # Filter admins who want email notifications
-        email_recipients = [
-            user for user in admin_users 
-            if EmailNotificationService.should_send_email(user, 'request_updates')
-        ]
+        # Filter admins who want email notifications; their preferences are
+        # joined into the admin query
+        email_recipients = PreferenceResolver.current().email_recipients(admin_users, 'request_updates')
         
         if not email_recipients:
             logger.info("No admin users configured to receive email notifications for new requests")
@@ -0,0 +1,82 @@
+"""
+Compiled email templates.
+
+Each email has an HTML template and a plain-text companion under
+``notifications/emails/``. The registry compiles both the first time an
+email is sent and keeps them for the life of the process, so sending only
+renders. Emails without a ``.txt`` companion fall back to a text body
+derived from the HTML.
+"""
+import re
+import threading
+from html import unescape
+
+from django.dispatch import receiver
+from django.template import TemplateDoesNotExist
+from django.template.loader import get_template
+from django.utils.autoreload import file_changed
+
+TEMPLATE_DIR = 'notifications/emails'
+
+
+def html_to_text(html_content):
+    """Plain text stripped out of a rendered HTML email"""
+    # Remove HTML tags and decode entities
+    plain_text = re.sub('<[^<]+?>', '', html_content)
+    plain_text = unescape(plain_text)
+
+    # Clean up whitespace and formatting
+    plain_text = re.sub(r'\s+', ' ', plain_text).strip()
+    plain_text = re.sub(r' {2,}', ' ', plain_text)
+
+    # Add some basic formatting for readability
+    plain_text = plain_text.replace('Request Details', '\n--- REQUEST DETAILS ---\n')
+    plain_text = plain_text.replace('Order Details', '\n--- ORDER DETAILS ---\n')
+    plain_text = plain_text.replace('Additional Notes', '\n--- ADDITIONAL NOTES ---\n')
+    plain_text = plain_text.replace('Hayer Lab - McGill University', '\n\nHayer Lab - McGill University')
+
+    return plain_text.strip()
+
+
+class EmailTemplateRegistry:
+    def __init__(self, directory=TEMPLATE_DIR):
+        self.directory = directory
+        self._templates = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        """The compiled ``(html, text)`` templates for ``name``; text is None without a companion"""
+        templates = self._templates.get(name)
+        if templates is None:
+            with self._lock:
+                templates = self._templates.get(name)
+                if templates is None:
+                    html = get_template(f'{self.directory}/{name}.html')
+                    try:
+                        text = get_template(f'{self.directory}/{name}.txt')
+                    except TemplateDoesNotExist:
+                        text = None
+                    templates = self._templates[name] = (html, text)
+        return templates
+
+    def render(self, name, context):
+        """Render ``name`` to ``(html_content, plain_text)``"""
+        html, text = self.get(name)
+        html_content = html.render(context)
+        if text is None:
+            return html_content, html_to_text(html_content)
+        return html_content, text.render(context).strip()
+
+    def clear(self):
+        with self._lock:
+            self._templates.clear()
+
+
+registry = EmailTemplateRegistry()
+
+
+@receiver(file_changed, dispatch_uid='notifications_email_templates_changed')
+def reload_changed_email_templates(sender, file_path, **kwargs):
+    # runserver reloads templates without restarting; recompile ours too
+    if file_path.suffix in ('.html', '.txt'):
+        registry.clear()
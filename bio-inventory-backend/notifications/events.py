@@ -0,0 +1,133 @@
+"""
+Per-user notification events for the server-sent events stream.
+
+Events are fanned out by an in-process broker that keeps a short replay
+buffer, so a client reconnecting with ``Last-Event-ID`` receives what it
+missed. Event ids are only meaningful to the process that issued them; a
+client that resumes from an id this process no longer (or never) had gets
+a ``resync`` event and should refetch.
+
+With ``NOTIFICATION_EVENTS_BACKEND = 'postgres'`` events are published with
+``pg_notify`` instead, and every process that serves streams runs one
+``LISTEN`` thread that feeds its local broker. This lets WSGI workers that
+write notifications reach the ASGI process that holds the connections.
+"""
+from collections import deque
+import json
+import logging
+import select
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'notification_events'
+
+
+class NotificationBroker:
+    def __init__(self, buffer_size=1000):
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._buffer = deque(maxlen=buffer_size)
+        self._subscribers = {}
+
+    def publish(self, user_id, event, data, audience=None):
+        """Queue an event for ``user_id``, or for every stream when it is None (a broadcast)"""
+        with self._lock:
+            message = {'id': self._next_id, 'user_id': user_id, 'event': event, 'data': data, 'audience': audience}
+            self._next_id += 1
+            self._buffer.append(message)
+            if user_id is None:
+                subscribers = [s for group in self._subscribers.values() for s in group]
+            else:
+                subscribers = list(self._subscribers.get(user_id, ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(queue.put_nowait, message)
+        return message['id']
+
+    def subscribe(self, user_id, loop, queue, last_event_id=None):
+        """
+        Register ``queue`` for ``user_id``'s events. Returns the buffered
+        events after ``last_event_id``, or None if the gap cannot be replayed.
+        """
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add((loop, queue))
+            if last_event_id is None:
+                return []
+            oldest = self._buffer[0]['id'] if self._buffer else self._next_id
+            if last_event_id >= self._next_id or last_event_id + 1 < oldest:
+                return None
+            return [
+                m for m in self._buffer
+                if m['id'] > last_event_id and m['user_id'] in (user_id, None)
+            ]
+
+    def unsubscribe(self, user_id, loop, queue):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers:
+                subscribers.discard((loop, queue))
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+
+broker = NotificationBroker(getattr(settings, 'NOTIFICATION_STREAM_BUFFER', 1000))
+
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def uses_postgres():
+    return getattr(settings, 'NOTIFICATION_EVENTS_BACKEND', 'local') == 'postgres'
+
+
+def publish_event(user_id, event, data, audience=None):
+    """
+    Deliver ``event`` to ``user_id``'s open streams once the current
+    transaction commits; ``user_id=None`` reaches every stream in ``audience``.
+    """
+    if uses_postgres():
+        payload = json.dumps({'user_id': user_id, 'event': event, 'data': data, 'audience': audience}, default=str)
+
+        def notify():
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_notify(%s, %s)', [CHANNEL, payload])
+        transaction.on_commit(notify)
+    else:
+        transaction.on_commit(lambda: broker.publish(user_id, event, data, audience))
+
+
+def ensure_listener():
+    """Start this process's LISTEN thread when events travel through Postgres."""
+    global _listener
+    if not uses_postgres():
+        return
+    with _listener_lock:
+        if _listener is None or not _listener.is_alive():
+            _listener = threading.Thread(target=_listen, name='notification-events', daemon=True)
+            _listener.start()
+
+
+def _listen():
+    import psycopg2
+
+    params = connection.get_connection_params()
+    while True:
+        try:
+            conn = psycopg2.connect(**params)
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cursor:
+                cursor.execute(f'LISTEN {CHANNEL}')
+            while True:
+                if select.select([conn], [], [], 30) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    message = json.loads(notify.payload)
+                    broker.publish(message['user_id'], message['event'], message['data'], message.get('audience'))
+        except Exception:
+            logger.exception('Notification event listener lost its connection; reconnecting')
+            threading.Event().wait(5)
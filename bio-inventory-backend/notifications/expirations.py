@@ -0,0 +1,124 @@
+"""
+Scheduled expiration alerts.
+
+Items cross their expiration thresholds with the passing of time, not when
+they are saved. Every item with an expiration date has up to two rows in
+ExpirationEvent, one per upcoming crossing:
+
+* ``expiring_soon`` at the start of ``expiration_date - expiration_alert_days``;
+* ``expired`` at the start of the day after ``expiration_date``.
+
+The table, indexed on ``due_at``, is the scheduler's priority queue. The
+scheduler sleeps until the earliest row is due, alerts on everything due
+and deletes those rows in the same transaction, so each crossing is
+alerted once and the work done is proportional to the crossings, not to the
+size of the inventory. Item saves reschedule the item's rows.
+"""
+from datetime import datetime, time as day_start, timedelta
+import logging
+import time
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.polling import PollLoop
+from .alerts import raise_inventory_alerts
+from .models import ExpirationEvent
+from .preferences import PreferenceResolver
+
+logger = logging.getLogger(__name__)
+
+
+def local_midnight(day):
+    return timezone.make_aware(datetime.combine(day, day_start.min))
+
+
+def expiration_crossings(item):
+    """``(alert_type, due_at)`` for each threshold ``item`` will cross"""
+    if not item.expiration_date or item.is_archived:
+        return []
+    return [
+        ('expiring_soon', local_midnight(item.expiration_date - timedelta(days=item.expiration_alert_days))),
+        ('expired', local_midnight(item.expiration_date + timedelta(days=1))),
+    ]
+
+
+def schedule_item(item, now=None):
+    """Bring ``item``'s scheduled crossings in line with its dates; writes only when they changed"""
+    now = now or timezone.now()
+    wanted = {(alert_type, due_at) for alert_type, due_at in expiration_crossings(item) if due_at > now}
+    scheduled = set(ExpirationEvent.objects.filter(item=item).values_list('alert_type', 'due_at'))
+    if wanted == scheduled:
+        return
+    with transaction.atomic():
+        ExpirationEvent.objects.filter(item=item).delete()
+        ExpirationEvent.objects.bulk_create(
+            [ExpirationEvent(item=item, alert_type=alert_type, due_at=due_at) for alert_type, due_at in wanted]
+        )
+
+
+def rebuild_schedule(now=None, batch_size=1000):
+    """Reschedule every item from scratch. Returns the number of scheduled crossings."""
+    from items.models import Item
+    now = now or timezone.now()
+    items = Item.objects.filter(is_archived=False, expiration_date__isnull=False).only(
+        'id', 'expiration_date', 'expiration_alert_days', 'is_archived'
+    )
+    with transaction.atomic():
+        ExpirationEvent.objects.all().delete()
+        events = (
+            ExpirationEvent(item=item, alert_type=alert_type, due_at=due_at)
+            for item in items.iterator(chunk_size=batch_size)
+            for alert_type, due_at in expiration_crossings(item)
+            if due_at > now
+        )
+        created = 0
+        batch = []
+        for event in events:
+            batch.append(event)
+            if len(batch) >= batch_size:
+                created += len(ExpirationEvent.objects.bulk_create(batch))
+                batch = []
+        created += len(ExpirationEvent.objects.bulk_create(batch))
+    return created
+
+
+class ExpirationScheduler(PollLoop):
+    """Alerts on scheduled crossings as they come due"""
+
+    def __init__(self, clock=timezone.now, sleep=time.sleep, max_sleep=300, batch_size=500):
+        super().__init__(clock=clock, sleep=sleep)
+        # New or rescheduled items may add an earlier crossing while we sleep
+        self.max_sleep = max_sleep
+        self.batch_size = batch_size
+
+    def next_due(self):
+        return ExpirationEvent.objects.order_by('due_at').values_list('due_at', flat=True).first()
+
+    def run_due(self):
+        """Alert on every crossing due now. Returns the number of crossings handled."""
+        now = self.clock()
+        handled = 0
+        while True:
+            with PreferenceResolver.scope(), transaction.atomic():
+                events = ExpirationEvent.objects.filter(due_at__lte=now).select_related('item')
+                if connection.features.has_select_for_update_skip_locked:
+                    # Lets several schedulers share the queue without double alerts
+                    events = events.select_for_update(skip_locked=True, of=('self',))
+                events = list(events.order_by('due_at', 'id')[:self.batch_size])
+                if not events:
+                    return handled
+                raise_inventory_alerts([(event.item, event.alert_type) for event in events], now=now)
+                ExpirationEvent.objects.filter(pk__in=[event.pk for event in events]).delete()
+            handled += len(events)
+
+    def seconds_until_next(self):
+        due_at = self.next_due()
+        if due_at is None:
+            return self.max_sleep
+        return min(max((due_at - self.clock()).total_seconds(), 0), self.max_sleep)
+
+    def poll(self):
+        handled = self.run_due()
+        if handled:
+            logger.info(f"Alerted on {handled} expiration crossing(s)")
@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications.retention import apply_retention, retention_targets
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete expired notifications, read notifications past their retention '
+        'period and notifications beyond the per-user cap, in throttled chunks'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            help='Rows deleted per chunk (default NOTIFICATION_RETENTION_CHUNK_SIZE)',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0.1,
+            help='Seconds to pause between chunks (default 0.1)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only count the rows each rule would delete',
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            total = 0
+            for rule, queryset in retention_targets():
+                count = queryset.count()
+                total += count
+                if count:
+                    self.stdout.write(f'{rule}: would delete {count} row(s)')
+            self.stdout.write(self.style.SUCCESS(f'Would delete {total} notification(s)'))
+            return
+
+        def report(rule, rows, seconds):
+            self.stdout.write(f'{rule}: deleted {rows} row(s) in {seconds:.3f}s')
+
+        started = time.monotonic()
+        sweep = apply_retention(chunk_size=options['chunk_size'], sleep=options['sleep'], on_chunk=report)
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {sweep.deleted} notification(s) in {sweep.chunks} chunk(s), '
+            f'{time.monotonic() - started:.1f}s'
+        ))
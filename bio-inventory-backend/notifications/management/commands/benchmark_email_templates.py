@@ -0,0 +1,90 @@
+from decimal import Decimal
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from notifications.email_service import EmailNotificationService
+from notifications.email_templates import EmailTemplateRegistry, html_to_text
+from requests.models import Request
+
+
+class Command(BaseCommand):
+    help = 'Benchmark email rendering: compiled templates with text companions against HTML stripping'
+
+    templates = ['new_request', 'order_placed', 'item_received']
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--renders',
+            type=int,
+            default=1000,
+            help='Emails rendered per timed run',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Timed runs per implementation; the best run is reported',
+        )
+
+    def handle(self, *args, **options):
+        self.repeat = options['repeat']
+        renders = options['renders']
+        context = self.build_context()
+        names = [self.templates[i % len(self.templates)] for i in range(renders)]
+        self.stdout.write(f'{renders} renders across {", ".join(self.templates)}')
+
+        def stripped_html():
+            # Previous implementation: look the template up, render the HTML
+            # and derive the text body from it
+            for name in names:
+                html_to_text(render_to_string(f'notifications/emails/{name}.html', context))
+
+        registry = EmailTemplateRegistry()
+
+        def compiled():
+            for name in names:
+                registry.render(name, context)
+
+        before = self.timed('render + strip HTML', stripped_html)
+        after = self.timed('compiled registry', compiled)
+        if after <= 0:
+            raise CommandError('Benchmark finished too quickly to measure')
+        self.stdout.write(self.style.SUCCESS(f'  Speedup: {before / after:.1f}x'))
+
+    def timed(self, label, func):
+        best = None
+        for _ in range(self.repeat):
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        self.stdout.write(f'  {label:<28} {best * 1000:10.1f} ms')
+        return best
+
+    def build_context(self):
+        # Unsaved objects: rendering never touches the database
+        user = User(username='benchmark', first_name='Bench', last_name='Mark')
+        request_obj = Request(
+            id=1,
+            item_name='Pipette tips',
+            requested_by=user,
+            catalog_number='PT-1000',
+            quantity=4,
+            unit_price=Decimal('12.50'),
+            notes='Needed for the Monday assay & the follow-up run.',
+            status='ORDERED',
+        )
+        request_obj.date_created = request_obj.updated_at = timezone.now()
+        return {
+            'request': request_obj,
+            'recipient': user,
+            'total_cost': Decimal('50.00'),
+            'placed_by': user,
+            'received_by': user,
+            'quantity_received': 4,
+            **EmailNotificationService.get_base_context(),
+        }
@@ -1,7 +1,9 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from items.models import Item
-from notifications.services import NotificationService
+from django.db import transaction
+from notifications.alerts import queue_inventory_alert
+from notifications.preferences import PreferenceResolver
 
 
 class Command(BaseCommand):
@@ -21,53 +23,46 @@ class Command(BaseCommand):
             self.stdout.write(self.style.WARNING('DRY RUN MODE - No notifications will be created'))
         
         # Get all items that need attention
-        items = Item.objects.filter(is_active=True)
+        items = Item.objects.filter(is_archived=False)
         
         expired_count = 0
         expiring_soon_count = 0
         low_stock_count = 0
         
-        for item in items:
-            notifications_created = []
-            
-            # Check for expired items
-            if item.expiration_status == 'EXPIRED':
-                if not dry_run:
-                    NotificationService.create_inventory_alert(
-                        item=item,
-                        alert_type='expired'
+        # Alerts are queued and coalesced when this transaction commits
+        with PreferenceResolver.scope(), transaction.atomic():
+            for item in items:
+                notifications_created = []
+                
+                # Check for expired items
+                if item.expiration_status == 'EXPIRED':
+                    if not dry_run:
+                        queue_inventory_alert(item, 'expired')
+                    notifications_created.append('EXPIRED')
+                    expired_count += 1
+                
+                # Check for expiring soon items
+                elif item.expiration_status == 'EXPIRING_SOON':
+                    if not dry_run:
+                        queue_inventory_alert(item, 'expiring_soon')
+                    notifications_created.append('EXPIRING_SOON')
+                    expiring_soon_count += 1
+                
+                # Check for low stock items
+                if item.is_low_stock:
+                    if not dry_run:
+                        queue_inventory_alert(item, 'low_stock')
+                    notifications_created.append('LOW_STOCK')
+                    low_stock_count += 1
+                
+                # Log what was done for this item
+                if notifications_created:
+                    status_str = ', '.join(notifications_created)
+                    action = 'Would create' if dry_run else 'Queued'
+                    self.stdout.write(
+                        f'{action} notifications for item "{item.name}" '
+                        f'(ID: {item.id}): {status_str}'
                     )
-                notifications_created.append('EXPIRED')
-                expired_count += 1
-            
-            # Check for expiring soon items
-            elif item.expiration_status == 'EXPIRING_SOON':
-                if not dry_run:
-                    NotificationService.create_inventory_alert(
-                        item=item,
-                        alert_type='expiring_soon'
-                    )
-                notifications_created.append('EXPIRING_SOON')
-                expiring_soon_count += 1
-            
-            # Check for low stock items
-            if item.is_low_stock:
-                if not dry_run:
-                    NotificationService.create_inventory_alert(
-                        item=item,
-                        alert_type='low_stock'
-                    )
-                notifications_created.append('LOW_STOCK')
-                low_stock_count += 1
-            
-            # Log what was done for this item
-            if notifications_created:
-                status_str = ', '.join(notifications_created)
-                action = 'Would create' if dry_run else 'Created'
-                self.stdout.write(
-                    f'{action} notifications for item "{item.name}" '
-                    f'(ID: {item.id}): {status_str}'
-                )
         
         # Summary
         total_notifications = expired_count + expiring_soon_count + low_stock_count
@@ -82,4 +77,4 @@ class Command(BaseCommand):
         if dry_run:
             self.stdout.write(self.style.WARNING('\nRun without --dry-run to create notifications'))
         else:
-            self.stdout.write(self.style.SUCCESS(f'\nSuccessfully created {total_notifications} notifications'))
\ No newline at end of file
+            self.stdout.write(self.style.SUCCESS(f'\nQueued {total_notifications} alerts; alerts that are already open were not repeated'))
\ No newline at end of file
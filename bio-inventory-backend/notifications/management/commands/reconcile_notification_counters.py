@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from notifications.models import NotificationCounter
+
+
+class Command(BaseCommand):
+    help = 'Rebuild per-user unread notification counters from the notification table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            dest='user_ids',
+            help='Only reconcile the given user id (can be repeated)',
+        )
+
+    def handle(self, *args, **options):
+        drifted = NotificationCounter.reconcile(user_ids=options['user_ids'])
+        if drifted:
+            self.stdout.write(self.style.WARNING(f'Corrected {drifted} unread counter(s)'))
+        else:
+            self.stdout.write(self.style.SUCCESS('All unread counters match'))
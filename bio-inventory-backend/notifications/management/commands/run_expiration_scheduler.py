@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+
+from core.polling import idle_sleep
+from notifications.expirations import ExpirationScheduler, rebuild_schedule
+
+
+class Command(BaseCommand):
+    help = (
+        'Alert on items as they cross their expiring-soon and expiration '
+        'thresholds, sleeping until the next crossing is due'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Reschedule every item before starting',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Handle the crossings due now and exit',
+        )
+        parser.add_argument(
+            '--max-sleep',
+            type=int,
+            default=300,
+            help='Longest wait between checks, in seconds, so newly scheduled items are picked up (default 300)',
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            scheduled = rebuild_schedule()
+            self.stdout.write(self.style.SUCCESS(f'Scheduled {scheduled} upcoming crossing(s)'))
+
+        scheduler = ExpirationScheduler(sleep=idle_sleep, max_sleep=options['max_sleep'])
+        if options['once']:
+            handled = scheduler.run_due()
+            self.stdout.write(self.style.SUCCESS(f'Alerted on {handled} crossing(s)'))
+            return
+
+        next_due = scheduler.next_due()
+        self.stdout.write(f'Expiration scheduler started; next crossing: {next_due or "none scheduled"}')
+        try:
+            scheduler.run()
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Expiration scheduler stopped'))
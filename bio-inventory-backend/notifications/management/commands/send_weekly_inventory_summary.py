@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from notifications.email_service import EmailNotificationService
+from notifications.preferences import PreferenceResolver
 import logging
 
 logger = logging.getLogger(__name__)
@@ -92,7 +93,8 @@ class Command(BaseCommand):
 
         # Send the actual emails
         try:
-            success = EmailNotificationService.send_weekly_inventory_summary()
+            with PreferenceResolver.scope():
+                success = EmailNotificationService.send_weekly_inventory_summary()
             
             if success:
                 self.stdout.write(
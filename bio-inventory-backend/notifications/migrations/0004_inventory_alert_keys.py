@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-18 22:13
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0003_item_fund_id'),
+        ('notifications', '0003_broadcast_notifications'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alert_type', models.CharField(max_length=20)),
+                ('raised_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='items.item')),
+                ('notification', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_alerts', to='notifications.notification')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('item', 'alert_type'), name='unique_open_inventory_alert')],
+            },
+        ),
+    ]
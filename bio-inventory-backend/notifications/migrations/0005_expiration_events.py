@@ -0,0 +1,51 @@
+# Generated by Django 5.2.4 on 2026-10-18 22:32
+
+from datetime import datetime, time, timedelta
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def schedule_existing_items(apps, schema_editor):
+    Item = apps.get_model('items', 'Item')
+    ExpirationEvent = apps.get_model('notifications', 'ExpirationEvent')
+    now = timezone.now()
+    events = []
+    items = Item.objects.filter(is_archived=False, expiration_date__isnull=False)
+    for item in items.only('id', 'expiration_date', 'expiration_alert_days').iterator(chunk_size=1000):
+        crossings = [
+            ('expiring_soon', item.expiration_date - timedelta(days=item.expiration_alert_days)),
+            ('expired', item.expiration_date + timedelta(days=1)),
+        ]
+        for alert_type, day in crossings:
+            due_at = timezone.make_aware(datetime.combine(day, time.min))
+            if due_at > now:
+                events.append(ExpirationEvent(item_id=item.id, alert_type=alert_type, due_at=due_at))
+    ExpirationEvent.objects.bulk_create(events, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0003_item_fund_id'),
+        ('notifications', '0004_inventory_alert_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpirationEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alert_type', models.CharField(max_length=20)),
+                ('due_at', models.DateTimeField()),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='items.item')),
+            ],
+            options={
+                'ordering': ['due_at', 'id'],
+                'indexes': [models.Index(fields=['due_at'], name='expiration_event_due_idx')],
+                'constraints': [models.UniqueConstraint(fields=('item', 'alert_type'), name='unique_expiration_event')],
+            },
+        ),
+        migrations.RunPython(schedule_existing_items, migrations.RunPython.noop),
+    ]
@@ -1,13 +1,41 @@
 from django.db import models
+from django.db.models import (
+    BooleanField, Case, Count, Exists, F, IntegerField, OuterRef, Q, Subquery, Value, When
+)
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.lookups import Exact
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
+from django.utils import timezone
 
 
 class NotificationManager(models.Manager):
+    def broadcast_filter(self, user):
+        """Broadcasts addressed to ``user``: their audience, sent since they joined"""
+        audiences = [Notification.AUDIENCE_ALL, Notification.AUDIENCE_STAFF] if user.is_staff else [Notification.AUDIENCE_ALL]
+        return Q(recipient__isnull=True, audience__in=audiences, created_at__gte=user.date_joined)
+    
     def for_user(self, user):
-        """Get notifications for a specific user"""
-        return self.filter(recipient=user)
+        """
+        Get notifications for a specific user: their own plus broadcasts,
+        with ``user_is_read``/``user_is_dismissed`` resolved from receipts
+        """
+        receipts = NotificationReceipt.objects.filter(notification=OuterRef('pk'), user=user)
+        return self.filter(Q(recipient=user) | self.broadcast_filter(user)).filter(
+            ~Exists(receipts.filter(is_deleted=True))
+        ).annotate(
+            user_is_read=Case(
+                When(recipient__isnull=True, then=Coalesce(Subquery(receipts.values('is_read')[:1]), Value(False))),
+                default=F('is_read'),
+                output_field=BooleanField()
+            ),
+            user_is_dismissed=Case(
+                When(recipient__isnull=True, then=Coalesce(Subquery(receipts.values('is_dismissed')[:1]), Value(False))),
+                default=F('is_dismissed'),
+                output_field=BooleanField()
+            )
+        )
     
     def unread(self):
         """Get unread notifications"""
@@ -15,7 +43,17 @@ class NotificationManager(models.Manager):
     
     def mark_all_read(self, user):
         """Mark all notifications as read for a user"""
-        return self.filter(recipient=user, is_read=False).update(is_read=True)
+        from .events import publish_event
+        count = self.filter(recipient=user, is_read=False).update(is_read=True)
+        unread_broadcasts = list(
+            self.for_user(user).filter(recipient__isnull=True, user_is_read=False).values_list('id', flat=True)
+        )
+        NotificationReceipt.apply(user, unread_broadcasts, is_read=True)
+        count += len(unread_broadcasts)
+        NotificationCounter.objects.filter(user=user).update(unread=0)
+        if count:
+            publish_event(user.id, 'notification.read_all', {})
+        return count
 
 
 class Notification(models.Model):
@@ -36,11 +74,29 @@ class Notification(models.Model):
         ('urgent', 'Urgent'),
     ]
     
+    AUDIENCE_ALL = 'all'
+    AUDIENCE_STAFF = 'staff'
+    AUDIENCE_CHOICES = [
+        (AUDIENCE_ALL, 'All active users'),
+        (AUDIENCE_STAFF, 'Staff'),
+    ]
+    
     recipient = models.ForeignKey(
         User, 
         on_delete=models.CASCADE, 
         related_name='notifications',
-        help_text="User who should receive this notification"
+        null=True,
+        blank=True,
+        help_text="User who should receive this notification (empty for broadcasts)"
+    )
+    
+    # Broadcasts are stored once; per-user state lives in NotificationReceipt
+    audience = models.CharField(
+        max_length=10,
+        choices=AUDIENCE_CHOICES,
+        blank=True,
+        default='',
+        help_text="Who receives this broadcast"
     )
     
     title = models.CharField(
@@ -125,20 +181,69 @@ class Notification(models.Model):
             models.Index(fields=['recipient', 'created_at']),
             models.Index(fields=['notification_type', 'priority']),
             models.Index(fields=['expires_at']),
+            models.Index(fields=['audience', 'created_at']),
         ]
     
     def __str__(self):
+        if self.is_broadcast:
+            return f"{self.title} - broadcast to {self.audience}"
         return f"{self.title} - {self.recipient.username}"
     
-    def mark_as_read(self):
-        """Mark this notification as read"""
-        self.is_read = True
-        self.save(update_fields=['is_read', 'updated_at'])
-    
-    def mark_as_dismissed(self):
+    @property
+    def is_broadcast(self):
+        return self.recipient_id is None
+    
+    def mark_as_read(self, user=None):
+        """Mark this notification as read (for ``user`` when it is a broadcast)"""
+        self.set_read(True, user)
+    
+    def set_read(self, is_read, user=None):
+        """Flip the read flag, keeping the reader's unread counter in step"""
+        from .events import publish_event
+        if self.is_broadcast:
+            receipt, _ = NotificationReceipt.objects.get_or_create(notification=self, user=user)
+            changed = NotificationReceipt.objects.filter(pk=receipt.pk, is_read=not is_read).update(
+                is_read=is_read, updated_at=timezone.now()
+            )
+            self.user_is_read = is_read
+            user_id = user.id
+        else:
+            changed = Notification.objects.filter(pk=self.pk, is_read=not is_read).update(
+                is_read=is_read, updated_at=timezone.now()
+            )
+            self.is_read = is_read
+            user_id = self.recipient_id
+        if changed:
+            NotificationCounter.adjust(user_id, -1 if is_read else 1)
+            publish_event(
+                user_id, 'notification.read' if is_read else 'notification.unread', {'ids': [self.pk]}
+            )
+    
+    def mark_as_dismissed(self, user=None):
         """Mark this notification as dismissed"""
-        self.is_dismissed = True
-        self.save(update_fields=['is_dismissed', 'updated_at'])
+        from .events import publish_event
+        if self.is_broadcast:
+            NotificationReceipt.apply(user, [self.pk], is_dismissed=True)
+            self.user_is_dismissed = True
+            user_id = user.id
+        else:
+            self.is_dismissed = True
+            self.save(update_fields=['is_dismissed', 'updated_at'])
+            user_id = self.recipient_id
+        publish_event(user_id, 'notification.dismissed', {'ids': [self.pk]})
+    
+    def remove_for(self, user):
+        """Delete a personal notification, or hide a broadcast from ``user`` only"""
+        from .events import publish_event
+        was_unread = not getattr(self, 'user_is_read', self.is_read)
+        notification_id = self.pk
+        if self.is_broadcast:
+            NotificationReceipt.apply(user, [notification_id], is_deleted=True)
+        else:
+            self.delete()
+        if was_unread:
+            NotificationCounter.adjust(user.id, -1)
+        publish_event(user.id, 'notification.deleted', {'ids': [notification_id]})
     
     @property
     def is_expired(self):
@@ -149,6 +254,213 @@ class Notification(models.Model):
         return timezone.now() > self.expires_at
 
 
+class NotificationReceipt(models.Model):
+    """A user's read/dismissed/deleted state for one broadcast notification"""
+    
+    notification = models.ForeignKey(
+        Notification,
+        on_delete=models.CASCADE,
+        related_name='receipts'
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='notification_receipts'
+    )
+    is_read = models.BooleanField(default=False)
+    is_dismissed = models.BooleanField(default=False)
+    is_deleted = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['notification', 'user'], name='unique_receipt_per_user'),
+        ]
+    
+    def __str__(self):
+        return f"{self.notification_id} for {self.user_id}"
+    
+    @classmethod
+    def apply(cls, user, notification_ids, **state):
+        """Set ``state`` flags on ``user``'s receipts for the given broadcasts, creating them as needed"""
+        if not notification_ids:
+            return
+        cls.objects.bulk_create(
+            [cls(notification_id=notification_id, user=user, **state) for notification_id in notification_ids],
+            update_conflicts=True,
+            unique_fields=['notification', 'user'],
+            update_fields=[*state, 'updated_at']
+        )
+
+
+class InventoryAlert(models.Model):
+    """
+    The open alert for one (item, alert type). While its notification is
+    unexpired, repeats of the same alert are suppressed.
+    """
+    
+    item = models.ForeignKey(
+        'items.Item',
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    alert_type = models.CharField(max_length=20)
+    notification = models.ForeignKey(
+        Notification,
+        on_delete=models.CASCADE,
+        related_name='inventory_alerts'
+    )
+    raised_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['item', 'alert_type'], name='unique_open_inventory_alert'),
+        ]
+    
+    def __str__(self):
+        return f"{self.alert_type} for item {self.item_id}"
+    
+    @classmethod
+    def record(cls, alerts, notification):
+        """Point the ``(item, alert_type)`` keys in ``alerts`` at ``notification``"""
+        now = timezone.now()
+        cls.objects.bulk_create(
+            [cls(item=item, alert_type=alert_type, notification=notification, raised_at=now) for item, alert_type in alerts],
+            update_conflicts=True,
+            unique_fields=['item', 'alert_type'],
+            update_fields=['notification', 'raised_at']
+        )
+
+
+class ExpirationEvent(models.Model):
+    """
+    An upcoming expiration threshold crossing for an item: the moment it
+    becomes 'expiring_soon' or 'expired'. Rows are rewritten when the item
+    changes and deleted once the scheduler has alerted on them.
+    """
+    
+    item = models.ForeignKey(
+        'items.Item',
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    alert_type = models.CharField(max_length=20)
+    due_at = models.DateTimeField()
+    
+    class Meta:
+        ordering = ['due_at', 'id']
+        indexes = [
+            models.Index(fields=['due_at'], name='expiration_event_due_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['item', 'alert_type'], name='unique_expiration_event'),
+        ]
+    
+    def __str__(self):
+        return f"{self.alert_type} for item {self.item_id} at {self.due_at}"
+
+
+class NotificationCounter(models.Model):
+    """
+    Denormalized unread count per user for the notification badge.
+    
+    Kept in step by creation, mark read/unread and deletes; expired
+    notifications stay counted until cleanup removes them, and
+    ``reconcile`` rebuilds the rows from the notification table.
+    """
+    
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='notification_counter'
+    )
+    unread = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.user_id}: {self.unread} unread"
+    
+    @classmethod
+    def adjust(cls, user_id, delta):
+        """Apply ``delta`` to a user's unread count, creating the row from the table if missing"""
+        if not delta:
+            return
+        updated = cls.objects.filter(user_id=user_id).update(unread=Greatest(F('unread') + delta, 0))
+        if not updated:
+            cls.reconcile(user_ids=[user_id])
+    
+    @classmethod
+    def broadcast_created(cls, audience):
+        """Count a new broadcast as unread for every user it reaches"""
+        counters = cls.objects.filter(user__is_active=True)
+        if audience == Notification.AUDIENCE_STAFF:
+            counters = counters.filter(user__is_staff=True)
+        counters.update(unread=F('unread') + 1)
+    
+    @classmethod
+    def for_user(cls, user):
+        """Current unread count, building the row on first use"""
+        counter = cls.objects.filter(user=user).values_list('unread', flat=True).first()
+        if counter is None:
+            cls.reconcile(user_ids=[user.id])
+            counter = cls.objects.filter(user=user).values_list('unread', flat=True).first() or 0
+        return counter
+    
+    @classmethod
+    def reconcile(cls, user_ids=None):
+        """
+        Recount unread notifications for ``user_ids`` (every active user and
+        every user with a counter or a notification when omitted). Returns
+        the number of rows that had drifted.
+        """
+        notifications = Notification.objects.filter(recipient__isnull=False)
+        counters = cls.objects.all()
+        users = User.objects.filter(is_active=True)
+        if user_ids is not None:
+            notifications = notifications.filter(recipient_id__in=user_ids)
+            counters = counters.filter(user_id__in=user_ids)
+            users = User.objects.filter(pk__in=user_ids)
+        
+        actual = dict(
+            notifications.order_by().values_list('recipient_id').annotate(
+                unread=Count('id', filter=Q(is_read=False))
+            )
+        )
+        
+        # Broadcasts each user can see and has neither read nor deleted
+        unread_broadcasts = Notification.objects.filter(
+            recipient__isnull=True, created_at__gte=OuterRef('date_joined')
+        ).filter(
+            Q(audience=Notification.AUDIENCE_ALL)
+            | Q(Exact(OuterRef('is_staff'), True), audience=Notification.AUDIENCE_STAFF)
+        ).filter(
+            ~Exists(NotificationReceipt.objects.filter(
+                Q(is_read=True) | Q(is_deleted=True),
+                notification=OuterRef('pk'), user=OuterRef(OuterRef('pk'))
+            ))
+        ).order_by().values('recipient').annotate(unread=Count('id')).values('unread')
+        for user_id, unread in users.annotate(
+            broadcast_unread=Coalesce(Subquery(unread_broadcasts, output_field=IntegerField()), 0)
+        ).values_list('pk', 'broadcast_unread'):
+            actual[user_id] = actual.get(user_id, 0) + unread
+        stored = dict(counters.values_list('user_id', 'unread'))
+        if user_ids is not None:
+            actual.update({user_id: actual.get(user_id, 0) for user_id in user_ids})
+        for user_id in stored:
+            actual.setdefault(user_id, 0)
+        
+        drifted = [
+            cls(user_id=user_id, unread=unread)
+            for user_id, unread in actual.items()
+            if stored.get(user_id) != unread
+        ]
+        cls.objects.bulk_create(
+            drifted, update_conflicts=True, unique_fields=['user'], update_fields=['unread', 'updated_at']
+        )
+        return len(drifted)
+
+
 class NotificationPreference(models.Model):
     """User preferences for notification types"""
     
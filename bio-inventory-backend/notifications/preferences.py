@@ -0,0 +1,101 @@
+"""
+Bulk notification preference lookups.
+
+Fan-out paths ask for the preferences of many users at once. A
+PreferenceResolver loads them in one query and answers from its cache for
+as long as it lives; users without a saved row get the model defaults.
+Requests share one resolver through ``preference_scope_middleware``; wrap
+a job in ``PreferenceResolver.scope()`` to do the same.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django.db.models import QuerySet
+from django.utils.decorators import sync_and_async_middleware
+
+from .models import NotificationPreference
+
+_current = ContextVar('notification_preference_resolver', default=None)
+
+
+class PreferenceResolver:
+    def __init__(self):
+        self._preferences = {}
+
+    @classmethod
+    def current(cls):
+        """The resolver of the enclosing ``scope()``, or a fresh one outside any"""
+        return _current.get() or cls()
+
+    @classmethod
+    @contextmanager
+    def scope(cls):
+        resolver = _current.get()
+        if resolver is not None:
+            yield resolver
+            return
+        resolver = cls()
+        token = _current.set(resolver)
+        try:
+            yield resolver
+        finally:
+            _current.reset(token)
+
+    def load(self, users):
+        """
+        Cache the preferences of ``users`` and return them as a list. A
+        queryset is fetched with its preferences joined in; for a list of
+        users only the ones not cached yet are looked up, in one query.
+        """
+        if isinstance(users, QuerySet):
+            users = list(users.select_related('notification_preferences'))
+            for user in users:
+                try:
+                    self._preferences[user.pk] = user.notification_preferences
+                except NotificationPreference.DoesNotExist:
+                    self._preferences[user.pk] = NotificationPreference(user=user)
+            return users
+
+        users = list(users)
+        missing = {user.pk for user in users} - self._preferences.keys()
+        if missing:
+            saved = {
+                preferences.user_id: preferences
+                for preferences in NotificationPreference.objects.filter(user_id__in=missing)
+            }
+            for user in users:
+                if user.pk in missing:
+                    self._preferences[user.pk] = saved.get(user.pk) or NotificationPreference(user=user)
+        return users
+
+    def get(self, user):
+        """``user``'s preferences, with the defaults applied when none are saved"""
+        if user.pk not in self._preferences:
+            self.load([user])
+        return self._preferences[user.pk]
+
+    def delivery(self, user, notification_type):
+        """How ``user`` receives ``notification_type`` (a preference field such as 'request_updates')"""
+        return getattr(self.get(user), notification_type, 'web')
+
+    def wants_email(self, user, notification_type):
+        return self.delivery(user, notification_type) in ['email', 'both']
+
+    def email_recipients(self, users, notification_type):
+        """The users in ``users`` who want ``notification_type`` by email"""
+        return [user for user in self.load(users) if self.wants_email(user, notification_type)]
+
+
+@sync_and_async_middleware
+def preference_scope_middleware(get_response):
+    """Share one PreferenceResolver between the lookups of each request"""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            with PreferenceResolver.scope():
+                return await get_response(request)
+    else:
+        def middleware(request):
+            with PreferenceResolver.scope():
+                return get_response(request)
+    return middleware
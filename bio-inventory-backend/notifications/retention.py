@@ -0,0 +1,119 @@
+"""
+Retention for the notification table.
+
+Rows are deleted a chunk of primary keys at a time, each chunk in its own
+short statement, so cleanup never holds long locks on the table every page
+load reads. Three rules decide what goes:
+
+* expired notifications (``expires_at`` in the past);
+* notifications older than ``NOTIFICATION_RETENTION_DAYS[type]`` days. For
+  personal notifications only read ones; broadcasts have no single read
+  state and go once they are old enough;
+* personal notifications beyond the newest ``NOTIFICATION_MAX_PER_USER``
+  of each user.
+
+Unread counters are reconciled for every user who lost an unread row.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import Notification, NotificationCounter
+
+
+def retention_targets(now=None):
+    """Yield ``(rule, queryset)`` for every set of rows the retention rules remove"""
+    now = now or timezone.now()
+    yield 'expired', Notification.objects.filter(expires_at__lt=now)
+
+    for notification_type, days in settings.NOTIFICATION_RETENTION_DAYS.items():
+        yield f'{notification_type} older than {days}d', Notification.objects.filter(
+            Q(recipient__isnull=True) | Q(is_read=True),
+            notification_type=notification_type,
+            created_at__lt=now - timedelta(days=days),
+        )
+
+    cap = settings.NOTIFICATION_MAX_PER_USER
+    if not cap:
+        return
+    over_cap = Notification.objects.filter(recipient__isnull=False).order_by().values('recipient').annotate(
+        total=Count('id')
+    ).filter(total__gt=cap).values_list('recipient', flat=True)
+    for user_id in over_cap:
+        # The newest row past the cap; it and everything older goes
+        created_at, pk = Notification.objects.filter(recipient_id=user_id).order_by(
+            '-created_at', '-id'
+        ).values_list('created_at', 'id')[cap]
+        yield f'user {user_id} over {cap}', Notification.objects.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lte=pk),
+            recipient_id=user_id,
+        )
+
+
+class Sweep:
+    """Running totals of a retention run, and who needs their counter rebuilt"""
+
+    def __init__(self):
+        self.deleted = 0
+        self.chunks = 0
+        self.unread_users = set()
+        self.broadcasts = False
+
+    def reconcile_counters(self):
+        if self.broadcasts:
+            # A broadcast may have been unread for anyone
+            NotificationCounter.reconcile()
+        elif self.unread_users:
+            NotificationCounter.reconcile(user_ids=sorted(self.unread_users))
+
+
+def delete_in_chunks(queryset, sweep, chunk_size=None, sleep=0, on_chunk=None):
+    """
+    Delete the rows of ``queryset`` in primary key order, ``chunk_size`` at a
+    time, sleeping ``sleep`` seconds between chunks. Each chunk re-applies the
+    queryset's filter to its key range, so rows that changed after they were
+    listed are kept. ``on_chunk(rows, seconds)`` is called after every chunk.
+    """
+    chunk_size = chunk_size or settings.NOTIFICATION_RETENTION_CHUNK_SIZE
+    last_pk = 0
+    while True:
+        started = time.monotonic()
+        rows = list(
+            queryset.filter(pk__gt=last_pk).order_by('pk').values_list('pk', 'recipient_id', 'is_read')[:chunk_size]
+        )
+        if not rows:
+            return
+        first_pk, last_pk = rows[0][0], rows[-1][0]
+        _, deleted = queryset.filter(pk__gte=first_pk, pk__lte=last_pk).delete()
+        deleted = deleted.get(Notification._meta.label, 0)
+
+        for _, recipient_id, is_read in rows:
+            if recipient_id is None:
+                sweep.broadcasts = True
+            elif not is_read:
+                sweep.unread_users.add(recipient_id)
+        sweep.deleted += deleted
+        sweep.chunks += 1
+        if on_chunk:
+            on_chunk(deleted, time.monotonic() - started)
+
+        if len(rows) < chunk_size:
+            return
+        if sleep:
+            time.sleep(sleep)
+
+
+def apply_retention(chunk_size=None, sleep=0, on_chunk=None, now=None):
+    """
+    Run every retention rule and reconcile the affected unread counters.
+    ``on_chunk(rule, rows, seconds)`` reports progress. Returns the Sweep.
+    """
+    sweep = Sweep()
+    for rule, queryset in retention_targets(now):
+        report = (lambda rows, seconds, rule=rule: on_chunk(rule, rows, seconds)) if on_chunk else None
+        delete_in_chunks(queryset, sweep, chunk_size=chunk_size, sleep=sleep, on_chunk=report)
+    sweep.reconcile_counters()
+    return sweep
@@ -1,7 +1,55 @@
+from collections import defaultdict
+
+from django.contrib.contenttypes.models import ContentType
 from rest_framework import serializers
 from .models import Notification, NotificationPreference
 
 
+def related_label_field(model):
+    """The field shown for a related object: ``name``, else ``title``, else None"""
+    field_names = {field.name for field in model._meta.concrete_fields}
+    for candidate in ('name', 'title'):
+        if candidate in field_names:
+            return candidate
+    return None
+
+
+def resolve_related_objects(notifications):
+    """
+    Attach ``_related_object`` to each notification with one query per
+    distinct target model instead of a content type and object fetch per row.
+    Targets that no longer exist resolve to None.
+    """
+    ids_by_type = defaultdict(set)
+    for notification in notifications:
+        if notification.content_type_id and notification.object_id:
+            ids_by_type[notification.content_type_id].add(notification.object_id)
+    
+    labels = {}
+    labelled_types = set()
+    for content_type_id, object_ids in ids_by_type.items():
+        content_type = ContentType.objects.get_for_id(content_type_id)
+        model = content_type.model_class()
+        field = related_label_field(model) if model else None
+        if field is None:
+            continue
+        labelled_types.add(content_type_id)
+        rows = model._default_manager.filter(pk__in=object_ids).values_list('pk', field)
+        for pk, label in rows:
+            labels[(content_type_id, pk)] = {'type': content_type.model, 'id': pk, field: label}
+    
+    for notification in notifications:
+        if notification.content_type_id in labelled_types and notification.object_id:
+            notification._related_object = labels.get((notification.content_type_id, notification.object_id))
+
+
+class NotificationListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        notifications = list(data.all() if hasattr(data, 'all') else data)
+        resolve_related_objects(notifications)
+        return super().to_representation(notifications)
+
+
 class NotificationSerializer(serializers.ModelSerializer):
     """Serializer for Notification model"""
     
@@ -13,29 +61,21 @@ class NotificationSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at', 'expires_at', 'is_expired'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at', 'is_expired']
+        list_serializer_class = NotificationListSerializer
     
     def to_representation(self, instance):
         """Custom serialization to include related object info if available"""
         data = super().to_representation(instance)
         
-        # Add related object information if available
-        if instance.content_object:
-            try:
-                if hasattr(instance.content_object, 'name'):
-                    data['related_object'] = {
-                        'type': instance.content_type.model,
-                        'id': instance.object_id,
-                        'name': instance.content_object.name
-                    }
-                elif hasattr(instance.content_object, 'title'):
-                    data['related_object'] = {
-                        'type': instance.content_type.model,
-                        'id': instance.object_id,
-                        'title': instance.content_object.title
-                    }
-            except Exception:
-                # Handle cases where related object might not exist anymore
-                data['related_object'] = None
+        # Broadcasts carry the reader's state from their receipt
+        data['is_read'] = getattr(instance, 'user_is_read', instance.is_read)
+        data['is_dismissed'] = getattr(instance, 'user_is_dismissed', instance.is_dismissed)
+        
+        # Single objects resolve here; lists are batched by NotificationListSerializer
+        if not hasattr(instance, '_related_object'):
+            resolve_related_objects([instance])
+        if hasattr(instance, '_related_object'):
+            data['related_object'] = instance._related_object
         
         return data
 
@@ -63,6 +103,8 @@ class NotificationCreateSerializer(serializers.ModelSerializer):
     
     def validate_recipient(self, value):
         """Ensure recipient is a valid user"""
+        if value is None:
+            raise serializers.ValidationError("A recipient is required; use a broadcast to reach everyone")
         if not value.is_active:
             raise serializers.ValidationError("Cannot send notification to inactive user")
         return value
@@ -86,9 +128,8 @@ class BulkNotificationSerializer(serializers.Serializer):
         """Validate that all notification IDs exist and belong to the user"""
         user = self.context['request'].user
         existing_ids = set(
-            Notification.objects.filter(
-                id__in=value, 
-                recipient=user
+            Notification.objects.for_user(user).filter(
+                id__in=value
             ).values_list('id', flat=True)
         )
         
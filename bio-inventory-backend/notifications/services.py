@@ -4,6 +4,8 @@ from django.utils import timezone
 from datetime import timedelta
 from .models import Notification, NotificationPreference
 from .email_service import EmailNotificationService
+from .retention import Sweep, delete_in_chunks
+from .preferences import PreferenceResolver
 
 
 class NotificationService:
@@ -66,6 +68,63 @@ class NotificationService:
         
         return notification
     
+    @staticmethod
+    def create_broadcast(
+        title,
+        message,
+        audience=Notification.AUDIENCE_ALL,
+        notification_type='info',
+        priority='medium',
+        related_object=None,
+        action_url=None,
+        metadata=None,
+        expires_in_hours=None
+    ):
+        """
+        Create one notification shared by every user in ``audience``
+        
+        Stored as a single row with no recipient; each user's read,
+        dismissed and deleted state is kept in a NotificationReceipt.
+        
+        Args:
+            title: Short notification title
+            message: Detailed notification message
+            audience: 'all' for every active user, 'staff' for staff only
+            notification_type: Type of notification
+            priority: Priority level
+            related_object: Optional related model instance
+            action_url: Optional URL for clickable notifications
+            metadata: Optional additional data as dict
+            expires_in_hours: Optional hours until notification expires
+        
+        Returns:
+            Notification instance
+        """
+        
+        expires_at = None
+        if expires_in_hours:
+            expires_at = timezone.now() + timedelta(hours=expires_in_hours)
+        
+        content_type = None
+        object_id = None
+        if related_object:
+            content_type = ContentType.objects.get_for_model(related_object)
+            object_id = related_object.id
+        
+        return Notification.objects.create(
+            recipient=None,
+            audience=audience,
+            title=title,
+            message=message,
+            notification_type=notification_type,
+            priority=priority,
+            content_type=content_type,
+            object_id=object_id,
+            action_url=action_url,
+            metadata=metadata or {},
+            expires_at=expires_at
+        )
+    
     @staticmethod
     def create_bulk_notification(
         recipients,
@@ -112,12 +171,9 @@ class NotificationService:
         Args:
             item: Item instance that triggered the alert
             alert_type: Type of alert (expired, expiring_soon, low_stock)
-            recipients: List of users to notify (defaults to all active users)
+            recipients: List of users to notify (defaults to a broadcast to all active users)
         """
         
-        if recipients is None:
-            recipients = User.objects.filter(is_active=True)
-        
         alert_messages = {
             'expired': {
                 'title': f'Item Expired: {item.name}',
@@ -140,8 +196,7 @@ class NotificationService:
         if not alert_config:
             raise ValueError(f"Invalid alert type: {alert_type}")
         
-        return NotificationService.create_bulk_notification(
-            recipients=recipients,
+        alert = dict(
             title=alert_config['title'],
             message=alert_config['message'],
             notification_type='inventory_alert',
@@ -151,6 +206,41 @@ class NotificationService:
             metadata={'alert_type': alert_type, 'item_id': item.id},
             expires_in_hours=72  # Expire after 3 days
         )
+        if recipients is None:
+            return [NotificationService.create_broadcast(**alert)]
+        return NotificationService.create_bulk_notification(recipients=recipients, **alert)
+    
+    @staticmethod
+    def create_inventory_rollup(alerts, recipients=None):
+        """
+        Create one "N items need attention" notification for several alerts
+        
+        Args:
+            alerts: List of (item, alert_type) pairs
+            recipients: List of users to notify (defaults to a broadcast to all active users)
+        """
+        
+        labels = {'expired': 'expired', 'expiring_soon': 'expiring soon', 'low_stock': 'low stock'}
+        shown = [f'{item.name} ({labels[alert_type]})' for item, alert_type in alerts[:5]]
+        if len(alerts) > len(shown):
+            shown.append(f'{len(alerts) - len(shown)} more')
+        item_count = len({item.id for item, _ in alerts})
+        
+        rollup = dict(
+            title=f'{item_count} items need attention',
+            message=f'Inventory alerts: {", ".join(shown)}. Please check inventory.',
+            notification_type='inventory_alert',
+            priority='high' if any(alert_type == 'expired' for _, alert_type in alerts) else 'medium',
+            action_url='/inventory',
+            metadata={
+                'alert_type': 'rollup',
+                'alerts': [{'item_id': item.id, 'alert_type': alert_type} for item, alert_type in alerts],
+            },
+            expires_in_hours=72
+        )
+        if recipients is None:
+            return [NotificationService.create_broadcast(**rollup)]
+        return NotificationService.create_bulk_notification(recipients=recipients, **rollup)
     
     @staticmethod
     def create_request_notification(request_obj, action, user=None, recipients=None):
@@ -232,14 +322,20 @@ class NotificationService:
         Args:
             title: Notification title
             message: Notification message
-            recipients: List of users to notify (defaults to all active users)
+            recipients: List of users to notify (defaults to a broadcast to all active users)
             priority: Priority level
             notification_type: Type of notification
             **kwargs: Additional arguments
         """
         
         if recipients is None:
-            recipients = User.objects.filter(is_active=True)
+            return [NotificationService.create_broadcast(
+                title=title,
+                message=message,
+                notification_type=notification_type,
+                priority=priority,
+                **kwargs
+            )]
         
         return NotificationService.create_bulk_notification(
             recipients=recipients,
@@ -252,18 +348,16 @@ class NotificationService:
     
     @staticmethod
     def cleanup_expired_notifications():
-        """Remove expired notifications"""
-        now = timezone.now()
-        expired_count, _ = Notification.objects.filter(
-            expires_at__lt=now
-        ).delete()
-        return expired_count
+        """Remove expired notifications, a chunk at a time"""
+        sweep = Sweep()
+        delete_in_chunks(Notification.objects.filter(expires_at__lt=timezone.now()), sweep)
+        sweep.reconcile_counters()
+        return sweep.deleted
     
     @staticmethod
     def get_user_preferences(user):
-        """Get notification preferences for a user"""
-        preferences, created = NotificationPreference.objects.get_or_create(user=user)
-        return preferences
+        """Get notification preferences for a user (the defaults when none are saved)"""
+        return PreferenceResolver.current().get(user)
     
     @staticmethod
     def notify_new_request_created(request_obj):
@@ -1,8 +1,14 @@
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import NotificationPreference
+from items.models import Item
+from outbox.dispatch import handles
+from requests.models import Request
+from .models import Notification, NotificationPreference, NotificationCounter
 from .services import NotificationService
+from .events import publish_event
+from .alerts import queue_inventory_alert
+from .expirations import schedule_item
 
 
 @receiver(post_save, sender=User)
@@ -12,56 +18,75 @@ def create_notification_preferences(sender, instance, created, **kwargs):
         NotificationPreference.objects.get_or_create(user=instance)
 
 
-# Automatic notification creation signals
+@receiver(post_save, sender=Notification)
+def count_new_unread_notification(sender, instance, created, **kwargs):
+    """Bump the recipient's unread counter for new unread notifications"""
+    if not created or instance.is_read:
+        return
+    if instance.is_broadcast:
+        NotificationCounter.broadcast_created(instance.audience)
+    else:
+        NotificationCounter.adjust(instance.recipient_id, 1)
 
-@receiver(post_save, sender='items.Item')
-def check_item_alerts(sender, instance, created, **kwargs):
-    """Check for inventory alerts when item is updated"""
-    if not created:  # Only check on updates, not creation
-        if instance.expiration_status == 'EXPIRED':
-            NotificationService.create_inventory_alert(
-                item=instance,
-                alert_type='expired'
-            )
-        elif instance.expiration_status == 'EXPIRING_SOON':
-            NotificationService.create_inventory_alert(
-                item=instance,
-                alert_type='expiring_soon'
-            )
-        elif instance.is_low_stock:
-            NotificationService.create_inventory_alert(
-                item=instance,
-                alert_type='low_stock'
-            )
 
+@receiver(post_save, sender=Notification)
+def stream_new_notification(sender, instance, created, **kwargs):
+    """Push new notifications to the recipient's open event streams"""
+    if created:
+        publish_event(instance.recipient_id, 'notification.created', {
+            'id': instance.id,
+            'title': instance.title,
+            'notification_type': instance.notification_type,
+            'priority': instance.priority,
+            'action_url': instance.action_url,
+            'created_at': instance.created_at.isoformat(),
+        }, audience=instance.audience or None)
 
-@receiver(post_save, sender='requests.Request')
-def notify_request_status_change(sender, instance, created, **kwargs):
-    """Send notification when request status changes"""
-    if not created and hasattr(instance, '_previous_status'):
-        # Only notify if status actually changed
-        if instance.status != instance._previous_status:
-            action_map = {
-                'APPROVED': 'approved',
-                'REJECTED': 'rejected',
-                'ORDERED': 'ordered',
-                'RECEIVED': 'received'
-            }
-            
-            action = action_map.get(instance.status)
-            if action:
-                NotificationService.create_request_notification(
-                    request_obj=instance,
-                    action=action
-                )
 
+# Automatic notification creation, dispatched from the outbox
+
+@handles('item.saved')
+def check_item_alerts(event):
+    """Queue inventory alerts when item is updated; they are coalesced on commit"""
+    if event['created']:  # Only check on updates, not creation
+        return
+    instance = Item.objects.filter(pk=event['item_id']).first()
+    if instance is None:
+        return
+    if instance.expiration_status == 'EXPIRED':
+        queue_inventory_alert(instance, 'expired')
+    elif instance.expiration_status == 'EXPIRING_SOON':
+        queue_inventory_alert(instance, 'expiring_soon')
+    elif instance.is_low_stock:
+        queue_inventory_alert(instance, 'low_stock')
 
-@receiver(pre_save, sender='requests.Request')
-def store_previous_status(sender, instance, **kwargs):
-    """Store previous status before saving to detect changes"""
-    if instance.pk:
-        try:
-            previous = sender.objects.get(pk=instance.pk)
-            instance._previous_status = previous.status
-        except sender.DoesNotExist:
-            instance._previous_status = None
\ No newline at end of file
+
+@handles('item.saved')
+def schedule_expiration_alerts(event):
+    """Keep the item's upcoming threshold crossings scheduled"""
+    instance = Item.objects.filter(pk=event['item_id']).first()
+    if instance is not None:
+        schedule_item(instance)
+
+
+@handles('request.saved')
+def notify_request_status_change(event):
+    """Send notification when request status changes"""
+    # Only status changes of existing requests are published besides creations
+    if event['created']:
+        return
+    action_map = {
+        'APPROVED': 'approved',
+        'REJECTED': 'rejected',
+        'ORDERED': 'ordered',
+        'RECEIVED': 'received'
+    }
+    
+    action = action_map.get(event['status'])
+    if action:
+        request_obj = Request.objects.filter(pk=event['request_id']).first()
+        if request_obj is not None:
+            NotificationService.create_request_notification(
+                request_obj=request_obj,
+                action=action
+            )
@@ -0,0 +1,673 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+import json
+
+from funding.models import Fund
+from items.models import Item, ItemType, Vendor
+from outbox.dispatch import OutboxWorker
+from requests.models import Request
+
+from .models import (
+    ExpirationEvent, Notification, NotificationCounter, NotificationPreference, NotificationReceipt
+)
+from .events import broker
+from .services import NotificationService
+from .email_service import EmailNotificationService
+from .preferences import PreferenceResolver
+from .email_templates import EmailTemplateRegistry
+from .expirations import ExpirationScheduler, local_midnight, rebuild_schedule
+
+
+class NotificationCounterTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.other = User.objects.create_user(username='other', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+
+    def notify(self, user=None, **kwargs):
+        return NotificationService.create_notification(
+            recipient=user or self.user, title='Hello', message='World', **kwargs
+        )
+
+    def unread(self, user=None):
+        return NotificationCounter.objects.get(user=user or self.user).unread
+
+    def test_summary_is_one_grouped_query(self):
+        self.notify(notification_type='inventory_alert', priority='high')
+        self.notify(notification_type='inventory_alert', priority='medium').mark_as_read()
+        self.notify(notification_type='system', priority='high')
+        self.notify(notification_type='system', expires_in_hours=1)
+        Notification.objects.filter(notification_type='system', expires_at__isnull=False).update(
+            expires_at=timezone.now() - timedelta(minutes=1)
+        )
+        self.notify(user=self.other)
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/notifications/summary/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {
+            'total': 3,
+            'unread': 2,
+            'by_type': {'inventory_alert': 2, 'system': 1},
+            'by_priority': {'high': 2, 'medium': 1},
+        })
+
+    def test_counter_follows_read_state_changes(self):
+        first, second, third = self.notify(), self.notify(), self.notify()
+        self.notify(user=self.other)
+        self.assertEqual(self.unread(), 3)
+        self.assertEqual(self.unread(self.other), 1)
+
+        self.client.post(f'/api/notifications/{first.id}/mark_read/')
+        self.client.post(f'/api/notifications/{first.id}/mark_read/')
+        self.assertEqual(self.unread(), 2)
+
+        self.client.post(f'/api/notifications/{first.id}/mark_unread/')
+        self.assertEqual(self.unread(), 3)
+
+        self.client.post('/api/notifications/bulk_action/', {
+            'notification_ids': [first.id, second.id], 'action': 'mark_read'
+        }, format='json')
+        self.assertEqual(self.unread(), 1)
+
+        self.client.post('/api/notifications/bulk_action/', {
+            'notification_ids': [second.id, third.id], 'action': 'delete'
+        }, format='json')
+        self.assertEqual(self.unread(), 0)
+
+        self.notify()
+        self.client.post('/api/notifications/mark_all_read/')
+        self.assertEqual(self.unread(), 0)
+        self.assertEqual(self.unread(self.other), 1)
+
+        response = self.client.get('/api/notifications/unread_count/')
+        self.assertEqual(response.data, {'unread': 0})
+
+    def test_reconcile_corrects_drift(self):
+        self.notify()
+        self.notify()
+        NotificationCounter.objects.filter(user=self.user).update(unread=7)
+        NotificationCounter.objects.filter(user=self.other).delete()
+        Notification.objects.create(recipient=self.other, title='Raw', message='Insert')
+        NotificationCounter.objects.filter(user=self.other).delete()
+
+        out = StringIO()
+        call_command('reconcile_notification_counters', stdout=out)
+        self.assertIn('Corrected 2', out.getvalue())
+        self.assertEqual(self.unread(), 2)
+        self.assertEqual(self.unread(self.other), 1)
+
+    def test_cleanup_reconciles_counters(self):
+        self.notify(expires_in_hours=1)
+        self.notify()
+        Notification.objects.filter(expires_at__isnull=False).update(
+            expires_at=timezone.now() - timedelta(minutes=1)
+        )
+
+        self.assertEqual(NotificationService.cleanup_expired_notifications(), 1)
+        self.assertEqual(self.unread(), 1)
+
+
+class BroadcastNotificationTest(APITestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(username='staff', password='testpass123', is_staff=True)
+        self.users = [
+            User.objects.create_user(username=f'user{i}', password='testpass123') for i in range(5)
+        ]
+        self.user = self.users[0]
+        self.client.force_authenticate(user=self.user)
+
+    def unread(self, user=None):
+        # Counters are built on first use for users who never had a personal notification
+        return NotificationCounter.for_user(user or self.user)
+
+    def listed(self, user=None, **params):
+        self.client.force_authenticate(user=user or self.user)
+        response = self.client.get('/api/notifications/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {row['id']: row['is_read'] for row in response.data['results']}
+
+    def test_broadcast_is_stored_once(self):
+        [broadcast] = NotificationService.create_system_notification('Maintenance', 'Down at noon')
+
+        self.assertEqual(Notification.objects.count(), 1)
+        self.assertIsNone(broadcast.recipient)
+        for user in [self.staff, *self.users]:
+            self.assertEqual(self.listed(user), {broadcast.id: False})
+            self.assertEqual(self.unread(user), 1)
+
+    def test_read_and_delete_are_per_user(self):
+        broadcast = NotificationService.create_broadcast('Maintenance', 'Down at noon')
+        other = self.users[1]
+
+        self.client.post(f'/api/notifications/{broadcast.id}/mark_read/')
+        self.assertEqual(self.listed(), {broadcast.id: True})
+        self.assertEqual(self.listed(other), {broadcast.id: False})
+        self.assertEqual(self.listed(is_read='false'), {})
+        self.assertEqual(self.unread(), 0)
+        self.assertEqual(self.unread(other), 1)
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.delete(f'/api/notifications/{broadcast.id}/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertTrue(Notification.objects.filter(pk=broadcast.id).exists())
+        self.assertEqual(self.listed(), {})
+        self.assertEqual(self.listed(other), {broadcast.id: False})
+
+        self.client.force_authenticate(user=other)
+        self.client.post('/api/notifications/bulk_action/', {
+            'notification_ids': [broadcast.id], 'action': 'delete'
+        }, format='json')
+        self.assertEqual(self.listed(other), {})
+        self.assertEqual(self.unread(other), 0)
+        self.assertEqual(NotificationReceipt.objects.filter(notification=broadcast).count(), 2)
+
+        response = self.client.patch(f'/api/notifications/{broadcast.id}/', {'title': 'Changed'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_mark_all_read_and_summary_include_broadcasts(self):
+        personal = NotificationService.create_notification(recipient=self.user, title='Hi', message='You')
+        broadcast = NotificationService.create_broadcast('Maintenance', 'Down at noon', priority='high')
+        NotificationService.create_broadcast('Staff meeting', 'Room 4', audience=Notification.AUDIENCE_STAFF)
+
+        response = self.client.get('/api/notifications/summary/')
+        self.assertEqual(response.data['total'], 2)
+        self.assertEqual(response.data['unread'], 2)
+        self.assertEqual(response.data['by_priority'], {'high': 1, 'medium': 1})
+
+        response = self.client.post('/api/notifications/mark_all_read/')
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(self.listed(), {personal.id: True, broadcast.id: True})
+        self.assertEqual(self.client.get('/api/notifications/summary/').data['unread'], 0)
+        self.assertEqual(self.unread(), 0)
+
+        self.assertEqual(len(self.listed(self.staff)), 2)
+        self.assertEqual(self.unread(self.staff), 2)
+
+    def test_broadcasts_predate_new_users(self):
+        NotificationService.create_broadcast('Old news', 'Before your time')
+        newcomer = User.objects.create_user(username='newcomer', password='testpass123')
+
+        self.assertEqual(self.listed(newcomer), {})
+        self.assertEqual(self.unread(newcomer), 0)
+
+    def test_reconcile_counts_broadcasts(self):
+        read = NotificationService.create_broadcast('One', 'Read it')
+        NotificationService.create_broadcast('Two', 'Unread')
+        NotificationService.create_broadcast('Three', 'Staff only', audience=Notification.AUDIENCE_STAFF)
+        read.mark_as_read(self.user)
+        NotificationCounter.objects.update(unread=42)
+
+        NotificationCounter.reconcile()
+        self.assertEqual(self.unread(), 1)
+        self.assertEqual(self.unread(self.users[1]), 2)
+        self.assertEqual(self.unread(self.staff), 3)
+
+    def test_cleanup_of_expired_broadcasts_reconciles_counters(self):
+        NotificationService.create_broadcast('Soon gone', 'Expires', expires_in_hours=1)
+        Notification.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+
+        self.assertEqual(NotificationService.cleanup_expired_notifications(), 1)
+        self.assertEqual(self.unread(), 0)
+        self.assertEqual(self.unread(self.staff), 0)
+
+
+@override_settings(NOTIFICATION_RETENTION_DAYS={'info': 30}, NOTIFICATION_MAX_PER_USER=3)
+class NotificationRetentionTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.other = User.objects.create_user(username='other', password='testpass123')
+
+    def notify(self, days_ago=0, user=None, is_read=False, **kwargs):
+        notification = NotificationService.create_notification(
+            recipient=user or self.user, title='Hello', message='World', **kwargs
+        )
+        if is_read:
+            notification.mark_as_read()
+        Notification.objects.filter(pk=notification.pk).update(
+            created_at=timezone.now() - timedelta(days=days_ago)
+        )
+        return notification
+
+    def run_command(self, *args):
+        out = StringIO()
+        call_command('apply_notification_retention', '--sleep=0', *args, stdout=out)
+        return out.getvalue()
+
+    def test_rules_delete_in_chunks(self):
+        old_read = [self.notify(days_ago=40, is_read=True) for _ in range(5)]
+        old_unread = self.notify(days_ago=40)
+        old_warning = self.notify(days_ago=40, notification_type='warning', is_read=True)
+        expired = self.notify(user=self.other, expires_in_hours=1)
+        Notification.objects.filter(pk=expired.pk).update(expires_at=timezone.now() - timedelta(minutes=1))
+        recent = self.notify()
+
+        output = self.run_command('--dry-run')
+        self.assertIn('info older than 30d: would delete 5', output)
+        self.assertEqual(Notification.objects.count(), 9)
+
+        output = self.run_command('--chunk-size=2')
+        self.assertEqual(output.count('info older than 30d: deleted'), 3)
+        self.assertIn('expired: deleted 1 row(s)', output)
+        self.assertIn('Deleted 6 notification(s) in 4 chunk(s)', output)
+
+        self.assertFalse(Notification.objects.filter(pk__in=[n.pk for n in old_read]).exists())
+        self.assertEqual(
+            set(Notification.objects.values_list('pk', flat=True)),
+            {old_unread.pk, old_warning.pk, recent.pk}
+        )
+        self.assertEqual(NotificationCounter.for_user(self.other), 0)
+
+    def test_per_user_cap_keeps_newest(self):
+        kept = [self.notify(days_ago=days, notification_type='warning') for days in (1, 2, 3)]
+        for days in (4, 5):
+            self.notify(days_ago=days, notification_type='warning')
+        self.notify(user=self.other)
+        self.assertEqual(NotificationCounter.for_user(self.user), 5)
+
+        self.assertIn(f'user {self.user.id} over 3: deleted 2 row(s)', self.run_command())
+        self.assertEqual(
+            set(Notification.objects.filter(recipient=self.user).values_list('pk', flat=True)),
+            {n.pk for n in kept}
+        )
+        self.assertEqual(NotificationCounter.for_user(self.user), 3)
+        self.assertEqual(Notification.objects.filter(recipient=self.other).count(), 1)
+
+
+class InventoryAlertCoalescingTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        item_type = ItemType.objects.create(name='Reagent')
+        expired = date.today() - timedelta(days=3)
+        self.items = [
+            Item.objects.create(name=f'Buffer {i}', item_type=item_type, expiration_date=expired)
+            for i in range(3)
+        ]
+        OutboxWorker().run_pending()
+
+    def alerts(self):
+        return Notification.objects.filter(notification_type='inventory_alert')
+
+    def dispatch(self):
+        # Alerts queued by the outbox handlers are flushed when the batch commits
+        with self.captureOnCommitCallbacks(execute=True):
+            OutboxWorker().run_pending()
+
+    def test_repeated_saves_alert_once(self):
+        item = self.items[0]
+        for quantity in range(5):
+            item.quantity = quantity
+            item.save()
+            self.dispatch()
+
+        [alert] = self.alerts()
+        self.assertEqual(alert.title, 'Item Expired: Buffer 0')
+        self.assertIsNone(alert.recipient)
+
+        # Once the open alert has expired the item can alert again
+        self.alerts().update(expires_at=timezone.now() - timedelta(minutes=1))
+        item.save()
+        self.dispatch()
+        self.assertEqual(self.alerts().count(), 2)
+
+    def test_bulk_edit_rolls_up_into_one_notification(self):
+        for item in self.items:
+            for _ in range(2):
+                item.save()
+        self.assertEqual(self.alerts().count(), 0)
+        # Each event commits on its own; the queued alerts are flushed once
+        # the whole batch has
+        OutboxWorker().run_pending()
+
+        [rollup] = self.alerts()
+        self.assertEqual(rollup.title, '3 items need attention')
+        self.assertEqual(rollup.priority, 'high')
+        self.assertEqual(
+            [alert['item_id'] for alert in rollup.metadata['alerts']], [item.id for item in self.items]
+        )
+        self.assertEqual(NotificationCounter.for_user(self.user), 1)
+
+        for item in self.items:
+            item.save()
+        self.dispatch()
+        self.assertEqual(self.alerts().count(), 1)
+
+    def test_alerts_are_checked_against_committed_state(self):
+        item = self.items[0]
+        item.save()
+        Item.objects.filter(pk=item.pk).update(expiration_date=None)
+        self.dispatch()
+        self.assertEqual(self.alerts().count(), 0)
+
+
+class FrozenClock:
+    def __init__(self, now):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += timedelta(seconds=seconds)
+
+
+class ExpirationSchedulerTest(TestCase):
+    def setUp(self):
+        self.item_type = ItemType.objects.create(name='Reagent')
+        self.today = date.today()
+        self.clock = FrozenClock(local_midnight(self.today) + timedelta(hours=12))
+
+    def item(self, name, expires_in_days, alert_days=3):
+        return Item.objects.create(
+            name=name, item_type=self.item_type,
+            expiration_date=self.today + timedelta(days=expires_in_days), expiration_alert_days=alert_days
+        )
+
+    def alerts(self):
+        return list(Notification.objects.filter(notification_type='inventory_alert').order_by('id'))
+
+    def test_sleeps_until_each_crossing_and_alerts_once(self):
+        self.item('Buffer A', 10)
+        self.item('Buffer B', 10)
+        Item.objects.create(name='Shelf', item_type=self.item_type)
+        OutboxWorker().run_pending()
+        self.assertEqual(ExpirationEvent.objects.count(), 4)
+
+        scheduler = ExpirationScheduler(clock=self.clock, sleep=self.clock.sleep, max_sleep=30 * 86400)
+        stop_at = local_midnight(self.today + timedelta(days=12))
+        scheduler.run(should_stop=lambda: self.clock.now >= stop_at)
+
+        day = 86400
+        self.assertEqual(self.clock.sleeps, [6.5 * day, 4 * day, 30 * day])
+        expiring, expired = self.alerts()
+        self.assertEqual(expiring.title, '2 items need attention')
+        self.assertEqual({a['alert_type'] for a in expiring.metadata['alerts']}, {'expiring_soon'})
+        self.assertEqual({a['alert_type'] for a in expired.metadata['alerts']}, {'expired'})
+        self.assertFalse(ExpirationEvent.objects.exists())
+
+        self.assertEqual(scheduler.run_due(), 0)
+        self.assertEqual(len(self.alerts()), 2)
+
+    def test_saves_reschedule_the_item(self):
+        item = self.item('Buffer A', 10)
+        item.expiration_date = self.today + timedelta(days=20)
+        item.save()
+        OutboxWorker().run_pending()
+        self.assertEqual(
+            dict(ExpirationEvent.objects.values_list('alert_type', 'due_at')),
+            {
+                'expiring_soon': local_midnight(self.today + timedelta(days=17)),
+                'expired': local_midnight(self.today + timedelta(days=21)),
+            }
+        )
+
+        # Crossings already behind the item are not scheduled
+        item.expiration_alert_days = 30
+        item.save()
+        OutboxWorker().run_pending()
+        self.assertEqual(list(ExpirationEvent.objects.values_list('alert_type', flat=True)), ['expired'])
+
+        item.expiration_date = None
+        item.save()
+        OutboxWorker().run_pending()
+        self.assertFalse(ExpirationEvent.objects.exists())
+
+    def test_rebuild_and_single_pass_command(self):
+        self.item('Buffer A', 10)
+        self.item('Buffer B', 40)
+        OutboxWorker().run_pending()
+        ExpirationEvent.objects.all().delete()
+        self.assertEqual(rebuild_schedule(), 4)
+
+        ExpirationEvent.objects.filter(alert_type='expiring_soon').update(due_at=timezone.now())
+        out = StringIO()
+        call_command('run_expiration_scheduler', '--once', stdout=out)
+        self.assertIn('Alerted on 2 crossing(s)', out.getvalue())
+        self.assertEqual(ExpirationEvent.objects.count(), 2)
+
+
+class PreferenceResolverTest(TestCase):
+    def setUp(self):
+        self.requester = User.objects.create_user(username='requester', password='testpass123')
+        self.request_obj = Request.objects.create(
+            item_name='Pipette tips', requested_by=self.requester, unit_price=Decimal('10.00')
+        )
+
+    def add_admins(self, count, delivery='email'):
+        for _ in range(count):
+            admin = User.objects.create_user(
+                username=f'admin{User.objects.count()}', email='admin@example.com', is_staff=True
+            )
+            NotificationPreference.objects.filter(user=admin).update(request_updates=delivery)
+
+    def test_loads_preferences_in_one_query_with_defaults(self):
+        self.add_admins(2)
+        self.add_admins(1, delivery='web')
+        NotificationPreference.objects.filter(user=self.requester).delete()
+        resolver = PreferenceResolver()
+
+        with self.assertNumQueries(1):
+            users = resolver.load(User.objects.order_by('id'))
+        with self.assertNumQueries(0):
+            deliveries = [resolver.delivery(user, 'request_updates') for user in users]
+            self.assertFalse(resolver.get(self.requester).pk)
+        self.assertEqual(deliveries, ['web', 'email', 'email', 'web'])
+
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                len(PreferenceResolver().email_recipients(users, 'request_updates')), 2
+            )
+
+    def test_scope_shares_one_resolver(self):
+        with PreferenceResolver.scope() as resolver:
+            self.assertIs(PreferenceResolver.current(), resolver)
+            with self.assertNumQueries(1):
+                for _ in range(3):
+                    EmailNotificationService.should_send_email(self.requester, 'request_updates')
+        self.assertIsNot(PreferenceResolver.current(), resolver)
+
+    def test_new_request_email_fan_out_is_constant(self):
+        def queries_for_new_request():
+            with CaptureQueriesContext(connection) as queries:
+                self.assertTrue(EmailNotificationService.send_new_request_notification(self.request_obj))
+            return len(queries)
+
+        self.add_admins(2)
+        few = queries_for_new_request()
+        self.add_admins(6)
+        self.add_admins(3, delivery='web')
+        self.assertEqual(queries_for_new_request(), few)
+
+
+class EmailTemplateTest(TestCase):
+    def setUp(self):
+        self.requester = User.objects.create_user(
+            username='requester', email='requester@example.com', first_name='Ada'
+        )
+        self.request_obj = Request.objects.create(
+            item_name='Pipette tips', requested_by=self.requester, unit_price=Decimal('10.00'),
+            notes='Bring <gloves> & tape'
+        )
+
+    def test_templates_are_compiled_once(self):
+        registry = EmailTemplateRegistry()
+        html, text = registry.get('new_request')
+        self.assertIsNotNone(text)
+        self.assertIs(registry.get('new_request')[0], html)
+
+        # Emails without a text companion still get a stripped body
+        registry._templates['legacy'] = (html, None)
+        html_content, plain_text = registry.render('legacy', {'request': self.request_obj, 'recipient': self.requester})
+        self.assertIn('<h3>Request Details</h3>', html_content)
+        self.assertIn('--- REQUEST DETAILS ---', plain_text)
+
+    def test_plain_text_comes_from_the_companion_template(self):
+        self.assertTrue(EmailNotificationService.send_email_notification(
+            recipients=[self.requester],
+            subject='Order Placed: Pipette tips',
+            template_name='order_placed',
+            context={'request': self.request_obj, 'recipient': self.requester, 'total_cost': 10},
+        ))
+
+        [message] = mail.outbox
+        self.assertIn('Hello Ada,', message.body)
+        self.assertIn('--- ORDER DETAILS ---\nItem: Pipette tips\n', message.body)
+        self.assertIn('Total Cost: $10.00', message.body)
+        self.assertNotIn('<', message.body)
+        self.assertIn('<h3>Order Details</h3>', message.alternatives[0][0])
+
+        EmailNotificationService.send_email_notification(
+            recipients=[self.requester],
+            subject='New Request',
+            template_name='new_request',
+            context={'request': self.request_obj, 'recipient': self.requester},
+        )
+        self.assertIn('Bring <gloves> & tape', mail.outbox[1].body)
+
+
+class NotificationSerializerTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.vendor = Vendor.objects.create(name='Sigma')
+        self.fund = Fund.objects.create(name='Main Fund', total_budget=Decimal('1000.00'), created_by=self.user)
+
+    def notify_about(self, related_object, count):
+        for _ in range(count):
+            NotificationService.create_notification(
+                recipient=self.user, title='Hello', message='World', related_object=related_object
+            )
+
+    def list_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/notifications/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['results'], len(queries)
+
+    def test_related_objects_resolved_per_model(self):
+        self.notify_about(self.vendor, 1)
+        self.notify_about(self.fund, 1)
+        results, few = self.list_queries()
+        self.assertEqual(
+            sorted(row['related_object']['type'] for row in results), ['fund', 'vendor']
+        )
+
+        self.notify_about(self.vendor, 12)
+        self.notify_about(self.fund, 11)
+        self.notify_about(None, 5)
+        results, many = self.list_queries()
+        self.assertEqual(len(results), 25)
+        self.assertEqual(few, many)
+
+        self.assertIn(
+            {'type': 'vendor', 'id': self.vendor.id, 'name': 'Sigma'},
+            [row.get('related_object') for row in results]
+        )
+
+    def test_deleted_target_resolves_to_none(self):
+        self.notify_about(self.vendor, 2)
+        self.vendor.delete()
+
+        results, _ = self.list_queries()
+        self.assertEqual([row['related_object'] for row in results], [None, None])
+
+        response = self.client.get(f"/api/notifications/{results[0]['id']}/")
+        self.assertIsNone(response.data['related_object'])
+
+
+def parse_event(chunk):
+    fields = dict(line.split(': ', 1) for line in chunk.decode().strip().splitlines())
+    fields['data'] = json.loads(fields['data'])
+    return fields
+
+
+@override_settings(NOTIFICATION_EVENTS_BACKEND='local', NOTIFICATION_STREAM_HEARTBEAT=1)
+class NotificationStreamTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+
+    async def open_stream(self, **headers):
+        response = await self.async_client.get(
+            '/api/notifications/stream/', headers={'authorization': f'Token {self.token.key}', **headers}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertTrue((await anext(stream)).startswith(b'retry: '))
+        return stream
+
+    async def test_requires_token(self):
+        response = await self.async_client.get('/api/notifications/stream/?ticket=nope')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_ticket_authenticates_without_token_in_url(self):
+        response = await self.async_client.post(
+            '/api/notifications/stream_ticket/', headers={'authorization': f'Token {self.token.key}'}
+        )
+        ticket = response.json()['ticket']
+        self.assertNotIn(self.token.key, ticket)
+
+        response = await self.async_client.get(f'/api/notifications/stream/?ticket={ticket}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        await aiter(response.streaming_content).aclose()
+
+        # API tokens are no longer accepted in the query string
+        response = await self.async_client.get(f'/api/notifications/stream/?token={self.token.key}')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        with override_settings(NOTIFICATION_STREAM_TICKET_SECONDS=-1):
+            response = await self.async_client.get(f'/api/notifications/stream/?ticket={ticket}')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_pushes_new_notifications(self):
+        stream = await self.open_stream()
+
+        def create():
+            with self.captureOnCommitCallbacks(execute=True):
+                return NotificationService.create_notification(
+                    recipient=self.user, title='Stock low', message='Reorder tips'
+                )
+        notification = await sync_to_async(create)()
+
+        event = parse_event(await anext(stream))
+        self.assertEqual(event['event'], 'notification.created')
+        self.assertEqual(event['data']['id'], notification.id)
+        self.assertEqual(event['data']['title'], 'Stock low')
+        await stream.aclose()
+
+    async def test_heartbeat_and_resume_from_last_event_id(self):
+        stream = await self.open_stream()
+        self.assertEqual(await anext(stream), b': heartbeat\n\n')
+        first = broker.publish(self.user.id, 'notification.read', {'ids': [1]})
+        self.assertEqual(parse_event(await anext(stream))['id'], str(first))
+        await stream.aclose()
+
+        # Events published while disconnected are replayed after Last-Event-ID
+        broker.publish(self.user.id, 'notification.read', {'ids': [2]})
+        broker.publish(self.user.id + 1, 'notification.read', {'ids': [99]})
+        broker.publish(self.user.id, 'notification.read', {'ids': [3]})
+        stream = await self.open_stream(last_event_id=str(first))
+        replayed = [parse_event(await anext(stream))['data']['ids'] for _ in range(2)]
+        self.assertEqual(replayed, [[2], [3]])
+        await stream.aclose()
+
+        # An id this process never issued asks the client to refetch
+        stream = await self.open_stream(last_event_id='999999999')
+        self.assertEqual(parse_event(await anext(stream))['event'], 'resync')
+        await stream.aclose()
@@ -1,10 +1,22 @@
+import asyncio
+import json
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
 from rest_framework import viewsets, status
+from rest_framework.authtoken.models import Token
 from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.utils import timezone
-from django.db.models import Q
-from .models import Notification, NotificationPreference
+from django.db import transaction
+from django.db.models import Q, Count
+from .models import Notification, NotificationPreference, NotificationCounter, NotificationReceipt
+from .events import publish_event, broker, ensure_listener
 from .serializers import (
     NotificationSerializer, 
     NotificationPreferenceSerializer,
@@ -28,7 +40,7 @@ class NotificationViewSet(viewsets.ModelViewSet):
         is_read = self.request.query_params.get('is_read')
         if is_read is not None:
             is_read_bool = is_read.lower() in ['true', '1']
-            queryset = queryset.filter(is_read=is_read_bool)
+            queryset = queryset.filter(user_is_read=is_read_bool)
         
         # Filter by notification type
         notification_type = self.request.query_params.get('type')
@@ -50,6 +62,14 @@ class NotificationViewSet(viewsets.ModelViewSet):
         
         return queryset.order_by('-created_at')
     
+    def perform_update(self, serializer):
+        if serializer.instance.is_broadcast:
+            raise PermissionDenied('Broadcast notifications are shared and cannot be edited')
+        serializer.save()
+    
+    def perform_destroy(self, instance):
+        instance.remove_for(self.request.user)
+    
     def get_serializer_class(self):
         """Return appropriate serializer based on action"""
         if self.action == 'create':
@@ -62,22 +82,21 @@ class NotificationViewSet(viewsets.ModelViewSet):
     def mark_read(self, request, pk=None):
         """Mark a notification as read"""
         notification = self.get_object()
-        notification.mark_as_read()
+        notification.mark_as_read(request.user)
         return Response({'status': 'notification marked as read'})
     
     @action(detail=True, methods=['post'])
     def mark_unread(self, request, pk=None):
         """Mark a notification as unread"""
         notification = self.get_object()
-        notification.is_read = False
-        notification.save(update_fields=['is_read', 'updated_at'])
+        notification.set_read(False, request.user)
         return Response({'status': 'notification marked as unread'})
     
     @action(detail=True, methods=['post'])
     def dismiss(self, request, pk=None):
         """Dismiss a notification"""
         notification = self.get_object()
-        notification.mark_as_dismissed()
+        notification.mark_as_dismissed(request.user)
         return Response({'status': 'notification dismissed'})
     
     @action(detail=False, methods=['post'])
@@ -98,24 +117,52 @@ class NotificationViewSet(viewsets.ModelViewSet):
         notification_ids = serializer.validated_data['notification_ids']
         action_type = serializer.validated_data['action']
         
-        notifications = Notification.objects.filter(
-            id__in=notification_ids,
-            recipient=request.user
-        )
+        notifications = Notification.objects.for_user(request.user).filter(id__in=notification_ids)
         
-        if action_type == 'mark_read':
-            count = notifications.update(is_read=True)
-            message = f'{count} notifications marked as read'
-        elif action_type == 'mark_unread':
-            count = notifications.update(is_read=False)
-            message = f'{count} notifications marked as unread'
-        elif action_type == 'dismiss':
-            count = notifications.update(is_dismissed=True)
-            message = f'{count} notifications dismissed'
-        elif action_type == 'delete':
-            count = notifications.count()
-            notifications.delete()
-            message = f'{count} notifications deleted'
+        events = {
+            'mark_read': 'notification.read',
+            'mark_unread': 'notification.unread',
+            'dismiss': 'notification.dismissed',
+            'delete': 'notification.deleted',
+        }
+        # The state read, the updates and the counter change commit together
+        with transaction.atomic():
+            # Read state before the change, for the unread counter
+            state = notifications.aggregate(
+                total=Count('id'), unread=Count('id', filter=Q(user_is_read=False))
+            )
+            matched_ids = []
+            broadcast_ids = []
+            for notification_id, recipient_id in notifications.values_list('id', 'recipient_id'):
+                matched_ids.append(notification_id)
+                if recipient_id is None:
+                    broadcast_ids.append(notification_id)
+            # Personal rows are updated in place; broadcasts through the user's receipts
+            personal = Notification.objects.filter(id__in=matched_ids, recipient=request.user)
+            count = state['total']
+
+            if action_type == 'mark_read':
+                personal.update(is_read=True)
+                NotificationReceipt.apply(request.user, broadcast_ids, is_read=True)
+                NotificationCounter.adjust(request.user.id, -state['unread'])
+                message = f'{count} notifications marked as read'
+            elif action_type == 'mark_unread':
+                personal.update(is_read=False)
+                NotificationReceipt.apply(request.user, broadcast_ids, is_read=False)
+                NotificationCounter.adjust(request.user.id, state['total'] - state['unread'])
+                message = f'{count} notifications marked as unread'
+            elif action_type == 'dismiss':
+                personal.update(is_dismissed=True)
+                NotificationReceipt.apply(request.user, broadcast_ids, is_dismissed=True)
+                message = f'{count} notifications dismissed'
+            elif action_type == 'delete':
+                personal.delete()
+                NotificationReceipt.apply(request.user, broadcast_ids, is_deleted=True)
+                NotificationCounter.adjust(request.user.id, -state['unread'])
+                message = f'{count} notifications deleted'
+        
+        if matched_ids:
+            publish_event(request.user.id, events[action_type], {'ids': matched_ids})
         
         return Response({
             'status': 'bulk action completed',
@@ -134,28 +181,40 @@ class NotificationViewSet(viewsets.ModelViewSet):
             Q(expires_at__isnull=True) | Q(expires_at__gt=now)
         )
         
+        # One grouped query over (type, priority) instead of a count per choice
+        groups = active_notifications.order_by().values('notification_type', 'priority').annotate(
+            total=Count('id'),
+            unread=Count('id', filter=Q(user_is_read=False))
+        )
+        
         summary = {
-            'total': active_notifications.count(),
-            'unread': active_notifications.unread().count(),
+            'total': 0,
+            'unread': 0,
             'by_type': {},
             'by_priority': {}
         }
-        
-        # Count by type
-        for choice in Notification.TYPE_CHOICES:
-            type_key = choice[0]
-            count = active_notifications.filter(notification_type=type_key).count()
-            if count > 0:
-                summary['by_type'][type_key] = count
-        
-        # Count by priority
-        for choice in Notification.PRIORITY_CHOICES:
-            priority_key = choice[0]
-            count = active_notifications.filter(priority=priority_key).count()
-            if count > 0:
-                summary['by_priority'][priority_key] = count
+        for group in groups:
+            summary['total'] += group['total']
+            summary['unread'] += group['unread']
+            type_key = group['notification_type']
+            priority_key = group['priority']
+            summary['by_type'][type_key] = summary['by_type'].get(type_key, 0) + group['total']
+            summary['by_priority'][priority_key] = summary['by_priority'].get(priority_key, 0) + group['total']
         
         return Response(summary)
+    
+    @action(detail=False, methods=['get'])
+    def unread_count(self, request):
+        """Unread badge count from the per-user counter"""
+        return Response({'unread': NotificationCounter.for_user(request.user)})
+    
+    @action(detail=False, methods=['post'])
+    def stream_ticket(self, request):
+        """Short-lived ticket for opening the event stream without a token in the URL"""
+        return Response({
+            'ticket': issue_stream_ticket(request.user),
+            'expires_in': settings.NOTIFICATION_STREAM_TICKET_SECONDS,
+        })
 
 
 class NotificationPreferenceViewSet(viewsets.ModelViewSet):
@@ -187,4 +246,118 @@ class NotificationPreferenceViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(preferences, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
         serializer.save()
-        return Response(serializer.data)
\ No newline at end of file
+        return Response(serializer.data)
+
+
+def format_event(event_id, event, data):
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data, default=str)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+STREAM_TICKET_SALT = 'notifications.stream'
+
+
+def issue_stream_ticket(user):
+    """A signed, short-lived ticket that authenticates ``user``'s event stream"""
+    return signing.dumps(user.pk, salt=STREAM_TICKET_SALT)
+
+
+async def authenticate_stream(request):
+    """
+    Token from the Authorization header, or a ``?ticket=`` from the
+    stream-ticket action since EventSource cannot set headers
+    """
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Token '):
+        try:
+            token = await Token.objects.select_related('user').aget(key=header[6:].strip())
+        except Token.DoesNotExist:
+            return None
+        return token.user if token.user.is_active else None
+
+    ticket = request.GET.get('ticket')
+    if not ticket:
+        return None
+    try:
+        user_id = signing.loads(
+            ticket, salt=STREAM_TICKET_SALT, max_age=settings.NOTIFICATION_STREAM_TICKET_SECONDS
+        )
+    except signing.BadSignature:
+        return None
+    user = await User.objects.filter(pk=user_id).afirst()
+    return user if user is not None and user.is_active else None
+
+
+def reaches(message, user):
+    """Broadcast events go to every stream in their audience; the rest to their user"""
+    if message['user_id'] is not None:
+        return True
+    return message['audience'] != Notification.AUDIENCE_STAFF or user.is_staff
+
+
+async def notification_event_stream(user, last_event_id):
+    user_id = user.id
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    heartbeat = settings.NOTIFICATION_STREAM_HEARTBEAT
+    # Streams end after a while so idle connections are recycled; the
+    # browser reconnects with Last-Event-ID and misses nothing
+    deadline = loop.time() + settings.NOTIFICATION_STREAM_MAX_SECONDS
+    backlog = broker.subscribe(user_id, loop, queue, last_event_id)
+    try:
+        yield f'retry: {heartbeat * 1000}\n\n'
+        if backlog is None:
+            yield format_event(None, 'resync', {})
+        else:
+            for message in backlog:
+                if reaches(message, user):
+                    yield format_event(message['id'], message['event'], message['data'])
+        
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                message = await asyncio.wait_for(queue.get(), timeout=min(heartbeat, remaining))
+            except asyncio.TimeoutError:
+                yield ': heartbeat\n\n'
+                continue
+            if reaches(message, user):
+                yield format_event(message['id'], message['event'], message['data'])
+    finally:
+        broker.unsubscribe(user_id, loop, queue)
+
+
+async def notification_stream(request):
+    """Server-sent events with the current user's notification changes"""
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {'error': 'The notification stream is only served through the ASGI application'},
+            status=status.HTTP_501_NOT_IMPLEMENTED
+        )
+    
+    user = await authenticate_stream(request)
+    if user is None:
+        return JsonResponse(
+            {'detail': 'Authentication credentials were not provided.'},
+            status=status.HTTP_401_UNAUTHORIZED
+        )
+    
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    
+    ensure_listener()
+    response = StreamingHttpResponse(
+        notification_event_stream(user, last_event_id),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
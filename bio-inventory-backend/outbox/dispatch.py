@@ -0,0 +1,205 @@
+"""
+Transactional outbox for domain events.
+
+Model saves that have side effects (funding transactions, request history,
+notifications, emails) do not run them in the request. They ``publish`` an
+OutboxEvent row in the same transaction as the change instead, so the API
+path pays for one INSERT and the event exists exactly when the change
+committed. Handlers registered with ``@handles(topic)`` receive the event's
+payload.
+
+The worker (``manage.py run_outbox_worker``) dispatches pending events in
+batches. Events sharing a ``key`` (e.g. one request) are dispatched in the
+order they were written: only the oldest pending event of each key is
+eligible, and a failing event holds back the rest of its key while it is
+retried with backoff, until it is marked failed after OUTBOX_MAX_ATTEMPTS.
+
+Each event is claimed, handled and deleted in its own short transaction,
+so its handlers' database writes commit together with the dispatch and
+the rows they lock are released after one event, not a whole batch.
+Delivery is at-least-once: an event is redelivered if the worker dies
+before committing, and handlers with effects outside the database, such as
+email, may repeat them.
+
+With the default ``OUTBOX_DISPATCH = 'worker'`` every event is left to
+run_outbox_worker and the publishing request returns without running any
+handler. ``'inline'``, for development and tests, dispatches the events a
+transaction published in-process as soon as it commits, and the worker only
+retries those whose handlers failed.
+"""
+from collections import defaultdict
+from datetime import timedelta
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from core.polling import PollLoop
+from notifications.preferences import PreferenceResolver
+from .models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+_handlers = defaultdict(list)
+_local = threading.local()
+
+
+def handles(topic):
+    """Register the decorated function as a handler of ``topic`` events"""
+    def register(handler):
+        if handler not in _handlers[topic]:
+            _handlers[topic].append(handler)
+        return handler
+    return register
+
+
+def handlers_for(topic):
+    return list(_handlers.get(topic, ()))
+
+
+def publish(topic, key, payload):
+    """Record a ``topic`` event in the current transaction"""
+    event = OutboxEvent.objects.create(topic=topic, key=key, payload=payload)
+    if getattr(settings, 'OUTBOX_DISPATCH', 'worker') == 'inline':
+        published = getattr(_local, 'published', None)
+        if published is None:
+            published = _local.published = []
+        published.append(event.pk)
+        transaction.on_commit(dispatch_published)
+    return event
+
+
+def dispatch_published():
+    """
+    Dispatch, as one batch, the events published by the transaction that
+    just committed. Only those: an earlier event of their key still
+    pending, or the rest of the backlog, is left to the worker. Events of a
+    transaction that rolled back no longer exist and are skipped.
+    """
+    published, _local.published = getattr(_local, 'published', None), []
+    if published:
+        OutboxWorker().dispatch_events(published)
+
+
+def after_dispatch(callback):
+    """
+    Run ``callback`` once the events being dispatched have committed: at
+    the end of the current dispatch batch, or after the current transaction
+    outside of one. Handlers use it to coalesce work across a batch.
+    """
+    callbacks = getattr(_local, 'callbacks', None)
+    if callbacks is None:
+        transaction.on_commit(callback)
+    elif callback not in callbacks:
+        callbacks.append(callback)
+
+
+def dispatch(event):
+    """Run every handler of ``event``'s topic"""
+    for handler in handlers_for(event.topic):
+        handler(event.payload)
+
+
+class OutboxWorker(PollLoop):
+    """Dispatches pending outbox events"""
+
+    def __init__(self, clock=timezone.now, sleep=time.sleep, batch_size=100, poll_interval=1,
+                 max_attempts=None, retry_delay=30, max_retry_delay=3600):
+        super().__init__(clock=clock, sleep=sleep)
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts or getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 10)
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+
+    def due_events(self, now):
+        """The oldest pending event of each key, if it is due"""
+        earlier = OutboxEvent.objects.filter(
+            key=OuterRef('key'), id__lt=OuterRef('id'), status=OutboxEvent.Status.PENDING
+        )
+        return OutboxEvent.objects.filter(
+            status=OutboxEvent.Status.PENDING, available_at__lte=now
+        ).filter(~Exists(earlier)).order_by('id')
+
+    def dispatch_batch(self):
+        """Dispatch one batch of due events. Returns the number of events attempted."""
+        now = self.clock()
+        candidates = list(self.due_events(now).values_list('pk', flat=True)[:self.batch_size])
+        return self.dispatch_events(candidates, now)
+
+    def dispatch_events(self, pks, now=None):
+        """
+        Dispatch events ``pks`` in order, each in its own transaction, then
+        run the ``after_dispatch`` callbacks their handlers registered.
+        Returns the number of events attempted.
+        """
+        if getattr(_local, 'callbacks', None) is not None:
+            # Within a running batch, which runs the callbacks when it ends
+            return sum(self.dispatch_event(pk, now) for pk in pks)
+        # The batch's handlers share one preference lookup per user
+        with PreferenceResolver.scope():
+            _local.callbacks = []
+            try:
+                attempted = sum(self.dispatch_event(pk, now) for pk in pks)
+            finally:
+                callbacks, _local.callbacks = _local.callbacks, None
+            for callback in callbacks:
+                callback()
+        return attempted
+
+    def dispatch_event(self, pk, now=None):
+        """
+        Claim event ``pk`` if it is still due, run its handlers and delete it,
+        all in one transaction. Returns whether the event was attempted.
+        """
+        now = now or self.clock()
+        event = None
+        try:
+            with transaction.atomic():
+                events = self.due_events(now).filter(pk=pk)
+                if connection.features.has_select_for_update_skip_locked:
+                    # Lets several workers share the outbox without double delivery
+                    events = events.select_for_update(skip_locked=True, of=('self',))
+                event = events.first()
+                if event is None:
+                    # Dispatched, claimed by another worker or not due yet
+                    return False
+                dispatch(event)
+                OutboxEvent.objects.filter(pk=event.pk).delete()
+        except Exception as exc:
+            if event is None:
+                raise
+            logger.exception(f"Outbox event {event.pk} ({event.topic}) failed")
+            self.record_failure(event, exc, now)
+        return True
+
+    def record_failure(self, event, exc, now):
+        attempts = event.attempts + 1
+        delay = min(self.retry_delay * 2 ** (attempts - 1), self.max_retry_delay)
+        OutboxEvent.objects.filter(pk=event.pk).update(
+            attempts=attempts,
+            last_error=f"{type(exc).__name__}: {exc}",
+            available_at=now + timedelta(seconds=delay),
+            status=OutboxEvent.Status.FAILED if attempts >= self.max_attempts else OutboxEvent.Status.PENDING,
+        )
+
+    def run_pending(self):
+        """Dispatch batches until nothing is due. Returns the number of events attempted."""
+        attempted = 0
+        while True:
+            batch = self.dispatch_batch()
+            if not batch:
+                return attempted
+            attempted += batch
+
+    def poll(self):
+        attempted = self.run_pending()
+        if attempted:
+            logger.info(f"Dispatched {attempted} outbox event(s)")
+
+    def seconds_until_next(self):
+        return self.poll_interval
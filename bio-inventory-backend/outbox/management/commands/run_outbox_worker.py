@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.polling import idle_sleep
+from outbox.dispatch import OutboxWorker
+from outbox.models import OutboxEvent
+
+
+class Command(BaseCommand):
+    help = 'Dispatch outbox events to their handlers as they are written'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Dispatch the events pending now and exit',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Events dispatched per transaction (default 100)',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1,
+            help='Seconds to wait when the outbox is empty (default 1)',
+        )
+        parser.add_argument(
+            '--retry-failed',
+            action='store_true',
+            help='Queue events that exhausted their attempts for another round first',
+        )
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            retried = OutboxEvent.objects.filter(status=OutboxEvent.Status.FAILED).update(
+                status=OutboxEvent.Status.PENDING, attempts=0, available_at=timezone.now()
+            )
+            self.stdout.write(self.style.WARNING(f'Requeued {retried} failed event(s)'))
+
+        worker = OutboxWorker(
+            sleep=idle_sleep, batch_size=options['batch_size'], poll_interval=options['poll_interval']
+        )
+        if options['once']:
+            attempted = worker.run_pending()
+            self.stdout.write(self.style.SUCCESS(f'Processed {attempted} event(s)'))
+            failed = OutboxEvent.objects.filter(status=OutboxEvent.Status.FAILED).count()
+            if failed:
+                self.stdout.write(self.style.ERROR(f'{failed} event(s) failed; see the admin or use --retry-failed'))
+            return
+
+        self.stdout.write('Outbox worker started')
+        try:
+            worker.run()
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Outbox worker stopped'))
@@ -0,0 +1,19 @@
+from django.db import transaction
+from rest_framework.permissions import SAFE_METHODS
+
+
+class AtomicWritesMixin:
+    """
+    Runs a viewset's unsafe requests in one transaction, so the model
+    changes a request makes and the outbox events they publish commit
+    together or not at all. Errors DRF turns into a response roll it back too.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method in SAFE_METHODS:
+            return super().dispatch(request, *args, **kwargs)
+        with transaction.atomic():
+            response = super().dispatch(request, *args, **kwargs)
+            if getattr(response, 'exception', False):
+                transaction.set_rollback(True)
+            return response
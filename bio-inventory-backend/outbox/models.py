@@ -0,0 +1,28 @@
+from django.db import models
+from django.utils import timezone
+
+
+class OutboxEvent(models.Model):
+    """A domain event written with the change it describes, waiting to be dispatched"""
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        FAILED = 'failed', 'Failed'
+
+    topic = models.CharField(max_length=100)
+    key = models.CharField(max_length=100, help_text="Events with the same key are dispatched in the order they were written")
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    available_at = models.DateTimeField(default=timezone.now, help_text="Not dispatched before this time; pushed back after a failed attempt")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='outbox_event_due_idx'),
+            models.Index(fields=['key', 'id'], name='outbox_event_key_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.topic} [{self.key}] ({self.status})"
@@ -0,0 +1,142 @@
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from datetime import timedelta
+from io import StringIO
+
+from notifications.preferences import PreferenceResolver
+from .dispatch import OutboxWorker, dispatch_published, handles, publish
+from .models import OutboxEvent
+
+delivered = []
+failing = set()
+resolvers = []
+
+
+@handles('test.recorded')
+def record_event(event):
+    # Written before failing, so a failure shows whether the savepoint rolled back
+    User.objects.create_user(username=f"user-{event['n']}")
+    if event['n'] in failing:
+        raise RuntimeError(f"handler failed on {event['n']}")
+    delivered.append(event['n'])
+
+
+@handles('test.resolved')
+def record_resolver(event):
+    resolvers.append(PreferenceResolver.current())
+
+
+class FrozenClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class OutboxWorkerTest(TestCase):
+    def setUp(self):
+        # Drops events earlier tests published inline and rolled back
+        dispatch_published()
+        delivered.clear()
+        failing.clear()
+        # Ahead of the real clock, so events published during the test are due
+        self.clock = FrozenClock(timezone.now() + timedelta(minutes=1))
+        self.worker = OutboxWorker(clock=self.clock, retry_delay=30, max_attempts=3)
+
+    def publish(self, n, key='a'):
+        return publish('test.recorded', key, {'n': n})
+
+    def test_dispatches_in_order_and_deletes_events(self):
+        for n in range(3):
+            self.publish(n)
+        self.publish(10, key='b')
+        self.assertEqual(delivered, [])
+
+        self.assertEqual(self.worker.run_pending(), 4)
+        self.assertEqual(delivered, [0, 10, 1, 2])
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_batch_shares_one_preference_resolver(self):
+        resolvers.clear()
+        publish('test.resolved', 'a', {})
+        publish('test.resolved', 'b', {})
+        self.worker.run_pending()
+
+        self.assertEqual(len(resolvers), 2)
+        self.assertIs(resolvers[0], resolvers[1])
+        self.assertIsNot(PreferenceResolver.current(), resolvers[0])
+
+    def test_run_sleeps_between_polls(self):
+        sleeps = []
+        worker = OutboxWorker(clock=self.clock, sleep=sleeps.append, poll_interval=5)
+        self.publish(0)
+        self.publish(1)
+
+        worker.run(should_stop=lambda: len(sleeps) >= 2)
+        self.assertEqual(delivered, [0, 1])
+        self.assertEqual(sleeps, [5, 5])
+
+    def test_failure_holds_back_its_key_and_is_retried(self):
+        failing.add(0)
+        self.publish(0)
+        self.publish(1)
+        self.publish(10, key='b')
+
+        with self.assertLogs('outbox.dispatch', 'ERROR'):
+            self.worker.run_pending()
+        self.assertEqual(delivered, [10])
+        # The failed handler's writes were rolled back with its savepoint
+        self.assertFalse(User.objects.filter(username='user-0').exists())
+        event = OutboxEvent.objects.get(payload__n=0)
+        self.assertEqual(event.attempts, 1)
+        self.assertIn('handler failed on 0', event.last_error)
+        self.assertEqual(event.available_at, self.clock.now + timedelta(seconds=30))
+
+        failing.clear()
+        self.clock.now += timedelta(seconds=30)
+        self.worker.run_pending()
+        self.assertEqual(delivered, [10, 0, 1])
+        self.assertEqual(User.objects.filter(username__in=['user-0', 'user-1']).count(), 2)
+
+    def test_exhausted_events_are_marked_failed_and_release_their_key(self):
+        failing.add(0)
+        self.publish(0)
+        self.publish(1)
+        for delay in [30, 60, 120]:
+            with self.assertLogs('outbox.dispatch', 'ERROR'):
+                self.worker.run_pending()
+            self.clock.now += timedelta(seconds=delay)
+
+        event = OutboxEvent.objects.get(payload__n=0)
+        self.assertEqual((event.status, event.attempts), (OutboxEvent.Status.FAILED, 3))
+        self.assertEqual(delivered, [1])
+
+        failing.clear()
+        out = StringIO()
+        call_command('run_outbox_worker', '--once', '--retry-failed', stdout=out)
+        self.assertIn('Requeued 1 failed event(s)', out.getvalue())
+        self.assertEqual(delivered, [1, 0])
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    @override_settings(OUTBOX_DISPATCH='inline')
+    def test_inline_dispatch_after_commit(self):
+        with override_settings(OUTBOX_DISPATCH='worker'):
+            backlog = self.publish(5, key='b')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.publish(0)
+            self.publish(1)
+            self.assertEqual(delivered, [])
+        # Only the committing transaction's own events; the backlog waits for the worker
+        self.assertEqual(delivered, [0, 1])
+        self.assertEqual(list(OutboxEvent.objects.all()), [backlog])
+
+        # An event behind a pending one of its key keeps its place in line
+        with self.captureOnCommitCallbacks(execute=True):
+            self.publish(6, key='b')
+        self.assertEqual(delivered, [0, 1])
+        self.worker.run_pending()
+        self.assertEqual(delivered, [0, 1, 5, 6])
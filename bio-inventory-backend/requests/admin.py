@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Request, RequestHistory
+from .models import Request, RequestHistory, RequestLeadTime
 
 @admin.register(Request)
 class RequestAdmin(admin.ModelAdmin):
@@ -9,4 +9,9 @@ class RequestAdmin(admin.ModelAdmin):
 
 @admin.register(RequestHistory)
 class RequestHistoryAdmin(admin.ModelAdmin):
-    list_display = ('request', 'user', 'old_status', 'new_status', 'timestamp')
\ No newline at end of file
+    list_display = ('request', 'user', 'old_status', 'new_status', 'timestamp')
+
+@admin.register(RequestLeadTime)
+class RequestLeadTimeAdmin(admin.ModelAdmin):
+    list_display = ('vendor', 'month', 'stage', 'event_count', 'total_seconds', 'updated_at')
+    list_filter = ('stage', 'vendor')
@@ -0,0 +1,173 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import F, Max, Min, Sum, Window
+from django.db.models.functions import Lag, TruncMonth
+from django.utils import timezone
+
+from .models import AnalyticsCursor, RequestHistory, RequestLeadTime
+
+
+LEAD_TIME_CURSOR = 'request_lead_times'
+
+# (status the stage starts in, status that closes it) -> rollup stage
+STAGE_TRANSITIONS = {
+    ('APPROVED', 'ORDERED'): RequestLeadTime.Stage.APPROVED_TO_ORDERED,
+    ('ORDERED', 'RECEIVED'): RequestLeadTime.Stage.ORDERED_TO_RECEIVED,
+}
+
+SECONDS_PER_DAY = 86400
+
+
+def lead_time_events(after_id=0, up_to_id=None):
+    """
+    Return history rows that close a tracked stage, annotated with the previous
+    transition of the same request via LAG() over the request's history.
+
+    Only requests with history newer than ``after_id`` are scanned. The window
+    still sees their older rows, so a stage that started before the cursor is
+    measured correctly.
+    """
+    touched = RequestHistory.objects.filter(id__gt=after_id)
+    if up_to_id is not None:
+        touched = touched.filter(id__lte=up_to_id)
+
+    per_request = {
+        'partition_by': [F('request_id')],
+        'order_by': [F('timestamp').asc(), F('id').asc()],
+    }
+    return RequestHistory.objects.filter(
+        request_id__in=touched.values('request_id')
+    ).annotate(
+        previous_status=Window(Lag('new_status'), **per_request),
+        previous_timestamp=Window(Lag('timestamp'), **per_request),
+        vendor_ref=F('request__vendor_id'),
+        month=TruncMonth('timestamp', output_field=models.DateField()),
+    ).filter(
+        previous_status__in=[start for start, _ in STAGE_TRANSITIONS]
+    ).values(
+        'id', 'new_status', 'timestamp', 'previous_status',
+        'previous_timestamp', 'vendor_ref', 'month'
+    ).order_by()
+
+
+def refresh_lead_time_rollup(now=None, settle_seconds=None):
+    """
+    Fold settled RequestHistory rows into RequestLeadTime.
+
+    A row's id is allocated when it is inserted but the row only becomes
+    visible when its transaction commits, so a slow transaction can commit
+    an id below one already consumed. The refresh therefore consumes up to a
+    high-water mark it observed at least ``settle_seconds`` ago
+    (REQUEST_ANALYTICS_SETTLE_SECONDS), by which time the transactions that
+    held lower ids have committed; rows above it wait for a later refresh.
+
+    The cursor row is locked for the duration of the refresh so concurrent
+    callers serialize instead of double counting. Returns the number of
+    stage completions that were added.
+    """
+    now = now or timezone.now()
+    if settle_seconds is None:
+        settle_seconds = getattr(settings, 'REQUEST_ANALYTICS_SETTLE_SECONDS', 300)
+
+    with transaction.atomic():
+        cursor, _ = AnalyticsCursor.objects.select_for_update().get_or_create(
+            name=LEAD_TIME_CURSOR
+        )
+        if cursor.pending_at is None or cursor.pending_id <= cursor.last_id:
+            # Start settling whatever is visible now
+            cursor.pending_id = RequestHistory.objects.aggregate(top=Max('id'))['top'] or 0
+            cursor.pending_at = now
+        if cursor.pending_id <= cursor.last_id or now - cursor.pending_at < timedelta(seconds=settle_seconds):
+            cursor.save(update_fields=['pending_id', 'pending_at', 'updated_at'])
+            return 0
+        high_water = cursor.pending_id
+
+        buckets = defaultdict(list)
+        for event in lead_time_events(cursor.last_id, high_water):
+            if not cursor.last_id < event['id'] <= high_water:
+                continue
+            stage = STAGE_TRANSITIONS.get((event['previous_status'], event['new_status']))
+            if stage is None:
+                continue
+            seconds = (event['timestamp'] - event['previous_timestamp']).total_seconds()
+            buckets[(event['vendor_ref'], event['month'], stage)].append(max(seconds, 0.0))
+
+        for (vendor_id, month, stage), durations in buckets.items():
+            rollup, _ = RequestLeadTime.objects.get_or_create(
+                vendor_id=vendor_id, month=month, stage=stage
+            )
+            rollup.event_count += len(durations)
+            rollup.total_seconds += sum(durations)
+            low, high = min(durations), max(durations)
+            rollup.min_seconds = low if rollup.min_seconds is None else min(rollup.min_seconds, low)
+            rollup.max_seconds = high if rollup.max_seconds is None else max(rollup.max_seconds, high)
+            rollup.save()
+
+        cursor.last_id = high_water
+        cursor.save(update_fields=['last_id', 'updated_at'])
+
+    return sum(len(durations) for durations in buckets.values())
+
+
+def parse_month(value):
+    """The first day of a ``YYYY-MM`` month, or None if ``value`` is empty. Raises ValueError."""
+    if not value:
+        return None
+    return datetime.strptime(value, '%Y-%m').date()
+
+
+def get_lead_time_summary(vendor_id=None, start_month=None, end_month=None):
+    """Read lead time analytics from the rollup table only."""
+    rollups = RequestLeadTime.objects.all()
+    if vendor_id:
+        rollups = rollups.filter(vendor_id=vendor_id)
+    if start_month:
+        rollups = rollups.filter(month__gte=start_month)
+    if end_month:
+        rollups = rollups.filter(month__lte=end_month)
+
+    by_vendor = rollups.values('vendor_id', 'vendor__name', 'stage').annotate(
+        event_count=Sum('event_count'),
+        total_seconds=Sum('total_seconds'),
+        min_seconds=Min('min_seconds'),
+        max_seconds=Max('max_seconds'),
+    ).order_by('vendor__name', 'stage')
+
+    def to_days(row):
+        count = row['event_count']
+        return {
+            'event_count': count,
+            'average_days': round(row['total_seconds'] / count / SECONDS_PER_DAY, 2) if count else None,
+            'min_days': round(row['min_seconds'] / SECONDS_PER_DAY, 2) if row['min_seconds'] is not None else None,
+            'max_days': round(row['max_seconds'] / SECONDS_PER_DAY, 2) if row['max_seconds'] is not None else None,
+        }
+
+    return {
+        'by_vendor': [
+            {
+                'vendor_id': row['vendor_id'],
+                'vendor_name': row['vendor__name'],
+                'stage': row['stage'],
+                **to_days(row),
+            }
+            for row in by_vendor
+        ],
+        'by_month': [
+            {
+                'vendor_id': rollup.vendor_id,
+                'vendor_name': rollup.vendor.name if rollup.vendor_id else None,
+                'month': rollup.month.strftime('%Y-%m'),
+                'stage': rollup.stage,
+                **to_days({
+                    'event_count': rollup.event_count,
+                    'total_seconds': rollup.total_seconds,
+                    'min_seconds': rollup.min_seconds,
+                    'max_seconds': rollup.max_seconds,
+                }),
+            }
+            for rollup in rollups.select_related('vendor').order_by('month', 'vendor__name', 'stage')
+        ],
+    }
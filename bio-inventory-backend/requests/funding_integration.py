@@ -1,42 +1,48 @@
-from django.db.models.signals import post_save
-from django.dispatch import receiver
+from django.db import IntegrityError, transaction
 from decimal import Decimal
+from outbox.dispatch import handles
 from .models import Request, RequestHistory
+import logging
 
+logger = logging.getLogger(__name__)
 
-@receiver(post_save, sender=Request)
-def create_transaction_on_approval(sender, instance, created, **kwargs):
+
+@handles('request.saved')
+def create_transaction_on_approval(event):
     """Create a funding transaction when a request is approved or ordered"""
-    if instance.fund_id:  # For both new and existing requests with funding
-        # Check if status changed to APPROVED or ORDERED
+    # Only new requests and status changes are published, so this acts on an
+    # actual transition into APPROVED or ORDERED
+    if event['status'] not in ['APPROVED', 'ORDERED']:
+        return
+
+    instance = Request.objects.filter(pk=event['request_id']).first()
+    if instance is None or not instance.fund_id:
+        return
+
+    try:
+        # Import here to avoid circular imports
+        from funding.models import Fund, Transaction
+
+        # Get the fund
         try:
-            # Import here to avoid circular imports
-            from funding.models import Fund, Transaction
-            
-            # Check if we already have a transaction for this request
-            existing_transaction = Transaction.objects.filter(request_id=instance.id).first()
-            if existing_transaction:
-                return  # Transaction already exists, don't create duplicate
-            
-            # Only create transaction if status is APPROVED or ORDERED
-            if instance.status in ['APPROVED', 'ORDERED']:
-                # Get the fund
-                try:
-                    fund = Fund.objects.get(id=instance.fund_id)
-                except Fund.DoesNotExist:
-                    return  # Fund doesn't exist, skip transaction creation
-                
-                # Calculate total cost
-                total_cost = instance.unit_price * instance.quantity
-                
-                # Check if fund can afford this
-                if not fund.can_afford(total_cost):
-                    # Could add logging here or send notification
-                    import logging
-                    logger = logging.getLogger(__name__)
-                    logger.warning(f"Fund {fund.name} cannot afford request {instance.id} (${total_cost})")
-                
-                # Create transaction (signals will automatically update fund spent amount)
+            fund = Fund.objects.get(id=instance.fund_id)
+        except Fund.DoesNotExist:
+            return  # Fund doesn't exist, skip transaction creation
+
+        # Calculate total cost
+        total_cost = instance.unit_price * instance.quantity
+
+        # Check if fund can afford this
+        if not fund.can_afford(total_cost):
+            # Could add logging here or send notification
+            logger.warning(f"Fund {fund.name} cannot afford request {instance.id} (${total_cost})")
+
+        # Insert-or-ignore: the unique purchase-per-request constraint rejects
+        # a second transaction, e.g. APPROVED -> ORDERED, a concurrent save or
+        # a redelivered event. Signals will automatically update fund spent
+        # amount on insert.
+        try:
+            with transaction.atomic():
                 Transaction.objects.create(
                     fund=fund,
                     amount=total_cost,
@@ -44,17 +50,16 @@ def create_transaction_on_approval(sender, instance, created, **kwargs):
                     item_name=instance.item_name,
                     description=f"Purchase of {instance.item_name} (Request #{instance.id})",
                     request_id=instance.id,
+                    category=instance.budget_category or None,
                     created_by=instance.requested_by
                 )
-                
-        except ImportError:
-            # Funding app not installed
-            pass
-        except Exception as e:
-            # Log error but don't break the request workflow
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"Failed to create funding transaction for request {instance.id}: {e}")
+        except IntegrityError:
+            pass  # Transaction already exists, don't create duplicate
+
+    except ImportError:
+        # Funding app not installed
+        pass
+    # Other errors propagate: the outbox worker logs them and retries the event
 
 
 def validate_fund_budget(request_instance, fund_id):
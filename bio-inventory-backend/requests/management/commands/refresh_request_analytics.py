@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from requests.analytics import refresh_lead_time_rollup, LEAD_TIME_CURSOR
+from requests.models import AnalyticsCursor, RequestLeadTime
+
+
+class Command(BaseCommand):
+    help = 'Fold new RequestHistory rows into the request lead time rollup'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Discard the rollup and recompute it from the full history',
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            self.stdout.write(self.style.WARNING('Rebuilding lead time rollup from scratch...'))
+            RequestLeadTime.objects.all().delete()
+            AnalyticsCursor.objects.filter(name=LEAD_TIME_CURSOR).delete()
+
+            # Consume the whole history now rather than after the settle lag
+            added = refresh_lead_time_rollup(settle_seconds=0)
+        else:
+            added = refresh_lead_time_rollup()
+        cursor = AnalyticsCursor.objects.get(name=LEAD_TIME_CURSOR)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Added {added} stage completions (history processed up to id {cursor.last_id}, '
+            f'settling up to id {cursor.pending_id})'
+        ))
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.4 on 2026-10-18 21:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0003_item_fund_id'),
+        ('requests', '0004_request_item_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RequestLeadTime',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month the transition completed in')),
+                ('stage', models.CharField(choices=[('APPROVED_TO_ORDERED', 'Approved to Ordered'), ('ORDERED_TO_RECEIVED', 'Ordered to Received')], max_length=20)),
+                ('event_count', models.PositiveIntegerField(default=0)),
+                ('total_seconds', models.FloatField(default=0)),
+                ('min_seconds', models.FloatField(blank=True, null=True)),
+                ('max_seconds', models.FloatField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('vendor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='lead_times', to='items.vendor')),
+            ],
+            options={
+                'ordering': ['-month', 'vendor', 'stage'],
+                'indexes': [models.Index(fields=['vendor', 'month', 'stage'], name='requests_re_vendor__36fd28_idx'), models.Index(fields=['month', 'stage'], name='requests_re_month_3f4167_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('requests', '0005_request_lead_time_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='request',
+            name='budget_category',
+            field=models.CharField(blank=True, help_text='Budget allocation category the purchase is charged to', max_length=100),
+        ),
+    ]
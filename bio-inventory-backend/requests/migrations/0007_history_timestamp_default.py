@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-18 23:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('requests', '0006_allocation_category'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='requesthistory',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='When the status changed'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 23:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('requests', '0007_history_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analyticscursor',
+            name='pending_at',
+            field=models.DateTimeField(blank=True, help_text='When pending_id was observed', null=True),
+        ),
+        migrations.AddField(
+            model_name='analyticscursor',
+            name='pending_id',
+            field=models.BigIntegerField(default=0, help_text='High-water mark waiting to settle before it is consumed'),
+        ),
+    ]
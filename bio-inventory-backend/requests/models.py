@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 from items.models import Vendor, ItemType # We can link to models from other apps
 
 class Request(models.Model):
@@ -34,6 +35,10 @@ class Request(models.Model):
 
     # Funding
     fund_id = models.IntegerField(null=True, blank=True, help_text="ID of the fund used for this request")
+    budget_category = models.CharField(
+        max_length=100, blank=True,
+        help_text="Budget allocation category the purchase is charged to"
+    )
 
     # Notes and Timestamps
     notes = models.TextField(blank=True)
@@ -43,6 +48,23 @@ class Request(models.Model):
     def __str__(self):
         return f"Request for {self.item_name} by {self.requested_by.username} ({self.status})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored status so post_save handlers can detect a
+        # transition without re-reading the row
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_status = self.status
+
+    @property
+    def status_changed(self):
+        """True if the status differs from the one last loaded or saved."""
+        return getattr(self, '_loaded_status', None) != self.status
+
     class Meta:
         ordering = ['-created_at']
 
@@ -52,11 +74,55 @@ class RequestHistory(models.Model):
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, help_text="User who made the change")
     old_status = models.CharField(max_length=10, choices=Request.Status.choices)
     new_status = models.CharField(max_length=10, choices=Request.Status.choices)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now, help_text="When the status changed")
     notes = models.TextField(blank=True, null=True, help_text="Optional notes about the status change")
 
     def __str__(self):
         return f"{self.request.item_name}: {self.old_status} -> {self.new_status}"
 
     class Meta:
-        ordering = ['-timestamp']
\ No newline at end of file
+        ordering = ['-timestamp']
+
+class AnalyticsCursor(models.Model):
+    """Remembers the last source row an incremental analytics job has consumed."""
+    name = models.CharField(max_length=100, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    pending_id = models.BigIntegerField(default=0, help_text="High-water mark waiting to settle before it is consumed")
+    pending_at = models.DateTimeField(null=True, blank=True, help_text="When pending_id was observed")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_id}"
+
+
+class RequestLeadTime(models.Model):
+    """Per vendor, per month rollup of lead times derived from RequestHistory."""
+    class Stage(models.TextChoices):
+        APPROVED_TO_ORDERED = 'APPROVED_TO_ORDERED', 'Approved to Ordered'
+        ORDERED_TO_RECEIVED = 'ORDERED_TO_RECEIVED', 'Ordered to Received'
+
+    vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE, null=True, blank=True, related_name="lead_times")
+    month = models.DateField(help_text="First day of the month the transition completed in")
+    stage = models.CharField(max_length=20, choices=Stage.choices)
+    event_count = models.PositiveIntegerField(default=0)
+    total_seconds = models.FloatField(default=0)
+    min_seconds = models.FloatField(null=True, blank=True)
+    max_seconds = models.FloatField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        vendor_name = self.vendor.name if self.vendor_id else 'No vendor'
+        return f"{vendor_name} {self.month:%Y-%m} {self.stage}"
+
+    @property
+    def average_seconds(self):
+        if self.event_count:
+            return self.total_seconds / self.event_count
+        return None
+
+    class Meta:
+        ordering = ['-month', 'vendor', 'stage']
+        indexes = [
+            models.Index(fields=['vendor', 'month', 'stage']),
+            models.Index(fields=['month', 'stage']),
+        ]
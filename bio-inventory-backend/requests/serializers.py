@@ -25,7 +25,7 @@ class RequestSerializer(serializers.ModelSerializer):
         model = Request
         fields = [
             'id', 'item_name', 'item_type', 'status', 'catalog_number', 'url', 'quantity', 
-            'unit_size', 'unit_price', 'fund_id', 'notes', 'created_at', 'updated_at',
+            'unit_size', 'unit_price', 'fund_id', 'budget_category', 'notes', 'created_at', 'updated_at',
             'requested_by', 'vendor', 'requested_by_id', 'vendor_id', 'item_type_id'
         ]
         read_only_fields = ('status', 'created_at', 'updated_at')
@@ -1,26 +1,46 @@
 # requests/signals.py
-from django.db.models.signals import pre_save
+from django.db.models.signals import post_save
 from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from outbox.dispatch import handles, publish
 from .models import Request, RequestHistory
 
-@receiver(pre_save, sender=Request)
-def log_request_status_change(sender, instance, **kwargs):
+@receiver(post_save, sender=Request)
+def publish_request_saved(sender, instance, created, **kwargs):
     """
-    Log the status change of a Request to RequestHistory before it is saved.
+    Record new requests and status changes in the outbox. Their side effects
+    (history, funding, notifications) are 'request.saved' handlers.
     """
-    # We only care about existing instances that are being updated
-    if instance.pk:
-        try:
-            old_instance = Request.objects.get(pk=instance.pk)
-            # Check if the status has actually changed
-            if old_instance.status != instance.status:
-                RequestHistory.objects.create(
-                    request=instance,
-                    # In a real app, you'd get the user from the request context
-                    user=instance.requested_by, 
-                    old_status=old_instance.status,
-                    new_status=instance.status
-                )
-        except Request.DoesNotExist:
-            # This is a new instance, so there's no history to log
-            pass
+    if not (created or instance.status_changed):
+        return
+    publish('request.saved', f'request:{instance.pk}', {
+        'request_id': instance.pk,
+        'created': created,
+        'old_status': None if created else getattr(instance, '_loaded_status', None),
+        'status': instance.status,
+        'requested_by_id': instance.requested_by_id,
+        # Handlers may run later; history keeps the time of the change itself
+        'occurred_at': instance.updated_at.isoformat(),
+    })
+
+@handles('request.saved')
+def log_request_status_change(event):
+    """
+    Log the status change of a Request to RequestHistory.
+    """
+    # We only care about existing instances whose stored status changed
+    if event['created'] or event['old_status'] is None:
+        return
+    if not Request.objects.filter(pk=event['request_id']).exists():
+        # Deleted since; there's nothing to log against
+        return
+    RequestHistory.objects.create(
+        request_id=event['request_id'],
+        # In a real app, you'd get the user from the request context
+        user_id=event['requested_by_id'],
+        old_status=event['old_status'],
+        new_status=event['status'],
+        # Events written before occurred_at was recorded fall back to now
+        timestamp=parse_datetime(event['occurred_at']) if event.get('occurred_at') else timezone.now()
+    )
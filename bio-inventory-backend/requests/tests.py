@@ -1,3 +1,245 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+from django.contrib.auth.models import User
+from django.db import DatabaseError, IntegrityError, transaction
+from django.utils import timezone
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from funding.models import Fund, Transaction
+from items.models import Vendor
+from outbox.dispatch import OutboxWorker
+from outbox.models import OutboxEvent
+from .models import AnalyticsCursor, Request, RequestHistory, RequestLeadTime
+from .analytics import refresh_lead_time_rollup, get_lead_time_summary
+
+
+@override_settings(REQUEST_ANALYTICS_SETTLE_SECONDS=0)
+class LeadTimeRollupTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.vendor = Vendor.objects.create(name='Sigma')
+        self.start = timezone.make_aware(datetime(2025, 3, 3, 9, 0))
+
+    def make_request(self, vendor=None):
+        return Request.objects.create(
+            item_name='Pipette tips',
+            requested_by=self.user,
+            vendor=vendor,
+            unit_price=Decimal('10.00'),
+        )
+
+    def log(self, request_obj, old_status, new_status, when):
+        entry = RequestHistory.objects.create(
+            request=request_obj, user=self.user,
+            old_status=old_status, new_status=new_status
+        )
+        RequestHistory.objects.filter(pk=entry.pk).update(timestamp=when)
+        return entry
+
+    def test_lead_times_per_vendor_and_month(self):
+        req = self.make_request(self.vendor)
+        self.log(req, 'NEW', 'APPROVED', self.start)
+        self.log(req, 'APPROVED', 'ORDERED', self.start + timedelta(days=2))
+        self.log(req, 'ORDERED', 'RECEIVED', self.start + timedelta(days=9))
+
+        self.assertEqual(refresh_lead_time_rollup(), 2)
+
+        ordered = RequestLeadTime.objects.get(
+            vendor=self.vendor, stage=RequestLeadTime.Stage.APPROVED_TO_ORDERED
+        )
+        self.assertEqual(ordered.month.isoformat(), '2025-03-01')
+        self.assertEqual(ordered.event_count, 1)
+        self.assertAlmostEqual(ordered.total_seconds, 2 * 86400)
+
+        received = RequestLeadTime.objects.get(
+            vendor=self.vendor, stage=RequestLeadTime.Stage.ORDERED_TO_RECEIVED
+        )
+        self.assertAlmostEqual(received.total_seconds, 7 * 86400)
+
+    def test_refresh_is_incremental(self):
+        first = self.make_request(self.vendor)
+        self.log(first, 'NEW', 'APPROVED', self.start)
+        self.log(first, 'APPROVED', 'ORDERED', self.start + timedelta(days=1))
+        refresh_lead_time_rollup()
+
+        # A stage that started before the cursor is still measured from its start
+        self.log(first, 'ORDERED', 'RECEIVED', self.start + timedelta(days=4))
+        second = self.make_request(self.vendor)
+        self.log(second, 'NEW', 'APPROVED', self.start)
+        self.log(second, 'APPROVED', 'ORDERED', self.start + timedelta(days=3))
+
+        self.assertEqual(refresh_lead_time_rollup(), 2)
+        self.assertEqual(refresh_lead_time_rollup(), 0)
+
+        ordered = RequestLeadTime.objects.get(stage=RequestLeadTime.Stage.APPROVED_TO_ORDERED)
+        self.assertEqual(ordered.event_count, 2)
+        self.assertAlmostEqual(ordered.total_seconds, 4 * 86400)
+        self.assertAlmostEqual(ordered.min_seconds, 1 * 86400)
+        self.assertAlmostEqual(ordered.max_seconds, 3 * 86400)
+
+        summary = get_lead_time_summary(vendor_id=self.vendor.id)
+        by_stage = {row['stage']: row for row in summary['by_vendor']}
+        self.assertEqual(by_stage['APPROVED_TO_ORDERED']['average_days'], 2.0)
+        self.assertEqual(by_stage['ORDERED_TO_RECEIVED']['average_days'], 3.0)
+
+    def test_requests_without_vendor_are_grouped(self):
+        req = self.make_request()
+        self.log(req, 'NEW', 'APPROVED', self.start)
+        self.log(req, 'APPROVED', 'ORDERED', self.start + timedelta(hours=12))
+        refresh_lead_time_rollup()
+
+        rollup = RequestLeadTime.objects.get()
+        self.assertIsNone(rollup.vendor)
+        self.assertAlmostEqual(rollup.total_seconds, 12 * 3600)
+
+    def test_rows_wait_for_the_settle_lag(self):
+        req = self.make_request(self.vendor)
+        self.log(req, 'NEW', 'APPROVED', self.start)
+        self.log(req, 'APPROVED', 'ORDERED', self.start + timedelta(days=1))
+        now = timezone.now()
+
+        # The high-water mark is only noted; rows below it may still be committing
+        self.assertEqual(refresh_lead_time_rollup(now=now, settle_seconds=300), 0)
+        self.log(req, 'ORDERED', 'RECEIVED', self.start + timedelta(days=5))
+        self.assertEqual(refresh_lead_time_rollup(now=now + timedelta(seconds=299), settle_seconds=300), 0)
+
+        # Rows written after the mark wait for the next one
+        later = now + timedelta(seconds=300)
+        self.assertEqual(refresh_lead_time_rollup(now=later, settle_seconds=300), 1)
+        self.assertEqual(refresh_lead_time_rollup(now=later, settle_seconds=300), 0)
+        self.assertEqual(refresh_lead_time_rollup(now=later + timedelta(seconds=300), settle_seconds=300), 1)
+        self.assertEqual(RequestLeadTime.objects.count(), 2)
+
+
+class FundingTransactionIdempotencyTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.fund = Fund.objects.create(
+            name='Test Fund', total_budget=Decimal('10000.00'), created_by=self.user
+        )
+        self.request = Request.objects.create(
+            item_name='Centrifuge tubes',
+            requested_by=self.user,
+            unit_price=Decimal('25.00'),
+            quantity=4,
+            fund_id=self.fund.id,
+        )
+
+    def test_transition_creates_single_transaction(self):
+        self.request.status = 'APPROVED'
+        self.request.save()
+        self.request.status = 'ORDERED'
+        self.request.save()
+        OutboxWorker().run_pending()
+
+        self.assertEqual(Transaction.objects.filter(request_id=self.request.id).count(), 1)
+        self.fund.refresh_from_db()
+        self.assertEqual(self.fund.spent_amount, Decimal('100.00'))
+
+    def test_status_change_costs_one_insert(self):
+        reloaded = Request.objects.get(pk=self.request.pk)
+        reloaded.notes = 'Updated notes'
+        with self.assertNumQueries(1):
+            reloaded.save()
+        self.assertFalse(OutboxEvent.objects.filter(topic='request.saved', payload__created=False).exists())
+
+        # The side effects wait for the outbox worker
+        reloaded.status = 'APPROVED'
+        with self.assertNumQueries(2):
+            reloaded.save()
+        self.assertFalse(Transaction.objects.exists())
+
+        OutboxWorker().run_pending()
+        self.assertEqual(Transaction.objects.filter(request_id=self.request.id).count(), 1)
+        history = RequestHistory.objects.get(request=self.request)
+        self.assertEqual((history.old_status, history.new_status), ('NEW', 'APPROVED'))
+        # Stamped with the time of the change, not of the dispatch
+        self.assertEqual(history.timestamp, reloaded.updated_at)
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_duplicate_purchase_rejected_by_database(self):
+        Transaction.objects.create(
+            fund=self.fund, amount=Decimal('100.00'), request_id=self.request.id,
+            created_by=self.user
+        )
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Transaction.objects.create(
+                fund=self.fund, amount=Decimal('100.00'), request_id=self.request.id,
+                created_by=self.user
+            )
+
+        # Refunds against the same request are still allowed
+        Transaction.objects.create(
+            fund=self.fund, amount=Decimal('100.00'), request_id=self.request.id,
+            transaction_type='refund', created_by=self.user
+        )
+
+
+class RequestAPITest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.request = Request.objects.create(
+            item_name='Pipette tips', requested_by=self.user, unit_price=Decimal('10.00')
+        )
+
+    def test_list_requests(self):
+        response = self.client.get('/api/requests/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['results'][0]['requested_by']['username'], 'testuser')
+
+    def test_failed_write_leaves_neither_change_nor_event(self):
+        events = OutboxEvent.objects.count()
+        save = Request.save
+
+        def save_then_fail(instance, *args, **kwargs):
+            save(instance, *args, **kwargs)
+            raise DatabaseError('connection lost')
+
+        self.user.is_staff = True
+        self.user.save()
+        with mock.patch.object(Request, 'save', save_then_fail), self.assertRaises(DatabaseError):
+            self.client.post(f'/api/requests/{self.request.id}/approve/')
+
+        self.request.refresh_from_db()
+        self.assertEqual(self.request.status, 'NEW')
+        self.assertFalse(RequestHistory.objects.exists())
+        self.assertEqual(OutboxEvent.objects.count(), events)
+
+    def test_history_is_paginated(self):
+        RequestHistory.objects.bulk_create([
+            RequestHistory(request=self.request, user=self.user, old_status='NEW', new_status='NEW')
+            for _ in range(30)
+        ])
+
+        response = self.client.get(f'/api/requests/{self.request.id}/history/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 30)
+        self.assertEqual(len(response.data['results']), 25)
+
+    def test_lead_times_reads_the_rollup_only(self):
+        RequestLeadTime.objects.create(
+            month=datetime(2025, 3, 1).date(), stage=RequestLeadTime.Stage.APPROVED_TO_ORDERED,
+            event_count=1, total_seconds=86400, min_seconds=86400, max_seconds=86400
+        )
+        RequestHistory.objects.create(
+            request=self.request, user=self.user, old_status='APPROVED', new_status='ORDERED'
+        )
+
+        response = self.client.get('/api/requests/lead_times/', {'start_month': '2025-03', 'end_month': '2025-03'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['by_vendor']), 1)
+        self.assertFalse(AnalyticsCursor.objects.exists())
+
+        response = self.client.get('/api/requests/lead_times/', {'start_month': '2025-04'})
+        self.assertEqual(response.data['by_vendor'], [])
+
+    def test_lead_times_rejects_bad_months(self):
+        for params in ({'start_month': '2025-13'}, {'end_month': 'March'}, {'vendor': 'sigma'}):
+            response = self.client.get('/api/requests/lead_times/', params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
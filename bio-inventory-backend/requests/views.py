@@ -9,11 +9,13 @@ from .serializers import RequestSerializer, RequestHistorySerializer
 from .filters import RequestFilter # Import our filter class
 from items.models import Item, Location
 from notifications.services import NotificationService
+from notifications.preferences import PreferenceResolver
+from outbox.mixins import AtomicWritesMixin
 
-class RequestViewSet(viewsets.ModelViewSet):
+class RequestViewSet(AtomicWritesMixin, viewsets.ModelViewSet):
     queryset = Request.objects.all().select_related(
-        'created_by', 'vendor'
-    ).prefetch_related('requesthistory_set')
+        'requested_by', 'vendor', 'item_type'
+    )
     serializer_class = RequestSerializer
     filterset_class = RequestFilter # Connect the filter class
     filter_backends = [SearchFilter, filters.DjangoFilterBackend] # Add SearchFilter
@@ -182,10 +184,34 @@ class RequestViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def history(self, request, pk=None):
         req_object = self.get_object()
-        history_qs = RequestHistory.objects.filter(request=req_object)
+        history_qs = RequestHistory.objects.filter(request=req_object).select_related('user').order_by('-timestamp', '-id')
+        page = self.paginate_queryset(history_qs)
+        if page is not None:
+            serializer = RequestHistorySerializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
         serializer = RequestHistorySerializer(history_qs, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def lead_times(self, request):
+        """APPROVED->ORDERED and ORDERED->RECEIVED lead times per vendor and month."""
+        from .analytics import get_lead_time_summary, parse_month
+
+        # Read-only: the rollup is refreshed by manage.py refresh_request_analytics
+        try:
+            vendor_id = int(request.query_params['vendor']) if request.query_params.get('vendor') else None
+            start_month = parse_month(request.query_params.get('start_month'))
+            end_month = parse_month(request.query_params.get('end_month'))
+        except ValueError:
+            return Response(
+                {'error': 'vendor must be an id and start_month/end_month must be YYYY-MM.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(get_lead_time_summary(
+            vendor_id=vendor_id, start_month=start_month, end_month=end_month,
+        ))
+
     @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
     def batch_place_order(self, request):
         """Batch place order for multiple approved requests."""
@@ -195,7 +221,13 @@ class RequestViewSet(viewsets.ModelViewSet):
         if not request_ids:
             return Response({'error': 'No request IDs provided'}, status=status.HTTP_400_BAD_REQUEST)
         
-        requests_to_update = Request.objects.filter(id__in=request_ids, status='APPROVED')
+        requests_to_update = Request.objects.filter(
+            id__in=request_ids, status='APPROVED'
+        ).select_related('requested_by')
+        # One preference query for every requester emailed below
+        PreferenceResolver.current().load(
+            {req.requested_by for req in requests_to_update if req.requested_by}
+        )
         updated_count = 0
         errors = []
         
@@ -250,7 +282,13 @@ class RequestViewSet(viewsets.ModelViewSet):
         if not request_ids or not location_id:
             return Response({'error': 'Request IDs and location are required'}, status=status.HTTP_400_BAD_REQUEST)
         
-        requests_to_update = Request.objects.filter(id__in=request_ids, status='ORDERED')
+        requests_to_update = Request.objects.filter(
+            id__in=request_ids, status='ORDERED'
+        ).select_related('requested_by')
+        # One preference query for every requester emailed below
+        PreferenceResolver.current().load(
+            {req.requested_by for req in requests_to_update if req.requested_by}
+        )
         updated_count = 0
         errors = []
         
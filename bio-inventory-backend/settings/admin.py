@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import SystemSetting, UserPreference
+from .models import ScheduledJob, SystemSetting, UserPreference
 
 
 @admin.register(SystemSetting)
@@ -15,4 +15,15 @@ class UserPreferenceAdmin(admin.ModelAdmin):
     list_display = ['user', 'theme', 'language', 'email_notifications', 'items_per_page', 'updated_at']
     list_filter = ['theme', 'language', 'email_notifications', 'push_notifications']
     search_fields = ['user__username', 'user__email']
-    readonly_fields = ['created_at', 'updated_at']
\ No newline at end of file
+    readonly_fields = ['created_at', 'updated_at']
+
+
+@admin.register(ScheduledJob)
+class ScheduledJobAdmin(admin.ModelAdmin):
+    list_display = ['name', 'schedule', 'next_run_at', 'last_status', 'last_duration', 'run_count', 'failure_count', 'lease_owner']
+    list_filter = ['last_status']
+    search_fields = ['name']
+    readonly_fields = [
+        'lease_owner', 'lease_expires_at', 'last_started_at', 'last_finished_at', 'last_status',
+        'last_error', 'last_duration', 'total_duration', 'run_count', 'failure_count',
+    ]
@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand
+
+from core.polling import idle_sleep
+from settings.models import ScheduledJob
+from settings.scheduler import JobScheduler
+
+
+class Command(BaseCommand):
+    help = (
+        'Run the maintenance jobs declared in SCHEDULED_JOBS as they come due; '
+        'safe to run on several nodes, each job runs on one at a time'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run the jobs due now and exit',
+        )
+        parser.add_argument(
+            '--status',
+            action='store_true',
+            help='Show each job\'s schedule, last run and durations, then exit',
+        )
+        parser.add_argument(
+            '--max-sleep',
+            type=int,
+            default=60,
+            help='Longest wait between checks, in seconds (default 60)',
+        )
+
+    def handle(self, *args, **options):
+        scheduler = JobScheduler(sleep=idle_sleep, max_sleep=options['max_sleep'])
+        scheduler.sync()
+
+        if options['status']:
+            self.show_status(scheduler)
+            return
+
+        if options['once']:
+            ran = scheduler.run_pending()
+            self.stdout.write(self.style.SUCCESS(f'Ran {len(ran)} job(s): {", ".join(ran) or "none due"}'))
+            return
+
+        self.stdout.write(f'Scheduler started on {scheduler.node} with {len(scheduler.jobs)} job(s)')
+        try:
+            scheduler.run()
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Scheduler stopped'))
+
+    def show_status(self, scheduler):
+        for job in ScheduledJob.objects.filter(name__in=scheduler.jobs):
+            line = f'{job.name:<28} {job.schedule:<16} next {job.next_run_at:%Y-%m-%d %H:%M}'
+            if job.lease_owner:
+                line += f'  running on {job.lease_owner}'
+            if job.run_count:
+                line += (
+                    f'  last {job.last_status} in {job.last_duration:.1f}s'
+                    f', avg {job.average_duration:.1f}s over {job.run_count} run(s)'
+                )
+            style = self.style.ERROR if job.last_status == 'failed' else self.style.SUCCESS
+            self.stdout.write(style(line))
+            if job.last_status == 'failed':
+                self.stdout.write(f'    {job.last_error}')
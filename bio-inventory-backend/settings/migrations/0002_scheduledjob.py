@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-18 22:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('settings', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduledJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('schedule', models.CharField(help_text='Interval or cron expression the job was scheduled with', max_length=100)),
+                ('next_run_at', models.DateTimeField(blank=True, null=True)),
+                ('lease_owner', models.CharField(blank=True, help_text='Scheduler node running the job', max_length=255)),
+                ('lease_expires_at', models.DateTimeField(blank=True, null=True)),
+                ('last_started_at', models.DateTimeField(blank=True, null=True)),
+                ('last_finished_at', models.DateTimeField(blank=True, null=True)),
+                ('last_status', models.CharField(blank=True, choices=[('', 'Never run'), ('ok', 'Succeeded'), ('failed', 'Failed')], default='', max_length=10)),
+                ('last_error', models.TextField(blank=True)),
+                ('last_duration', models.FloatField(blank=True, help_text='Seconds', null=True)),
+                ('total_duration', models.FloatField(default=0, help_text='Seconds, over all runs')),
+                ('run_count', models.PositiveIntegerField(default=0)),
+                ('failure_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+    ]
@@ -63,4 +63,38 @@ class UserPreference(models.Model):
         db_table = 'user_preferences'
 
     def __str__(self):
-        return f"{self.user.username} preferences"
\ No newline at end of file
+        return f"{self.user.username} preferences"
+
+class ScheduledJob(models.Model):
+    """Run state and lease of one periodic maintenance job (see settings.scheduler)"""
+    STATUS_CHOICES = [
+        ('', 'Never run'),
+        ('ok', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100, unique=True)
+    schedule = models.CharField(max_length=100, help_text="Interval or cron expression the job was scheduled with")
+    next_run_at = models.DateTimeField(null=True, blank=True)
+    lease_owner = models.CharField(max_length=255, blank=True, help_text="Scheduler node running the job")
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    last_started_at = models.DateTimeField(null=True, blank=True)
+    last_finished_at = models.DateTimeField(null=True, blank=True)
+    last_status = models.CharField(max_length=10, choices=STATUS_CHOICES, blank=True, default='')
+    last_error = models.TextField(blank=True)
+    last_duration = models.FloatField(null=True, blank=True, help_text="Seconds")
+    total_duration = models.FloatField(default=0, help_text="Seconds, over all runs")
+    run_count = models.PositiveIntegerField(default=0)
+    failure_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return f"{self.name} ({self.schedule})"
+
+    @property
+    def average_duration(self):
+        if not self.run_count:
+            return None
+        return self.total_duration / self.run_count
@@ -0,0 +1,230 @@
+"""
+Periodic maintenance jobs.
+
+Jobs are management commands declared in ``settings.SCHEDULED_JOBS`` with
+either an ``interval`` in seconds or a five-field ``cron`` expression
+(minute, hour, day of month, month, day of week; in the project time zone).
+``manage.py run_scheduler`` runs them on every node that should be able to
+take over; each job has a ScheduledJob row holding its next run time, its
+last outcome and its run durations.
+
+A node takes a job with a single conditional UPDATE on that row: the job
+must be due and its lease free or expired. The database serialises
+competing updates, so exactly one node gets the lease and runs the job;
+the lease expires on its own if that node dies mid-run.
+"""
+from datetime import datetime, timedelta
+from io import StringIO
+import logging
+import os
+import socket
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core.polling import PollLoop
+from .models import ScheduledJob
+
+logger = logging.getLogger(__name__)
+
+# (lowest, highest) value of each cron field
+CRON_FIELDS = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+
+def parse_field(field, lowest, highest):
+    """Values matched by one cron field: ``*``, ``5``, ``1-5``, ``*/15``, ``1-30/2`` and lists of them"""
+    values = set()
+    for part in field.split(','):
+        part, _, step = part.partition('/')
+        if part == '*':
+            start, end = lowest, highest
+        elif '-' in part:
+            start, end = (int(bound) for bound in part.split('-', 1))
+        else:
+            start = end = int(part)
+            if step:
+                end = highest
+        step = int(step) if step else 1
+        if not (lowest <= start <= end <= highest) or step < 1:
+            raise ValueError(f"Invalid cron field: {field}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronExpression:
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs five fields: {expression}")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            parse_field(field, *bounds) for field, bounds in zip(fields, CRON_FIELDS)
+        )
+        # Cron counts Sunday as 0 or 7
+        self.weekdays = {day % 7 for day in weekdays}
+        # As in cron, a day matches either restricted day field when both are restricted
+        self.any_day = fields[2] == '*'
+        self.any_weekday = fields[4] == '*'
+
+    def __str__(self):
+        return self.expression
+
+    def matches_day(self, day):
+        in_month = day.day in self.days
+        # date.weekday() counts from Monday
+        in_week = (day.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return in_month and in_week
+        return in_month or in_week
+
+    def next_after(self, moment):
+        """The first matching minute strictly after ``moment``"""
+        start = timezone.localtime(moment).replace(second=0, microsecond=0, tzinfo=None) + timedelta(minutes=1)
+        day = start.date()
+        # Every valid expression matches within a leap-year cycle
+        for _ in range(366 * 4 + 1):
+            if day.month in self.months and self.matches_day(day):
+                for hour in sorted(self.hours):
+                    for minute in sorted(self.minutes):
+                        candidate = datetime(day.year, day.month, day.day, hour, minute)
+                        if candidate >= start:
+                            return timezone.make_aware(candidate)
+            day += timedelta(days=1)
+        raise ValueError(f"Cron expression never matches: {self.expression}")
+
+
+class Job:
+    """A management command run every ``interval`` seconds or on a ``cron`` schedule"""
+
+    def __init__(self, name, command, args=(), interval=None, cron=None, lease=3600):
+        if (interval is None) == (cron is None):
+            raise ValueError(f"Job {name} needs exactly one of interval or cron")
+        self.name = name
+        self.command = command
+        self.args = list(args)
+        self.interval = interval
+        self.cron = CronExpression(cron) if cron is not None else None
+        # Longest expected run; another node takes over once it has passed
+        self.lease = lease
+
+    @property
+    def schedule(self):
+        return str(self.cron) if self.cron else f"every {self.interval}s"
+
+    def next_run(self, after):
+        if self.cron:
+            return self.cron.next_after(after)
+        return after + timedelta(seconds=self.interval)
+
+    def first_run(self, now):
+        # Interval jobs have no fixed slot: run as soon as they are declared
+        return self.cron.next_after(now) if self.cron else now
+
+
+def jobs_from_settings():
+    return [Job(name, **options) for name, options in getattr(settings, 'SCHEDULED_JOBS', {}).items()]
+
+
+class JobScheduler(PollLoop):
+    """Runs due jobs under a lease. ``timer`` measures run durations."""
+
+    def __init__(self, jobs=None, clock=timezone.now, sleep=time.sleep, timer=time.monotonic,
+                 max_sleep=60, node=None):
+        super().__init__(clock=clock, sleep=sleep)
+        self.jobs = {job.name: job for job in (jobs if jobs is not None else jobs_from_settings())}
+        self.timer = timer
+        self.max_sleep = max_sleep
+        self.node = node or f"{socket.gethostname()}:{os.getpid()}"
+
+    def sync(self):
+        """Create rows for new jobs and reschedule jobs whose schedule changed"""
+        now = self.clock()
+        rows = {row.name: row for row in ScheduledJob.objects.filter(name__in=self.jobs)}
+        for job in self.jobs.values():
+            row = rows.get(job.name)
+            if row is None:
+                ScheduledJob.objects.get_or_create(
+                    name=job.name, defaults={'schedule': job.schedule, 'next_run_at': job.first_run(now)}
+                )
+            elif row.schedule != job.schedule:
+                ScheduledJob.objects.filter(pk=row.pk).update(
+                    schedule=job.schedule, next_run_at=job.first_run(now)
+                )
+
+    def claim(self, job, now):
+        """Take the lease on ``job`` if it is due and no other node holds it"""
+        return ScheduledJob.objects.filter(
+            name=job.name, next_run_at__lte=now
+        ).filter(
+            Q(lease_expires_at__isnull=True) | Q(lease_expires_at__lte=now)
+        ).update(
+            lease_owner=self.node,
+            lease_expires_at=now + timedelta(seconds=job.lease),
+            last_started_at=now,
+        ) == 1
+
+    def run_job(self, job):
+        """Run ``job`` if this node can claim it. Returns whether it ran."""
+        started_at = self.clock()
+        if not self.claim(job, started_at):
+            return False
+
+        output = StringIO()
+        error = ''
+        started = self.timer()
+        try:
+            call_command(job.command, *job.args, stdout=output, stderr=output)
+        except Exception as exc:
+            error = f"{type(exc).__name__}: {exc}"
+            logger.exception(f"Scheduled job {job.name} failed")
+        duration = self.timer() - started
+        finished_at = self.clock()
+
+        next_run_at = job.next_run(started_at)
+        if next_run_at <= finished_at:
+            # Overran its slot; skip the missed runs rather than catching up
+            next_run_at = job.next_run(finished_at)
+        # Released only if the lease is still ours; a node that took over an
+        # expired lease owns the row now
+        ScheduledJob.objects.filter(name=job.name, lease_owner=self.node).update(
+            lease_owner='',
+            lease_expires_at=None,
+            next_run_at=next_run_at,
+            last_finished_at=finished_at,
+            last_status='failed' if error else 'ok',
+            last_error=error,
+            last_duration=duration,
+            total_duration=F('total_duration') + duration,
+            run_count=F('run_count') + 1,
+            failure_count=F('failure_count') + (1 if error else 0),
+        )
+        logger.info(f"Scheduled job {job.name} {'failed' if error else 'finished'} in {duration:.2f}s")
+        return True
+
+    def run_pending(self):
+        """Run every due job this node can claim. Returns the names of the jobs run."""
+        now = self.clock()
+        due = ScheduledJob.objects.filter(
+            name__in=self.jobs, next_run_at__lte=now
+        ).filter(
+            Q(lease_expires_at__isnull=True) | Q(lease_expires_at__lte=now)
+        ).order_by('next_run_at').values_list('name', flat=True)
+        return [name for name in list(due) if self.run_job(self.jobs[name])]
+
+    poll = run_pending
+
+    def seconds_until_next(self):
+        now = self.clock()
+        next_run_at = ScheduledJob.objects.filter(name__in=self.jobs).exclude(
+            lease_expires_at__gt=now
+        ).order_by('next_run_at').values_list('next_run_at', flat=True).first()
+        if next_run_at is None:
+            return self.max_sleep
+        return min(max((next_run_at - now).total_seconds(), 0), self.max_sleep)
+
+    def run(self, should_stop=lambda: False):
+        self.sync()
+        super().run(should_stop)
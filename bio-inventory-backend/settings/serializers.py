@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import SystemSetting, UserPreference
+from .models import ScheduledJob, SystemSetting, UserPreference
 
 
 class SystemSettingSerializer(serializers.ModelSerializer):
@@ -33,6 +33,19 @@ class UserPreferenceSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class ScheduledJobSerializer(serializers.ModelSerializer):
+    average_duration = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = ScheduledJob
+        fields = [
+            'name', 'schedule', 'next_run_at', 'lease_owner', 'lease_expires_at',
+            'last_started_at', 'last_finished_at', 'last_status', 'last_error',
+            'last_duration', 'average_duration', 'run_count', 'failure_count'
+        ]
+        read_only_fields = fields
+
+
 class UserSettingsOverviewSerializer(serializers.Serializer):
     """Combined serializer for user settings overview"""
     user_info = serializers.SerializerMethodField()
@@ -0,0 +1,149 @@
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import count
+
+from .models import ScheduledJob
+from .scheduler import CronExpression, Job, JobScheduler
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=dt_timezone.utc)
+
+
+class FrozenClock:
+    def __init__(self, now):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += timedelta(seconds=seconds)
+
+
+@override_settings(TIME_ZONE='UTC')
+class CronExpressionTest(TestCase):
+    def test_next_after(self):
+        # 2025-01-01 is a Wednesday
+        now = utc(2025, 1, 1, 10, 30)
+        self.assertEqual(CronExpression('*/15 * * * *').next_after(now), utc(2025, 1, 1, 10, 45))
+        self.assertEqual(CronExpression('0 9 * * *').next_after(now), utc(2025, 1, 2, 9, 0))
+        self.assertEqual(CronExpression('0 9 * * 1').next_after(now), utc(2025, 1, 6, 9, 0))
+        self.assertEqual(CronExpression('0 0 * * 7').next_after(now), utc(2025, 1, 5, 0, 0))
+        self.assertEqual(CronExpression('0 12 1 */3 *').next_after(now), utc(2025, 1, 1, 12, 0))
+        self.assertEqual(CronExpression('30 10 1-5 1 *').next_after(now), utc(2025, 1, 2, 10, 30))
+        self.assertEqual(CronExpression('0 0 29 2 *').next_after(now), utc(2028, 2, 29, 0, 0))
+
+    def test_restricted_day_fields_match_either(self):
+        # The 15th, or any Monday
+        cron = CronExpression('0 0 15 * 1')
+        self.assertEqual(cron.next_after(utc(2025, 1, 1)), utc(2025, 1, 6))
+        self.assertEqual(cron.next_after(utc(2025, 1, 13)), utc(2025, 1, 15))
+
+    def test_invalid_expressions(self):
+        for expression in ['* * * *', '60 * * * *', '5-1 * * * *', '*/0 * * * *', '0 0 31 2 *']:
+            with self.assertRaises(ValueError, msg=expression):
+                CronExpression(expression).next_after(utc(2025, 1, 1))
+
+
+@override_settings(TIME_ZONE='UTC')
+class JobSchedulerTest(TestCase):
+    def setUp(self):
+        self.clock = FrozenClock(utc(2025, 1, 1, 10, 30))
+        self.jobs = [
+            Job('counters', 'reconcile_notification_counters', interval=600),
+            Job('nightly', 'reconcile_notification_counters', cron='0 3 * * *'),
+        ]
+
+    def scheduler(self, node='node-a', jobs=None, timer=None):
+        scheduler = JobScheduler(
+            jobs=jobs or self.jobs, clock=self.clock, sleep=self.clock.sleep,
+            timer=timer or count(0, 2).__next__, node=node,
+        )
+        scheduler.sync()
+        return scheduler
+
+    def test_sync_schedules_new_and_changed_jobs(self):
+        self.scheduler()
+        self.assertEqual(ScheduledJob.objects.get(name='counters').next_run_at, self.clock.now)
+        self.assertEqual(ScheduledJob.objects.get(name='nightly').next_run_at, utc(2025, 1, 2, 3, 0))
+
+        self.scheduler(jobs=[Job('nightly', 'reconcile_notification_counters', cron='0 4 * * *')])
+        job = ScheduledJob.objects.get(name='nightly')
+        self.assertEqual(job.schedule, '0 4 * * *')
+        self.assertEqual(job.next_run_at, utc(2025, 1, 2, 4, 0))
+
+    def test_runs_due_jobs_and_records_durations(self):
+        scheduler = self.scheduler()
+        self.assertEqual(scheduler.run_pending(), ['counters'])
+        self.assertEqual(scheduler.run_pending(), [])
+
+        job = ScheduledJob.objects.get(name='counters')
+        self.assertEqual(job.last_status, 'ok')
+        self.assertEqual(job.last_duration, 2)
+        self.assertEqual(job.run_count, 1)
+        self.assertEqual(job.lease_owner, '')
+        self.assertEqual(job.next_run_at, utc(2025, 1, 1, 10, 40))
+        self.assertEqual(scheduler.seconds_until_next(), 60)
+
+        self.clock.now += timedelta(minutes=10)
+        self.assertEqual(scheduler.run_pending(), ['counters'])
+        job.refresh_from_db()
+        self.assertEqual(job.run_count, 2)
+        self.assertEqual(job.total_duration, 4)
+        self.assertEqual(job.average_duration, 2)
+
+    def test_lease_keeps_job_on_one_node(self):
+        first, second = self.scheduler('node-a'), self.scheduler('node-b')
+        job = first.jobs['counters']
+        self.assertTrue(first.claim(job, self.clock.now))
+        self.assertFalse(second.claim(job, self.clock.now))
+        self.assertEqual(second.run_pending(), [])
+
+        # The lease lapses if its holder dies mid-run; another node takes over
+        self.clock.now += timedelta(seconds=job.lease)
+        self.assertEqual(second.run_pending(), ['counters'])
+        self.assertEqual(ScheduledJob.objects.get(name='counters').run_count, 1)
+
+    def test_failures_are_recorded(self):
+        scheduler = self.scheduler(jobs=[Job('broken', 'no_such_command', interval=60)])
+        with self.assertLogs('settings.scheduler', 'ERROR'):
+            self.assertEqual(scheduler.run_pending(), ['broken'])
+
+        job = ScheduledJob.objects.get(name='broken')
+        self.assertEqual(job.last_status, 'failed')
+        self.assertIn('no_such_command', job.last_error)
+        self.assertEqual(job.failure_count, 1)
+        self.assertEqual(job.lease_owner, '')
+        self.assertEqual(job.next_run_at, utc(2025, 1, 1, 10, 31))
+
+    def test_run_sleeps_until_next_job(self):
+        scheduler = self.scheduler()
+        scheduler.max_sleep = 3600
+        scheduler.run(should_stop=lambda: len(self.clock.sleeps) >= 3)
+        self.assertEqual(self.clock.sleeps, [600, 600, 600])
+        self.assertEqual(ScheduledJob.objects.get(name='counters').run_count, 3)
+
+
+class ScheduledJobsEndpointTest(APITestCase):
+    def setUp(self):
+        ScheduledJob.objects.create(
+            name='counters', schedule='every 600s', run_count=2, total_duration=3, last_duration=1, last_status='ok'
+        )
+
+    def test_staff_only(self):
+        self.client.force_authenticate(User.objects.create_user(username='member', password='x'))
+        response = self.client.get('/api/settings/admin/scheduled-jobs/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_lists_jobs_with_durations(self):
+        self.client.force_authenticate(User.objects.create_user(username='admin', password='x', is_staff=True))
+        response = self.client.get('/api/settings/admin/scheduled-jobs/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]['name'], 'counters')
+        self.assertEqual(response.data[0]['average_duration'], 1.5)
@@ -4,8 +4,8 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
 from django.contrib.auth.models import User
-from .models import SystemSetting, UserPreference
-from .serializers import SystemSettingSerializer, UserPreferenceSerializer, UserSettingsOverviewSerializer
+from .models import ScheduledJob, SystemSetting, UserPreference
+from .serializers import ScheduledJobSerializer, SystemSettingSerializer, UserPreferenceSerializer, UserSettingsOverviewSerializer
 
 
 class SystemSettingViewSet(viewsets.ModelViewSet):
@@ -181,4 +181,16 @@ class AdminSettingsViewSet(viewsets.ViewSet):
             },
             'settings_count': SystemSetting.objects.count(),
             'preferences_configured': UserPreference.objects.count(),
-        })
\ No newline at end of file
+        })
+
+    @action(detail=False, methods=['get'], url_path='scheduled-jobs')
+    def scheduled_jobs(self, request):
+        """Last run, durations and lease holder of each maintenance job"""
+        if not request.user.is_staff:
+            return Response(
+                {'error': 'Administrator access required'}, 
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        serializer = ScheduledJobSerializer(ScheduledJob.objects.all(), many=True)
+        return Response(serializer.data)
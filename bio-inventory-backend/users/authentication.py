@@ -0,0 +1,44 @@
+"""
+Cached token authentication.
+
+TokenAuthentication looks the token and its user up on every request.
+CachedTokenAuthentication keeps the resolved token, with its user, in the
+default cache for AUTH_TOKEN_CACHE_TIMEOUT seconds, so steady-state
+requests skip the query. Entries are dropped when the token is deleted or
+replaced and whenever its user is saved (deactivated, made staff, ...);
+see users.signals. Those invalidations only reach every process through a
+shared cache, so caching is off by default unless REDIS_URL configures one.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+
+def token_cache_key(key):
+    # Token keys are credentials; keep them out of the cache's key space
+    return 'auth-token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def forget_token(key):
+    cache.delete(token_cache_key(key))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        timeout = getattr(settings, 'AUTH_TOKEN_CACHE_TIMEOUT', 60)
+        if timeout <= 0:
+            return super().authenticate_credentials(key)
+
+        cache_key = token_cache_key(key)
+        token = cache.get(cache_key)
+        if token is None:
+            # Raises for unknown tokens, which are never cached
+            user, token = super().authenticate_credentials(key)
+            cache.set(cache_key, token, timeout)
+        elif not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return (token.user, token)
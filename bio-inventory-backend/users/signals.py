@@ -0,0 +1,22 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import forget_token
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def forget_changed_token(sender, instance, **kwargs):
+    """Drop a deleted or replaced token from the authentication cache"""
+    forget_token(instance.key)
+
+
+@receiver(post_save, sender=User)
+def forget_user_tokens(sender, instance, created, **kwargs):
+    """Cached tokens carry a copy of their user; drop them when the user changes"""
+    if created:
+        return
+    for key in Token.objects.filter(user=instance).values_list('key', flat=True):
+        forget_token(key)
@@ -1,3 +1,53 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
 
-# Create your tests here.
+from .authentication import token_cache_key
+
+
+@override_settings(AUTH_TOKEN_CACHE_TIMEOUT=60)
+class CachedTokenAuthenticationTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username='admin', password='testpass123', is_staff=True)
+        self.user = User.objects.create_user(username='member', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+
+    def get_me(self, token=None):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {(token or self.token).key}')
+        return self.client.get('/api/users/me/')
+
+    def test_steady_state_requests_skip_the_token_query(self):
+        self.assertEqual(self.get_me().status_code, status.HTTP_200_OK)
+        self.assertIsNotNone(cache.get(token_cache_key(self.token.key)))
+
+        with self.assertNumQueries(0):
+            response = self.get_me()
+        self.assertEqual(response.data['username'], 'member')
+
+    def test_deleted_and_rotated_tokens_are_rejected(self):
+        self.get_me()
+        self.token.delete()
+        self.assertEqual(self.get_me(self.token).status_code, status.HTTP_401_UNAUTHORIZED)
+
+        rotated = Token.objects.create(user=self.user)
+        self.assertEqual(self.get_me(rotated).status_code, status.HTTP_200_OK)
+        Token.objects.filter(pk=rotated.pk).delete()
+        self.assertEqual(self.get_me(rotated).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_is_rejected(self):
+        self.get_me()
+        admin_token = Token.objects.create(user=self.admin)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {admin_token.key}')
+        response = self.client.post(f'/api/users/{self.user.id}/toggle-status/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(self.get_me().status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(AUTH_TOKEN_CACHE_TIMEOUT=0)
+    def test_caching_can_be_disabled(self):
+        self.get_me()
+        self.assertIsNone(cache.get(token_cache_key(self.token.key)))
@@ -92,11 +92,80 @@ const NotificationCenter: React.FC = () => {
     fetchSummary();
   }, [token, isOpen, filter]);
 
-  // Poll for new notifications every 30 seconds
+  // Live updates from the event stream. The stream is only served by the
+  // ASGI application, so the 30s poll keeps running until it opens and
+  // resumes whenever it drops.
   useEffect(() => {
-    const interval = setInterval(fetchSummary, 30000);
-    return () => clearInterval(interval);
-  }, [token]);
+    if (!token) return;
+
+    let events: EventSource | null = null;
+    let interval: ReturnType<typeof setInterval> | null = null;
+    let reconnect: ReturnType<typeof setTimeout> | null = null;
+    let stopped = false;
+
+    const refresh = () => {
+      fetchSummary();
+      if (isOpen) fetchNotifications();
+    };
+    const startPolling = () => {
+      if (!interval) interval = setInterval(fetchSummary, 30000);
+    };
+    const stopPolling = () => {
+      if (interval) clearInterval(interval);
+      interval = null;
+    };
+    const retry = (delay: number) => {
+      if (!stopped) reconnect = setTimeout(connect, delay);
+    };
+
+    const connect = async () => {
+      try {
+        // A short-lived ticket keeps the API token out of the stream URL
+        const response = await fetch('http://127.0.0.1:8000/api/notifications/stream_ticket/', {
+          method: 'POST',
+          headers: { 'Authorization': `Token ${token}` }
+        });
+        if (!response.ok) throw new Error(`Stream ticket request failed: ${response.status}`);
+        const { ticket } = await response.json();
+        if (stopped) return;
+
+        const source = new EventSource(
+          `http://127.0.0.1:8000/api/notifications/stream/?ticket=${encodeURIComponent(ticket)}`
+        );
+        events = source;
+        let opened = false;
+        source.onopen = () => {
+          opened = true;
+          stopPolling();
+        };
+        source.onerror = () => {
+          // Not served here (501), or the server recycled the stream and the
+          // ticket has expired; reconnect with a fresh ticket, polling meanwhile
+          source.close();
+          events = null;
+          startPolling();
+          if (opened) refresh();
+          retry(opened ? 1000 : 60000);
+        };
+        ['notification.created', 'notification.read', 'notification.unread', 'notification.read_all',
+         'notification.dismissed', 'notification.deleted', 'resync'].forEach(name =>
+          source.addEventListener(name, refresh)
+        );
+      } catch (error) {
+        console.error('Failed to open notification stream:', error);
+        retry(60000);
+      }
+    };
+
+    startPolling();
+    connect();
+    return () => {
+      stopped = true;
+      events?.close();
+      stopPolling();
+      if (reconnect) clearTimeout(reconnect);
+    };
+  }, [token, isOpen]);
 
   const markAsRead = async (notificationId: number) => {
     try {
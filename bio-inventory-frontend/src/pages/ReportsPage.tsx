@@ -121,7 +121,7 @@ const ReportsPage = ({
                 }).then(res => res.json())
             ]);
             setReports(reportsData);
-            setExpiringItems(expiringData.items);
+            setExpiringItems(expiringData.results || []);
             setRecentActivity(recentRequests.results || recentRequests);
             setAllItems(itemsData.results || itemsData);
             
@@ -91,7 +91,7 @@ const RequestsPage = ({ onAddRequestClick, refreshKey, filters, onFilterChange }
     const handleShowHistory = async (id) => {
         const response = await fetch(`http://127.0.0.1:8000/api/requests/${id}/history/`, { headers: { 'Authorization': `Token ${token}` } });
         const data = await response.json();
-        setHistoryData(data);
+        setHistoryData(data.results || data);
         setIsHistoryModalOpen(true);
     };
     